@@ -11,15 +11,97 @@ class Settings(BaseSettings):
         "https://toiture-main.vercel.app",
     ]
     model_dir: str = "app/models"
+    # Load price models in a background thread at startup; /estimate answers
+    # from the percentile table (model="percentile-fallback") until ready
+    model_background_load: bool = False
+
+    # Prediction cache (in front of predict / predict_materials, 0 disables);
+    # sqft is snapped to the step in the cache key only, not the model input
+    prediction_cache_size: int = 1024
+    prediction_cache_sqft_step: float = 1.0
+
+    # Query embedding cache (in-memory LRU, plus SQLite file if path is set)
+    embedding_cache_size: int = 2048
+    embedding_cache_path: str = ""
+    # "torch" (sentence-transformers) or "onnx" (int8 export in app/models/embedder)
+    embedding_backend: str = "torch"
+    # Concurrent query embeddings are encoded together: wait up to this long
+    # after the first one (0 disables), or until max_size are queued
+    embedding_batch_window_ms: float = 3.0
+    embedding_batch_max_size: int = 32
+    # Look up query embeddings in the precomputed grid (app/models/embedding_table)
+    embedding_table: bool = False
+
+    # CBR backend: "pinecone" or "local" (in-process index in app/models/cbr_index)
+    cbr_backend: str = "pinecone"
+    # CBR retrieval: "semantic" (embedding search) or "numeric" (kNN on job
+    # inputs, no embedding model); requests can override with cbr_mode
+    cbr_mode: str = "semantic"
+    # Search only the job category's partition (Pinecone namespace or local
+    # shard), adding neighboring categories until it holds min_cases
+    cbr_partitioned: bool = False
+    cbr_partition_min_cases: int = 200
 
     # Pinecone settings (optional - CBR disabled if not set)
     pinecone_api_key: str = ""
     pinecone_index_host: str = ""
+    # Max open connections of the asyncio Pinecone client (aiohttp connector limit)
+    pinecone_pool_size: int = 32
+    # Pinecone result cache; the index version stamp is re-read this often
+    cbr_cache_size: int = 1024
+    cbr_cache_ttl_s: float = 900.0
+    cbr_version_check_s: float = 60.0
+    # Hybrid quote CBR deadline on the vector-store query (embedding not
+    # included); past it the quote continues ML-only
+    cbr_timeout_s: float = 2.0
+    # Hedged Pinecone request after the recent p95 latency (default delay
+    # until enough samples), floored at the min delay
+    cbr_hedge_enabled: bool = False
+    cbr_hedge_default_delay_s: float = 0.3
+    cbr_hedge_min_delay_s: float = 0.05
+    # Skip CBR for the cool-down after this many consecutive failures
+    cbr_breaker_failures: int = 5
+    cbr_breaker_cooldown_s: float = 30.0
+    # Approved submissions join the case base via a background worker that
+    # embeds them in batches (up to batch_size, or window_s after the first)
+    cbr_ingest_enabled: bool = True
+    cbr_ingest_batch_size: int = 32
+    cbr_ingest_window_s: float = 2.0
+    cbr_ingest_queue_size: int = 1000
+    # CBR_BACKEND=local: append ingested cases here, replayed at startup
+    cbr_ingest_log_path: str = ""
 
     # OpenRouter settings (LLM reasoning)
     openrouter_api_key: str = ""
     openrouter_model: str = "openai/gpt-4o-mini"
     openrouter_base_url: str = "https://openrouter.ai/api/v1"
+    # Merger: "rules" (deterministic), "llm", or "auto" (rules, escalating
+    # to the LLM when rule_merge_score - case similarity, case count, ML vs
+    # CBR price spread - is below the threshold)
+    merger_mode: str = "auto"
+    merger_llm_threshold: float = 0.5
+    # Thread pools: model inference vs blocking I/O (0 CPU workers = one per
+    # core). CPU-bound routes get 429 + Retry-After once this many CPU tasks
+    # are waiting (0 disables admission control)
+    cpu_executor_workers: int = 0
+    io_executor_workers: int = 32
+    admission_cpu_queue_limit: int = 64
+    admission_retry_after_s: int = 1
+    # Per-stage latency spans (Server-Timing header, /health/latency); each
+    # stage keeps its last window_size durations for the percentiles
+    tracing_enabled: bool = True
+    tracing_window_size: int = 1000
+    # Validated LLM merger outputs (in-memory LRU, plus SQLite file if path
+    # is set); 0 size disables
+    merger_cache_size: int = 512
+    merger_cache_ttl_s: float = 21600.0
+    merger_cache_path: str = ""
+    merger_cache_max_rows: int = 20000
+    # Shared keep-alive pool for async LLM calls (HTTP/2 needs the h2 package)
+    llm_max_connections: int = 20
+    llm_max_keepalive_connections: int = 10
+    llm_keepalive_expiry_s: float = 30.0
+    llm_http2: bool = True
     app_url: str = "https://toiturelv-cortex.railway.app"
 
     # Supabase settings (feedback system)
@@ -7,11 +7,15 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.routers import chat, customers, dashboard, estimate, feedback, health, materials, quotes, submissions
+from app.services.cbr_ingest import start_ingest, stop_ingest
 from app.services.embeddings import load_embedding_model, unload_embedding_model
-from app.services.llm_reasoning import close_llm_client, init_llm_client
-from app.services.pinecone_cbr import close_pinecone, init_pinecone, is_pinecone_available
+from app.services.executors import init_executors, shutdown_executors
+from app.services.hybrid_quote import close_merger_cache, init_merger_cache
+from app.services.llm_reasoning import aclose_llm_client, init_llm_client
+from app.services.pinecone_cbr import aclose_pinecone, init_pinecone, is_cbr_available
 from app.services.predictor import load_models, unload_models
 from app.services.supabase_client import close_supabase, init_supabase
+from app.services.tracing import ServerTimingMiddleware
 
 
 @asynccontextmanager
@@ -19,22 +23,29 @@ async def lifespan(app: FastAPI):
     """Manage application lifecycle.
 
     Pre-loads embedding model at startup when Pinecone is configured to avoid
-    request timeouts. ML price/material models still use lazy loading.
+    request timeouts. ML price models load lazily, or in a background thread
+    when MODEL_BACKGROUND_LOAD is set (percentile fallback until ready).
     """
     # Startup
-    load_models()           # No-op: models load on first predict()
+    init_executors()        # CPU inference / blocking I/O thread pools
+    load_models(background=settings.model_background_load)  # Lazy, or background thread
     init_pinecone()         # Pinecone connection (lightweight client)
     # Pre-load embedding model if Pinecone is configured (avoids request timeout)
-    load_embedding_model(eager=is_pinecone_available())
+    load_embedding_model(eager=is_cbr_available() and settings.cbr_mode != "numeric")
     init_llm_client()       # OpenRouter LLM client (lightweight)
+    init_merger_cache()     # Optional SQLite layer of the LLM merger cache
     init_supabase()         # Supabase connection (lightweight)
+    start_ingest()          # Background CBR ingestion of approved submissions
     yield
     # Shutdown
+    stop_ingest()           # Drain queued submissions before closing Pinecone
     close_supabase()
-    close_llm_client()
-    close_pinecone()
+    await aclose_llm_client()
+    close_merger_cache()
+    await aclose_pinecone()
     unload_embedding_model()
     unload_models()
+    shutdown_executors()
 
 
 app = FastAPI(
@@ -53,6 +64,8 @@ app.add_middleware(
     allow_methods=["*"],  # Allow all methods including OPTIONS for preflight
     allow_headers=["*"],
 )
+# Per-stage durations as a Server-Timing header (outermost, so "total" covers everything)
+app.add_middleware(ServerTimingMiddleware)
 
 # Include routers
 app.include_router(health.router)
@@ -22,10 +22,11 @@ from app.services.chat_session import (
     update_session,
 )
 from app.services.hybrid_quote import generate_hybrid_quote
+from app.services.tracing import TracedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/chat", tags=["chat"])
+router = APIRouter(prefix="/chat", tags=["chat"], route_class=TracedRoute)
 
 
 # Greeting detection keywords
@@ -7,10 +7,11 @@ from fastapi import APIRouter, HTTPException, Query
 
 from app.schemas.customers import CustomerDetail, CustomerResult, QuoteHistoryItem
 from app.services.supabase_client import get_supabase
+from app.services.tracing import TracedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/customers", tags=["customers"])
+router = APIRouter(prefix="/customers", tags=["customers"], route_class=TracedRoute)
 
 
 def calculate_segment(lifetime_value: float) -> str:
@@ -18,10 +18,11 @@ from app.schemas.dashboard import (
     TopClient,
 )
 from app.services.supabase_client import get_supabase
+from app.services.tracing import TracedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+router = APIRouter(prefix="/dashboard", tags=["dashboard"], route_class=TracedRoute)
 
 
 @router.get("/metrics", response_model=DashboardMetrics)
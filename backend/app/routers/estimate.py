@@ -1,12 +1,21 @@
 """Estimate endpoint for ML predictions."""
 
+import asyncio
 import json
 import logging
 
+import numpy as np
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
 
-from app.schemas.estimate import EstimateRequest, EstimateResponse, SimilarCase
+from app.schemas.estimate import (
+    BatchEstimateItem,
+    BatchEstimateRequest,
+    BatchEstimateResponse,
+    EstimateRequest,
+    EstimateResponse,
+    SimilarCase,
+)
 from app.schemas.hybrid_quote import HybridQuoteRequest, HybridQuoteResponse, PricingTier
 from app.schemas.materials import (
     MaterialEstimateRequest,
@@ -14,77 +23,129 @@ from app.schemas.materials import (
     MaterialPrediction,
     FullEstimateResponse,
 )
-from app.services.embeddings import build_query_text, generate_query_embedding
-from app.services.hybrid_quote import generate_hybrid_quote
+from app.services.embeddings import embed_query
+from app.services.executors import admit_cpu_work, run_cpu, run_io
+from app.services.hybrid_quote import generate_hybrid_quote, stream_hybrid_quote
 from app.services.llm_reasoning import generate_reasoning_stream
 from app.services.material_predictor import predict_materials
-from app.services.pinecone_cbr import is_pinecone_available, query_similar_cases
-from app.services.predictor import predict
+from app.services.pinecone_cbr import (
+    aquery_similar_cases,
+    is_cbr_available,
+    query_numeric_cases,
+    query_similar_cases,
+    use_numeric_cbr,
+)
+from app.services.predictor import predict, predict_batch
 from app.services.supabase_client import get_supabase
+from app.services.tracing import TracedRoute, span
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(tags=["estimate"])
+router = APIRouter(tags=["estimate"], route_class=TracedRoute)
 
 
-@router.post("/estimate", response_model=EstimateResponse)
-def create_estimate(request: EstimateRequest):
-    """Generate price estimate for roofing job.
+def _json_default(value):
+    """json.dumps fallback for numpy scalars/arrays in ML results."""
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
 
-    Uses ML model to predict price based on sqft, category, and other factors.
-    Returns estimate with confidence range and similar historical cases.
-    """
-    try:
-        # Get ML prediction
-        result = predict(
+
+def _numeric_cases(request: EstimateRequest) -> list[dict]:
+    """Numeric kNN on the job inputs (CPU only, no embedding model)."""
+    with span("vector_search"):
+        return query_numeric_cases(
             sqft=request.sqft,
             category=request.category,
+            complexity=request.complexity,
             material_lines=request.material_lines,
             labor_lines=request.labor_lines,
-            has_subs=request.has_subs,
-            complexity=request.complexity,
+            top_k=5,
+            sqft_filter=request.sqft,  # Filter to 0.5x-2x sqft range
         )
 
-        # Get similar cases from CBR (skip if Pinecone not configured to avoid loading 500MB model)
-        similar_cases = []
-        if is_pinecone_available():
-            try:
-                query_text = build_query_text(
-                    sqft=request.sqft,
-                    category=request.category,
-                    complexity=request.complexity,
-                    material_lines=request.material_lines,
-                    labor_lines=request.labor_lines,
-                )
-                query_vector = generate_query_embedding(query_text)
-                similar_cases_data = query_similar_cases(
-                    query_vector=query_vector,
-                    top_k=5,
-                    category_filter=None,  # Let similarity decide, don't filter by category
-                    sqft_filter=request.sqft,  # Filter to 0.5x-2x sqft range
-                )
-                similar_cases = [SimilarCase(**case) for case in similar_cases_data]
-            except Exception as e:
-                logger.warning(f"CBR lookup failed: {e}")
 
-        # LLM reasoning disabled for speed (was taking 15-30s)
-        # TODO: Re-enable with faster model or async loading
-        reasoning = None
+def _query_vector(request: EstimateRequest) -> list[float]:
+    """Embedding of the job for semantic CBR (CPU)."""
+    return embed_query(
+        sqft=request.sqft,
+        category=request.category,
+        complexity=request.complexity,
+        material_lines=request.material_lines,
+        labor_lines=request.labor_lines,
+    )
 
-        response = EstimateResponse(
-            estimate=result["estimate"],
-            range_low=result["range_low"],
-            range_high=result["range_high"],
-            confidence=result["confidence"],
-            model=result["model"],
-            similar_cases=similar_cases,
-            reasoning=reasoning,
-        )
 
-        # Save estimate to Supabase (graceful degradation)
-        try:
-            supabase = get_supabase()
-            if supabase is not None:
+def _similar_case_query(request: EstimateRequest, query_vector: list[float]) -> dict:
+    """Vector-store query arguments shared by the sync and async lookups."""
+    return {
+        "query_vector": query_vector,
+        "top_k": 5,
+        "category_filter": None,  # Let similarity decide, don't filter by category
+        "sqft_filter": request.sqft,  # Filter to 0.5x-2x sqft range
+        "category": request.category,  # Partition routing (CBR_PARTITIONED)
+    }
+
+
+def _find_similar_cases(request: EstimateRequest) -> list[SimilarCase]:
+    """Top-5 similar historical cases, or [] if CBR is off or fails.
+
+    Numeric mode needs no embedding model; semantic mode is skipped when no
+    CBR backend is configured (avoids loading the 500MB model).
+    """
+    try:
+        if use_numeric_cbr(request.cbr_mode):
+            similar_cases_data = _numeric_cases(request)
+        elif is_cbr_available():
+            query_vector = _query_vector(request)
+            with span("vector_search"):
+                similar_cases_data = query_similar_cases(**_similar_case_query(request, query_vector))
+        else:
+            return []
+        return [SimilarCase(**case) for case in similar_cases_data]
+    except Exception as e:
+        logger.warning(f"CBR lookup failed: {e}")
+        return []
+
+
+async def _afind_similar_cases(request: EstimateRequest) -> list[SimilarCase]:
+    """Async _find_similar_cases: CPU steps on the CPU executor, the vector
+    store query on the asyncio client (or the I/O executor), so network
+    waits never hold a CPU worker.
+    """
+    try:
+        if use_numeric_cbr(request.cbr_mode):
+            similar_cases_data = await run_cpu(_numeric_cases, request)
+        elif is_cbr_available():
+            query_vector = await run_cpu(_query_vector, request)
+            with span("vector_search"):
+                similar_cases_data = await aquery_similar_cases(**_similar_case_query(request, query_vector))
+        else:
+            return []
+        return [SimilarCase(**case) for case in similar_cases_data]
+    except Exception as e:
+        logger.warning(f"CBR lookup failed: {e}")
+        return []
+
+
+def _predict_estimate(request: EstimateRequest) -> dict:
+    """Price prediction (CPU executor)."""
+    return predict(
+        sqft=request.sqft,
+        category=request.category,
+        material_lines=request.material_lines,
+        labor_lines=request.labor_lines,
+        has_subs=request.has_subs,
+        complexity=request.complexity,
+    )
+
+
+def _save_estimate(request: EstimateRequest, result: dict, reasoning) -> None:
+    """Save estimate to Supabase (I/O executor). Never raises."""
+    try:
+        supabase = get_supabase()
+        if supabase is not None:
+            with span("db_insert"):
                 supabase.table("estimates").insert({
                     "sqft": request.sqft,
                     "category": request.category,
@@ -99,9 +160,42 @@ def create_estimate(request: EstimateRequest):
                     "model": result["model"],
                     "reasoning": reasoning,
                 }).execute()
-                logger.info("Estimate saved to Supabase")
-        except Exception as e:
-            logger.warning(f"Failed to save estimate to Supabase: {e}")
+            logger.info("Estimate saved to Supabase")
+    except Exception as e:
+        logger.warning(f"Failed to save estimate to Supabase: {e}")
+
+
+@router.post("/estimate", response_model=EstimateResponse)
+async def create_estimate(request: EstimateRequest):
+    """Generate price estimate for roofing job.
+
+    Uses ML model to predict price based on sqft, category, and other factors.
+    Returns estimate with confidence range and similar historical cases.
+    """
+    admit_cpu_work()
+    try:
+        # ML prediction (CPU executor) alongside the CBR lookup (network waits off the CPU pool)
+        result, similar_cases = await asyncio.gather(
+            run_cpu(_predict_estimate, request),
+            _afind_similar_cases(request),
+        )
+
+        # LLM reasoning disabled for speed (was taking 15-30s)
+        # TODO: Re-enable with faster model or async loading
+        reasoning = None
+
+        response = EstimateResponse(
+            estimate=result["estimate"],
+            range_low=result["range_low"],
+            range_high=result["range_high"],
+            confidence=result["confidence"],
+            model=result["model"],
+            similar_cases=similar_cases,
+            reasoning=reasoning,
+        )
+
+        # Save estimate to Supabase (graceful degradation)
+        await run_io(_save_estimate, request, result, reasoning)
 
         return response
     except Exception as e:
@@ -109,6 +203,41 @@ def create_estimate(request: EstimateRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _batch_estimate(request: BatchEstimateRequest):
+    """Generate price estimates for many jobs in one call (CPU executor)."""
+    try:
+        results = predict_batch([
+            {
+                "sqft": job.sqft,
+                "category": job.category,
+                "material_lines": job.material_lines,
+                "labor_lines": job.labor_lines,
+                "has_subs": job.has_subs,
+                "complexity": job.complexity,
+            }
+            for job in request.jobs
+        ])
+        return BatchEstimateResponse(
+            results=[BatchEstimateItem(**r) for r in results],
+            count=len(results),
+        )
+    except Exception as e:
+        logger.error(f"Batch estimate error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/estimate/batch", response_model=BatchEstimateResponse)
+async def create_batch_estimate(request: BatchEstimateRequest):
+    """Generate price estimates for many jobs in one call.
+
+    Used for bulk re-pricing of open leads. Jobs are grouped by model
+    (Bardeaux vs global) and each group is predicted in a single matrix call.
+    Skips CBR, LLM reasoning and Supabase persistence.
+    """
+    admit_cpu_work()
+    return await run_cpu(_batch_estimate, request)
+
+
 @router.post("/estimate/stream")
 def create_estimate_stream(request: EstimateRequest):
     """Generate price estimate with streaming LLM reasoning.
@@ -130,27 +259,8 @@ def create_estimate_stream(request: EstimateRequest):
                 complexity=request.complexity,
             )
 
-            # Get similar cases from CBR (skip if Pinecone not configured to avoid loading 500MB model)
-            similar_cases = []
-            if is_pinecone_available():
-                try:
-                    query_text = build_query_text(
-                        sqft=request.sqft,
-                        category=request.category,
-                        complexity=request.complexity,
-                        material_lines=request.material_lines,
-                        labor_lines=request.labor_lines,
-                    )
-                    query_vector = generate_query_embedding(query_text)
-                    similar_cases_data = query_similar_cases(
-                        query_vector=query_vector,
-                        top_k=5,
-                        category_filter=None,
-                        sqft_filter=request.sqft,  # Filter to 0.5x-2x sqft range
-                    )
-                    similar_cases = [SimilarCase(**case) for case in similar_cases_data]
-                except Exception as e:
-                    logger.warning(f"CBR lookup failed: {e}")
+            # Get similar cases from CBR
+            similar_cases = _find_similar_cases(request)
 
             # Send estimate data immediately
             estimate_data = {
@@ -196,20 +306,21 @@ def create_estimate_stream(request: EstimateRequest):
                 try:
                     supabase = get_supabase()
                     if supabase is not None:
-                        supabase.table("estimates").insert({
-                            "sqft": request.sqft,
-                            "category": request.category,
-                            "material_lines": request.material_lines,
-                            "labor_lines": request.labor_lines,
-                            "has_subs": bool(request.has_subs),
-                            "complexity": request.complexity,
-                            "ai_estimate": result["estimate"],
-                            "range_low": result["range_low"],
-                            "range_high": result["range_high"],
-                            "confidence": result["confidence"],
-                            "model": result["model"],
-                            "reasoning": reasoning_text,
-                        }).execute()
+                        with span("db_insert"):
+                            supabase.table("estimates").insert({
+                                "sqft": request.sqft,
+                                "category": request.category,
+                                "material_lines": request.material_lines,
+                                "labor_lines": request.labor_lines,
+                                "has_subs": bool(request.has_subs),
+                                "complexity": request.complexity,
+                                "ai_estimate": result["estimate"],
+                                "range_low": result["range_low"],
+                                "range_high": result["range_high"],
+                                "confidence": result["confidence"],
+                                "model": result["model"],
+                                "reasoning": reasoning_text,
+                            }).execute()
                 except Exception as e:
                     logger.warning(f"Failed to save estimate: {e}")
 
@@ -232,13 +343,8 @@ def create_estimate_stream(request: EstimateRequest):
     )
 
 
-@router.post("/estimate/materials", response_model=MaterialEstimateResponse)
-def predict_materials_endpoint(request: MaterialEstimateRequest):
-    """Predict material IDs and quantities for roofing job.
-
-    Uses multi-label classifier for ID selection and per-material regressors
-    for quantity prediction. Applies co-occurrence rules and feature triggers.
-    """
+def _predict_materials(request: MaterialEstimateRequest):
+    """Predict material IDs and quantities for roofing job (CPU executor)."""
     try:
         result = predict_materials(
             sqft=request.sqft,
@@ -263,14 +369,19 @@ def predict_materials_endpoint(request: MaterialEstimateRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/estimate/full", response_model=FullEstimateResponse)
-def create_full_estimate(request: MaterialEstimateRequest):
-    """Generate complete estimate with price prediction AND material list.
+@router.post("/estimate/materials", response_model=MaterialEstimateResponse)
+async def predict_materials_endpoint(request: MaterialEstimateRequest):
+    """Predict material IDs and quantities for roofing job.
 
-    Combines:
-    - Price estimate from existing ML model
-    - Material predictions from material model
+    Uses multi-label classifier for ID selection and per-material regressors
+    for quantity prediction. Applies co-occurrence rules and feature triggers.
     """
+    admit_cpu_work()
+    return await run_cpu(_predict_materials, request)
+
+
+def _full_estimate(request: MaterialEstimateRequest):
+    """Generate complete estimate with price prediction AND material list (CPU executor)."""
     try:
         # Get price prediction (existing)
         price_result = predict(
@@ -310,6 +421,74 @@ def create_full_estimate(request: MaterialEstimateRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/estimate/full", response_model=FullEstimateResponse)
+async def create_full_estimate(request: MaterialEstimateRequest):
+    """Generate complete estimate with price prediction AND material list.
+
+    Combines:
+    - Price estimate from existing ML model
+    - Material predictions from material model
+    """
+    admit_cpu_work()
+    return await run_cpu(_full_estimate, request)
+
+
+def _is_service_call(request: HybridQuoteRequest) -> bool:
+    """Labor-only jobs skip the materials pipeline."""
+    return request.material_lines == 0 or request.sqft < 100
+
+
+def _service_call_quote(request: HybridQuoteRequest) -> HybridQuoteResponse:
+    """Labor-only quote from the ML price prediction (no CBR or LLM)."""
+    logger.info(f"Service call detected (sqft={request.sqft}, material_lines={request.material_lines})")
+    price_result = predict(
+        sqft=request.sqft,
+        category=request.category,
+        material_lines=request.material_lines,
+        labor_lines=request.labor_lines,
+        has_subs=1 if request.has_subs else 0,
+        complexity=request.complexity_aggregate,
+    )
+
+    # Service call response: labor only, no materials
+    return HybridQuoteResponse(
+        work_items=[],
+        materials=[],
+        total_labor_hours=request.labor_lines * 2.0,  # Rough estimate
+        total_materials_cost=0,
+        total_price=price_result["estimate"],
+        overall_confidence=0.6,  # Service calls are straightforward
+        reasoning="Service call detected. Labor-only estimate based on ML prediction.",
+        pricing_tiers=[
+            PricingTier(
+                tier="Basic",
+                total_price=round(price_result["estimate"] * 0.9, 2),
+                materials_cost=0,
+                labor_cost=round(price_result["estimate"] * 0.9, 2),
+                description="Standard service call"
+            ),
+            PricingTier(
+                tier="Standard",
+                total_price=round(price_result["estimate"], 2),
+                materials_cost=0,
+                labor_cost=round(price_result["estimate"], 2),
+                description="Service call with inspection"
+            ),
+            PricingTier(
+                tier="Premium",
+                total_price=round(price_result["estimate"] * 1.2, 2),
+                materials_cost=0,
+                labor_cost=round(price_result["estimate"] * 1.2, 2),
+                description="Emergency/rush service call"
+            ),
+        ],
+        needs_review=False,  # Service calls are low complexity
+        cbr_cases_used=0,
+        ml_confidence=price_result["confidence"],
+        processing_time_ms=50,  # Fast path
+    )
+
+
 @router.post("/estimate/hybrid", response_model=HybridQuoteResponse)
 async def create_hybrid_estimate(request: HybridQuoteRequest):
     """Generate full hybrid quote using CBR + ML + LLM merger.
@@ -324,62 +503,12 @@ async def create_hybrid_estimate(request: HybridQuoteRequest):
 
     Response time target: <5 seconds
     """
-    # Service call detection: skip materials pipeline for labor-only jobs
-    is_service_call = (
-        request.material_lines == 0 or
-        request.sqft < 100
-    )
+    admit_cpu_work()
 
-    if is_service_call:
-        logger.info(f"Service call detected (sqft={request.sqft}, material_lines={request.material_lines})")
-        # For service calls, use simple price prediction only
+    # Service call detection: skip materials pipeline for labor-only jobs
+    if _is_service_call(request):
         try:
-            price_result = predict(
-                sqft=request.sqft,
-                category=request.category,
-                material_lines=request.material_lines,
-                labor_lines=request.labor_lines,
-                has_subs=1 if request.has_subs else 0,
-                complexity=request.complexity_aggregate,
-            )
-
-            # Service call response: labor only, no materials
-            return HybridQuoteResponse(
-                work_items=[],
-                materials=[],
-                total_labor_hours=request.labor_lines * 2.0,  # Rough estimate
-                total_materials_cost=0,
-                total_price=price_result["estimate"],
-                overall_confidence=0.6,  # Service calls are straightforward
-                reasoning="Service call detected. Labor-only estimate based on ML prediction.",
-                pricing_tiers=[
-                    PricingTier(
-                        tier="Basic",
-                        total_price=round(price_result["estimate"] * 0.9, 2),
-                        materials_cost=0,
-                        labor_cost=round(price_result["estimate"] * 0.9, 2),
-                        description="Standard service call"
-                    ),
-                    PricingTier(
-                        tier="Standard",
-                        total_price=round(price_result["estimate"], 2),
-                        materials_cost=0,
-                        labor_cost=round(price_result["estimate"], 2),
-                        description="Service call with inspection"
-                    ),
-                    PricingTier(
-                        tier="Premium",
-                        total_price=round(price_result["estimate"] * 1.2, 2),
-                        materials_cost=0,
-                        labor_cost=round(price_result["estimate"] * 1.2, 2),
-                        description="Emergency/rush service call"
-                    ),
-                ],
-                needs_review=False,  # Service calls are low complexity
-                cbr_cases_used=0,
-                ml_confidence=price_result["confidence"],
-                processing_time_ms=50,  # Fast path
-            )
+            return await run_cpu(_service_call_quote, request)
         except Exception as e:
             logger.error(f"Service call estimate error: {e}")
             raise HTTPException(status_code=500, detail=str(e))
@@ -395,3 +524,42 @@ async def create_hybrid_estimate(request: HybridQuoteRequest):
     except Exception as e:
         logger.error(f"Hybrid quote error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/estimate/hybrid/stream")
+async def create_hybrid_estimate_stream(request: HybridQuoteRequest):
+    """Hybrid quote as server-sent events, each stage sent as soon as it's ready.
+
+    Returns SSE stream:
+    1. "ml": ML price and material predictions (fast, ~100ms)
+    2. "cbr": similar cases with the preliminary confidence and review flag
+    3. "llm_token": LLM merger output text chunks (streamed)
+    4. "quote": the validated quote, same shape as POST /estimate/hybrid
+
+    Service calls skip straight to "quote". Failures end the stream with an
+    "error" event.
+    """
+    admit_cpu_work()
+
+    async def generate():
+        try:
+            if _is_service_call(request):
+                quote = await run_cpu(_service_call_quote, request)
+                yield f"data: {json.dumps({'type': 'quote', 'data': quote.model_dump()})}\n\n"
+                return
+
+            async for event in stream_hybrid_quote(request):
+                yield f"data: {json.dumps(event, default=_json_default)}\n\n"
+        except Exception as e:
+            logger.error(f"Hybrid stream error: {e}")
+            yield f"data: {json.dumps({'type': 'error', 'data': str(e)})}\n\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+        },
+    )
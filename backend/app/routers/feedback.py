@@ -20,10 +20,11 @@ from app.schemas.feedback import (
     SubmitFeedbackRequest,
 )
 from app.services.supabase_client import get_supabase
+from app.services.tracing import TracedRoute, span
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/feedback", tags=["feedback"])
+router = APIRouter(prefix="/feedback", tags=["feedback"], route_class=TracedRoute)
 
 
 @router.get("/pending", response_model=List[EstimateListItem])
@@ -109,11 +110,12 @@ def submit_feedback(request: SubmitFeedbackRequest):
         estimate = estimate_result.data[0]
 
         # Insert feedback record
-        supabase.table("feedback").insert({
-            "estimate_id": request.estimate_id,
-            "laurent_price": request.laurent_price,
-            "ai_estimate": estimate["ai_estimate"],
-        }).execute()
+        with span("db_insert"):
+            supabase.table("feedback").insert({
+                "estimate_id": request.estimate_id,
+                "laurent_price": request.laurent_price,
+                "ai_estimate": estimate["ai_estimate"],
+            }).execute()
 
         # Mark estimate as reviewed
         supabase.table("estimates").update({
@@ -159,7 +161,8 @@ def submit_quick_feedback(request: QuickFeedbackRequest):
             "created_at": datetime.utcnow().isoformat(),
         }
 
-        supabase.table("cortex_feedback").insert(feedback_data).execute()
+        with span("db_insert"):
+            supabase.table("cortex_feedback").insert(feedback_data).execute()
         logger.info(f"Quick feedback recorded for estimate {request.estimate_id}: {request.feedback}")
 
         return QuickFeedbackResponse(success=True, message="Merci pour votre retour!")
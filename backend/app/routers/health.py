@@ -2,6 +2,12 @@
 
 from fastapi import APIRouter
 
+from app.services.cache import all_cache_stats
+from app.services.cbr_ingest import ingest_stats
+from app.services.executors import executor_stats
+from app.services.hybrid_quote import cbr_health
+from app.services.tracing import latency_stats
+
 router = APIRouter(tags=["health"])
 
 
@@ -12,3 +18,27 @@ def health_check():
     Simple endpoint for load balancer and monitoring checks.
     """
     return {"status": "ok", "version": "1.0.0"}
+
+
+@router.get("/health/cache")
+def cache_stats():
+    """Return size and hit/miss counters for the in-process caches."""
+    return {"caches": all_cache_stats()}
+
+
+@router.get("/health/cbr")
+def cbr_status():
+    """Return the CBR circuit breaker state, recent Pinecone latency and ingestion counters."""
+    return {**cbr_health(), "ingest": ingest_stats()}
+
+
+@router.get("/health/latency")
+def stage_latency():
+    """Return recent p50/p95/p99 duration of each traced pipeline stage."""
+    return {"stages": latency_stats()}
+
+
+@router.get("/health/executors")
+def executor_status():
+    """Return worker, queue-depth and latency gauges for the CPU and I/O pools."""
+    return executor_stats()
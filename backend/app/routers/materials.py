@@ -11,10 +11,11 @@ from app.schemas.materials import (
     MaterialSearchResponse,
 )
 from app.services.supabase_client import get_supabase
+from app.services.tracing import TracedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/materials", tags=["materials"])
+router = APIRouter(prefix="/materials", tags=["materials"], route_class=TracedRoute)
 
 
 @router.get("/search", response_model=MaterialSearchResponse)
@@ -7,10 +7,11 @@ from fastapi import APIRouter, HTTPException, Query
 
 from app.schemas.quotes import PaginatedQuotes, QuoteItem
 from app.services.supabase_client import get_supabase
+from app.services.tracing import TracedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/quotes", tags=["quotes"])
+router = APIRouter(prefix="/quotes", tags=["quotes"], route_class=TracedRoute)
 
 
 @router.get("/", response_model=PaginatedQuotes)
@@ -56,10 +56,11 @@ from app.services.submission_service import (
     update_submission,
 )
 from app.services.supabase_client import get_supabase
+from app.services.tracing import TracedRoute
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(tags=["submissions"])
+router = APIRouter(tags=["submissions"], route_class=TracedRoute)
 
 
 @router.post("/submissions", status_code=201)
@@ -30,6 +30,9 @@ class EstimateRequest(BaseModel):
     has_subs: Literal[0, 1] = 0
     complexity: int = Field(default=10, ge=1, le=100)
     created_by: Optional[str] = Field(default=None, max_length=100, description="Estimator name")
+    cbr_mode: Optional[Literal["semantic", "numeric"]] = Field(
+        default=None, description="Similar-case retrieval override (default: CBR_MODE setting)"
+    )
 
     @field_validator("category")
     @classmethod
@@ -82,3 +85,29 @@ class EstimateResponse(BaseModel):
     model: str
     similar_cases: List[SimilarCase] = []
     reasoning: Optional[str] = None  # LLM-generated explanation
+
+
+class BatchEstimateRequest(BaseModel):
+    """Request model for batch estimate endpoint (nightly re-pricing)."""
+
+    jobs: List[EstimateRequest] = Field(min_length=1, max_length=5000)
+
+
+class BatchEstimateItem(BaseModel):
+    """Price estimate for a single job in a batch."""
+
+    estimate: float
+    range_low: float
+    range_high: float
+    confidence: Literal["HIGH", "MEDIUM", "LOW"]
+    model: str
+
+
+class BatchEstimateResponse(BaseModel):
+    """Response model for batch estimate endpoint.
+
+    Results are in the same order as the request jobs.
+    """
+
+    results: List[BatchEstimateItem]
+    count: int
@@ -232,6 +232,18 @@ class HybridQuoteRequest(BaseModel):
         description="Whether subcontractors are involved"
     )
 
+    # CBR retrieval override (default: CBR_MODE setting)
+    cbr_mode: Optional[Literal["semantic", "numeric"]] = Field(
+        default=None,
+        description="Similar-case retrieval: semantic (embeddings) or numeric (kNN on job inputs)"
+    )
+
+    # Merger override (default: MERGER_MODE setting)
+    merger: Optional[Literal["auto", "rules", "llm"]] = Field(
+        default=None,
+        description="Merger: rules (deterministic), llm, or auto (LLM only when CBR and ML disagree)"
+    )
+
     # Known price (for comparison/feedback)
     quoted_total: Optional[float] = Field(
         default=None,
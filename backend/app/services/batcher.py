@@ -0,0 +1,137 @@
+"""Micro-batching dispatcher for single-item calls arriving concurrently.
+
+Callers on different threads submit one item each and block on a Future.
+A worker thread collects items for up to window_ms after the first one (or
+until max_size are queued), calls the batch function once on the distinct
+items and fans the results back out. Used to turn concurrent single-query
+embedding calls into one batched encode.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """Coalesce concurrent submit() calls into batched fn(items) calls.
+
+    fn receives a list of distinct items and must return one result per
+    item, in order. An exception from fn is raised in every waiting caller.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[List[Any]], Sequence[Any]],
+        window_ms: float,
+        max_size: int,
+    ):
+        self.name = name
+        self.fn = fn
+        self.window = max(window_ms, 0.0) / 1000.0
+        self.max_size = max(int(max_size), 1)
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the worker after it drains items already queued."""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, item: Any) -> "Future[Any]":
+        """Queue one item; the Future resolves to fn's result for it."""
+        future: "Future[Any]" = Future()
+        if not self.running:
+            # Not started (or shut down): run inline so callers never hang
+            try:
+                future.set_result(self.fn([item])[0])
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self, first: Tuple[Any, Future]) -> Tuple[List[Tuple[Any, Future]], bool]:
+        """Gather items arriving within the window. Returns (batch, stop_requested)."""
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _dispatch(self, batch: List[Tuple[Any, Future]]) -> None:
+        distinct = list(dict.fromkeys(item for item, _ in batch))
+        try:
+            results = self.fn(distinct)
+            by_item = dict(zip(distinct, results))
+            for item, future in batch:
+                future.set_result(by_item[item])
+        except Exception as e:
+            logger.warning(f"{self.name} batch of {len(distinct)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+
+    def _run(self) -> None:
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            batch, stop = self._collect(entry)
+            self._dispatch(batch)
+            if stop:
+                break
+
+        # Anything submitted while stopping runs inline
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                self._dispatch([entry])
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch counters for monitoring."""
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "largest_batch": self.largest_batch,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,197 @@
+"""Bounded in-process LRU caches with hit/miss counters.
+
+Each cache registers itself by name so the health router can report
+hit rates for all of them (GET /health/cache). SQLiteStore adds an
+optional on-disk layer that survives restarts.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# All caches/stores created in this process, by name (anything with stats())
+_registry: Dict[str, Any] = {}
+
+
+class LRUCache:
+    """Thread-safe LRU cache with a size cap and optional time-to-live.
+
+    maxsize <= 0 disables caching (get always misses, put is a no-op).
+    ttl > 0 expires entries that many seconds after they were stored.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float = 0.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        # key -> (expires_at or None, value)
+        self._data: "OrderedDict[Hashable, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _registry[name] = self
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value (marking it recently used) or None."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or time.monotonic() < expires_at:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Size and hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+            if self.ttl > 0:
+                stats["ttl"] = self.ttl
+                stats["expirations"] = self.expirations
+            return stats
+
+
+class SQLiteStore:
+    """Persistent key -> bytes store backed by a single SQLite file.
+
+    Safe to share across threads (one connection guarded by a lock) and
+    across worker processes (SQLite file locking).
+
+    ttl > 0 treats rows older than that many seconds as missing (and
+    deletes them). max_rows > 0 keeps only the most recently stored rows.
+    """
+
+    def __init__(self, name: str, path: str, ttl: float = 0.0, max_rows: int = 0):
+        self.name = name
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_created_at ON cache (created_at)")
+            self._conn.commit()
+        _registry[name] = self
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored bytes or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl > 0 and time.time() - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.expirations += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: bytes) -> None:
+        """Store (or replace) a value, dropping the oldest rows beyond max_rows."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            if self.max_rows > 0:
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_rows,),
+                )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        _registry.pop(self.name, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Row count and hit/miss counters for monitoring."""
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            stats = {
+                "size": size,
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+            if self.max_rows > 0:
+                stats["max_rows"] = self.max_rows
+            if self.ttl > 0:
+                stats["ttl"] = self.ttl
+                stats["expirations"] = self.expirations
+            return stats
+
+
+def all_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Stats for every registered cache, keyed by cache name."""
+    return {name: cache.stats() for name, cache in _registry.items()}
+
+
+def quantize(value: Optional[float], step: float) -> Optional[float]:
+    """Snap a numeric input to a grid so near-identical requests share a key.
+
+    Returns None unchanged. step <= 0 leaves the value as a float.
+    """
+    if value is None:
+        return None
+    if step <= 0:
+        return float(value)
+    return round(round(float(value) / step) * step, 6)
@@ -0,0 +1,40 @@
+"""Flattening cbr_cases.json-shaped cases for the in-process CBR indexes.
+
+local_cbr.py (vector index) and numeric_cbr.py (kNN on job inputs) store
+the same per-case metadata and numeric features, built here.
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+
+# Metadata fields returned per match (same as the Pinecone metadata we read)
+CASE_FIELDS = ("category", "sqft", "total", "per_sqft", "year")
+
+# Raw numeric columns stored in numeric.npy for numeric_cbr.py
+NUMERIC_FIELDS = ("sqft", "complexity", "material_lines", "labor_lines")
+
+
+def case_metadata(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a cbr_cases.json entry the way upload_embeddings.py does."""
+    features = case.get("features", {})
+    pricing = case.get("pricing", {})
+    return {
+        "category": features.get("category", "Unknown"),
+        "sqft": features.get("sqft"),
+        "total": pricing.get("total"),
+        "per_sqft": pricing.get("per_sqft"),
+        "year": case.get("year"),
+    }
+
+
+def case_numeric(case: Dict[str, Any]) -> List[float]:
+    """Numeric features of a case in NUMERIC_FIELDS order (NaN if missing)."""
+    features = case.get("features", {})
+    values = [
+        features.get("sqft"),
+        features.get("complexity_score"),
+        features.get("material_lines", features.get("material_line_count")),
+        features.get("labor_lines", features.get("labor_line_count")),
+    ]
+    return [float(v) if v is not None else np.nan for v in values]
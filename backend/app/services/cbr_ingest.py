@@ -0,0 +1,240 @@
+"""Continuous ingestion of approved submissions into the CBR case base.
+
+approve_submission() hands the approved row to enqueue_submission(), which
+only converts it to a case and puts it on a bounded queue, so approval
+latency doesn't change. A worker thread collects queued cases for up to
+CBR_INGEST_WINDOW_S (or CBR_INGEST_BATCH_SIZE cases), embeds them in one
+embed_texts() call from the same build_query_text the queries use, and
+adds them through pinecone_cbr.add_cases (Pinecone upsert, or a swapped-in
+copy of the local index, plus the numeric kNN index).
+
+Pinecone keeps what it's given. The local indexes are rebuilt from
+cortex-data at startup, so with CBR_BACKEND=local ingested cases are
+appended to CBR_INGEST_LOG_PATH (if set) and replayed by start_ingest().
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+from app.config import settings
+from app.services import pinecone_cbr
+from app.services.embeddings import build_query_text, embed_texts
+
+logger = logging.getLogger(__name__)
+
+# Submissions carry no complexity score; same default as EstimateRequest
+DEFAULT_COMPLEXITY = 10
+
+_STOP = object()
+
+_queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(settings.cbr_ingest_queue_size, 1))
+_thread: Optional[threading.Thread] = None
+_stats = {"queued": 0, "ingested": 0, "batches": 0, "failed": 0, "dropped": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str, n: int = 1) -> None:
+    with _stats_lock:
+        _stats[key] += n
+
+
+def submission_to_case(submission: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Convert an approved submission row into a cbr_cases.json-shaped case.
+
+    Returns None for submissions with no line items or no total (e.g.
+    upsell placeholders), which would only add noise to the case base.
+    """
+    line_items = submission.get("line_items") or []
+    materials = sum(item.get("total", 0) for item in line_items if item.get("type") == "material")
+    labor = sum(item.get("total", 0) for item in line_items if item.get("type") == "labor")
+    total = submission.get("total_price") or materials + labor
+    if not line_items or not total:
+        return None
+
+    sqft = submission.get("sqft") or None
+    approved_at = str(submission.get("approved_at") or "")
+    year = int(approved_at[:4]) if approved_at[:4].isdigit() else datetime.utcnow().year
+
+    return {
+        "case_id": f"{pinecone_cbr.INGESTED_ID_PREFIX}{submission['id']}",
+        "year": year,
+        "features": {
+            "category": submission.get("category") or "Unknown",
+            "sqft": float(sqft) if sqft else None,
+            "complexity_score": submission.get("complexity_score"),
+            "material_line_count": sum(1 for item in line_items if item.get("type") == "material"),
+            "labor_line_count": sum(1 for item in line_items if item.get("type") == "labor"),
+        },
+        "pricing": {
+            "total": float(total),
+            "per_sqft": round(float(total) / float(sqft), 2) if sqft else None,
+            "material_sell": submission.get("total_materials_cost", materials),
+            "labor_sell": submission.get("total_labor_cost", labor),
+        },
+        "line_items": line_items,
+    }
+
+
+def case_text(case: Dict[str, Any]) -> str:
+    """Embedding text for a cbr_cases.json-shaped case (same builder as queries)."""
+    features = case["features"]
+    return build_query_text(
+        sqft=features["sqft"],
+        category=features["category"],
+        complexity=features["complexity_score"] or DEFAULT_COMPLEXITY,
+        material_lines=features["material_line_count"],
+        labor_lines=features["labor_line_count"],
+    )
+
+
+def enqueue_submission(submission: Dict[str, Any]) -> bool:
+    """Queue an approved submission for ingestion. Never blocks or raises.
+
+    Returns:
+        True if the submission was queued
+    """
+    if not is_ingest_running():
+        return False
+    try:
+        case = submission_to_case(submission)
+        if case is None:
+            return False
+        _queue.put_nowait(case)
+    except queue.Full:
+        _count("dropped")
+        logger.warning(f"CBR ingest queue full, dropping submission {submission.get('id')}")
+        return False
+    except Exception as e:
+        logger.warning(f"Could not queue submission {submission.get('id')} for CBR: {e}")
+        return False
+    _count("queued")
+    return True
+
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=1, max=10), reraise=True)
+def _ingest_batch(cases: List[Dict[str, Any]]) -> None:
+    """Embed cases (when a vector backend is up) and add them to the CBR backends."""
+    vectors = None
+    if pinecone_cbr.is_cbr_available():
+        vectors = embed_texts([case_text(case) for case in cases])
+    pinecone_cbr.add_cases(cases, vectors)
+    if vectors is not None and settings.cbr_ingest_log_path and settings.cbr_backend == "local":
+        _append_log(cases, vectors)
+
+
+def _append_log(cases: List[Dict[str, Any]], vectors: np.ndarray) -> None:
+    path = Path(settings.cbr_ingest_log_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as f:
+        for case, vector in zip(cases, vectors):
+            f.write(json.dumps({"case": case, "vector": np.asarray(vector).tolist()}) + "\n")
+
+
+def _replay_log() -> int:
+    """Re-add cases from CBR_INGEST_LOG_PATH (local backend). Returns the count."""
+    path = Path(settings.cbr_ingest_log_path)
+    if not path.exists():
+        return 0
+    # Later lines win for a submission approved more than once
+    entries: Dict[str, Tuple[Dict[str, Any], List[float]]] = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries[entry["case"]["case_id"]] = (entry["case"], entry["vector"])
+    if not entries:
+        return 0
+    cases = [case for case, _ in entries.values()]
+    vectors = np.array([vector for _, vector in entries.values()], dtype=np.float32)
+    pinecone_cbr.add_cases(cases, vectors)
+    return len(cases)
+
+
+def _collect(first: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Gather cases arriving within the window. Returns (batch, stop_requested)."""
+    batch = [first]
+    deadline = time.monotonic() + settings.cbr_ingest_window_s
+    while len(batch) < settings.cbr_ingest_batch_size:
+        remaining = deadline - time.monotonic()
+        try:
+            entry = _queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait()
+        except queue.Empty:
+            break
+        if entry is _STOP:
+            return batch, True
+        batch.append(entry)
+    return batch, False
+
+
+def _dispatch(batch: List[Dict[str, Any]]) -> None:
+    # A resubmitted case replaces the earlier one in the same batch
+    cases = list({case["case_id"]: case for case in batch}.values())
+    try:
+        _ingest_batch(cases)
+    except Exception as e:
+        _count("failed", len(cases))
+        logger.error(f"CBR ingest of {len(cases)} submissions failed: {e}")
+        return
+    _count("ingested", len(cases))
+    _count("batches")
+    logger.info(f"Ingested {len(cases)} approved submissions into the CBR case base")
+
+
+def _run() -> None:
+    while True:
+        entry = _queue.get()
+        if entry is _STOP:
+            break
+        batch, stop = _collect(entry)
+        _dispatch(batch)
+        if stop:
+            break
+
+
+def is_ingest_running() -> bool:
+    return _thread is not None and _thread.is_alive()
+
+
+def start_ingest():
+    """Replay the local ingest log and start the worker. Called from lifespan."""
+    global _thread
+    if not settings.cbr_ingest_enabled or is_ingest_running():
+        return
+    if settings.cbr_ingest_log_path and settings.cbr_backend == "local":
+        try:
+            replayed = _replay_log()
+            if replayed:
+                logger.info(f"Replayed {replayed} ingested submissions into the local CBR index")
+        except Exception as e:
+            logger.warning(f"Could not replay CBR ingest log: {e}")
+    _thread = threading.Thread(target=_run, name="cbr-ingest", daemon=True)
+    _thread.start()
+
+
+def stop_ingest(timeout: float = 30.0):
+    """Stop the worker after it drains queued submissions. Called on shutdown."""
+    global _thread
+    if _thread is None:
+        return
+    try:
+        _queue.put(_STOP, timeout=timeout)
+    except queue.Full:
+        logger.warning("CBR ingest queue still full at shutdown")
+    _thread.join(timeout)
+    _thread = None
+
+
+def ingest_stats() -> Dict[str, Any]:
+    """Ingestion counters for monitoring."""
+    with _stats_lock:
+        stats = dict(_stats)
+    return {"running": is_ingest_running(), "pending": _queue.qsize(), **stats}
@@ -0,0 +1,68 @@
+"""Category partitions of the CBR case base (CBR_PARTITIONED=true).
+
+Each category lives in its own Pinecone namespace ("cbr-bardeaux", ...) or
+contiguous shard of the local index, so a query searches one small
+partition with a plain sqft filter instead of the whole case base with a
+compound category + sqft filter. When the job's own partition holds fewer
+than CBR_PARTITION_MIN_CASES cases, neighboring categories are added (then
+the largest remaining ones) until it does.
+"""
+
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+# Categories whose jobs are most alike, in order of preference
+NEIGHBORS: Dict[str, List[str]] = {
+    "bardeaux": ["elastomere", "other"],
+    "elastomere": ["bardeaux", "other"],
+    "gutters": ["heat_cables", "other"],
+    "heat_cables": ["gutters", "other"],
+    "insulation": ["ventilation", "other"],
+    "ventilation": ["insulation", "skylights", "other"],
+    "skylights": ["ventilation", "other"],
+    "service_call": ["other", "unknown"],
+    "other": ["unknown", "bardeaux"],
+    "unknown": ["other"],
+}
+
+
+def category_slug(category: Optional[str]) -> str:
+    """ASCII partition key for a category ("Élastomère" -> "elastomere")."""
+    ascii_name = unicodedata.normalize("NFKD", category or "").encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", ascii_name.lower()).strip("_") or "unknown"
+
+
+def partition_namespace(category: Optional[str], base: str = "cbr") -> str:
+    """Pinecone namespace holding a category's cases."""
+    return f"{base}-{category_slug(category)}"
+
+
+def select_partitions(
+    category: Optional[str],
+    sizes: Dict[str, int],
+    min_cases: int,
+) -> List[str]:
+    """Partition slugs to search for a job in this category.
+
+    Args:
+        category: Job category (None searches every partition)
+        sizes: Case count per partition slug
+        min_cases: Fan out until the selected partitions hold this many cases
+
+    Returns:
+        Slugs, the job's own partition first
+    """
+    if not category:
+        return list(sizes)
+    own = category_slug(category)
+    selected = [own] if own in sizes else []
+    total = sum(sizes[slug] for slug in selected)
+    fallback = sorted(sizes, key=lambda slug: -sizes[slug])
+    for slug in NEIGHBORS.get(own, []) + fallback:
+        if total >= min_cases:
+            break
+        if slug in sizes and slug not in selected:
+            selected.append(slug)
+            total += sizes[slug]
+    return selected
@@ -24,7 +24,8 @@ from openai import (
 )
 
 from app.config import settings
-from app.services.llm_reasoning import get_client
+from app.services.llm_reasoning import get_async_client
+from app.services.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -158,7 +159,7 @@ async def extract_fields(
     Raises:
         Exception: On API errors after retries exhausted
     """
-    client = get_client()  # Reuse OpenRouter client
+    client = get_async_client()  # Reuse OpenRouter connection pool
 
     # Select system prompt based on language
     system_prompt = (
@@ -184,18 +185,20 @@ async def extract_fields(
         messages.append({"role": "system", "content": context_msg})
 
     # Call OpenRouter
-    response = client.chat.completions.create(
-        model=settings.openrouter_model,  # gpt-4o-mini
-        messages=messages,
-        max_tokens=500,
-        temperature=0.2,  # Low temperature for reliable extraction
-    )
+    with span("llm"):
+        response = await client.chat.completions.create(
+            model=settings.openrouter_model,  # gpt-4o-mini
+            messages=messages,
+            max_tokens=500,
+            temperature=0.2,  # Low temperature for reliable extraction
+        )
 
     response_text = response.choices[0].message.content.strip()
 
     # Parse JSON response (with regex fallback like hybrid_quote.py)
     try:
-        data = _extract_json(response_text)
+        with span("llm_parse"):
+            data = _extract_json(response_text)
 
         # Validate structure
         if "extracted" not in data or "reply" not in data:
@@ -0,0 +1,177 @@
+"""Precomputed query embeddings over a grid of estimate inputs.
+
+build_query_text only varies with category, sqft, complexity and the two
+line counts, so scripts/build_embedding_table.py embeds a quantized grid of
+those inputs offline into one float16 array:
+
+    vectors[category, sqft, complexity, material_lines, labor_lines, dim]
+
+At serving time a query snaps complexity and line counts to the nearest
+grid value and interpolates linearly between the two neighboring sqft
+buckets (log scale), so no model is needed for any category in the table.
+Index 0 on each line-count and sqft axis is the "omitted" value
+(build_query_text drops falsy parts).
+"""
+
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TABLE_DIR = Path(__file__).parent.parent / "models" / "embedding_table"
+META_NAME = "table.json"
+
+# Default grid: ~32k texts, ~24MB as float16
+DEFAULT_GRID: Dict[str, List[float]] = {
+    "sqft": [0] + [round(float(v)) for v in np.geomspace(100, 20000, 23)],
+    "complexity": [1] + list(range(10, 101, 10)),
+    "material_lines": [0, 5, 10, 20],
+    "labor_lines": [0, 2, 5],
+}
+
+
+class EmbeddingTable:
+    """Memory-mapped float16 embedding grid with nearest/interpolated lookup."""
+
+    def __init__(self, path: Path = TABLE_DIR):
+        self.path = Path(path)
+        with open(self.path / META_NAME) as f:
+            self.meta: Dict[str, Any] = json.load(f)
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.categories: Dict[str, int] = {c: i for i, c in enumerate(self.meta["categories"])}
+        grid = self.meta["grid"]
+        self.sqft = np.asarray(grid["sqft"], dtype=np.float64)
+        self.complexity = np.asarray(grid["complexity"], dtype=np.float64)
+        self.material_lines = np.asarray(grid["material_lines"], dtype=np.float64)
+        self.labor_lines = np.asarray(grid["labor_lines"], dtype=np.float64)
+        # Positive sqft buckets (axis index 1..) on a log scale for interpolation
+        self._log_sqft = np.log(self.sqft[1:])
+
+    @property
+    def model_name(self) -> str:
+        return self.meta["model"]
+
+    @staticmethod
+    def _nearest(axis: np.ndarray, value: Optional[float]) -> int:
+        return int(np.abs(axis - (value or 0)).argmin())
+
+    def _sqft_weights(self, sqft: Optional[float]) -> List[Tuple[int, float]]:
+        """[(axis index, weight)] for one or two sqft buckets."""
+        if not sqft or sqft <= 0:
+            return [(0, 1.0)]
+        x = np.log(sqft)
+        if x <= self._log_sqft[0]:
+            return [(1, 1.0)]
+        if x >= self._log_sqft[-1]:
+            return [(len(self.sqft) - 1, 1.0)]
+        hi = int(np.searchsorted(self._log_sqft, x))
+        lo = hi - 1
+        t = (x - self._log_sqft[lo]) / (self._log_sqft[hi] - self._log_sqft[lo])
+        return [(lo + 1, 1.0 - t), (hi + 1, t)]
+
+    def lookup(
+        self,
+        sqft: Optional[float],
+        category: str,
+        complexity: int,
+        material_lines: Optional[int] = None,
+        labor_lines: Optional[int] = None,
+    ) -> Optional[np.ndarray]:
+        """Float32 embedding for the inputs, or None if the category isn't in the table."""
+        c = self.categories.get(category)
+        if c is None:
+            return None
+        cx = self._nearest(self.complexity, complexity)
+        ml = self._nearest(self.material_lines, material_lines)
+        ll = self._nearest(self.labor_lines, labor_lines)
+
+        vector = np.zeros(self.vectors.shape[-1], dtype=np.float32)
+        for s, weight in self._sqft_weights(sqft):
+            vector += weight * self.vectors[c, s, cx, ml, ll].astype(np.float32)
+        return vector
+
+
+def build_embedding_table(
+    encode_batch: Callable[[List[str]], np.ndarray],
+    build_text: Callable[..., str],
+    categories: List[str],
+    model_name: str,
+    out_dir: Path = TABLE_DIR,
+    grid: Optional[Dict[str, List[float]]] = None,
+    batch_size: int = 256,
+) -> Dict[str, Any]:
+    """Embed every grid point and write the table directory.
+
+    Writes to a temporary sibling directory and swaps it in.
+
+    Returns:
+        The written metadata
+    """
+    grid = grid or DEFAULT_GRID
+    axes = [grid["sqft"], grid["complexity"], grid["material_lines"], grid["labor_lines"]]
+    shape = (len(categories), *(len(a) for a in axes))
+
+    texts = [
+        build_text(
+            sqft=float(sqft),  # Requests carry float sqft ("1500.0 pieds carres")
+            category=category,
+            complexity=int(complexity),
+            material_lines=int(material_lines),
+            labor_lines=int(labor_lines),
+        )
+        for category in categories
+        for sqft in grid["sqft"]
+        for complexity in grid["complexity"]
+        for material_lines in grid["material_lines"]
+        for labor_lines in grid["labor_lines"]
+    ]
+
+    chunks = []
+    for start in range(0, len(texts), batch_size):
+        chunks.append(np.asarray(encode_batch(texts[start:start + batch_size]), dtype=np.float16))
+        logger.info(f"Embedded {min(start + batch_size, len(texts))}/{len(texts)} grid texts")
+    vectors = np.concatenate(chunks).reshape(*shape, -1)
+
+    out_dir = Path(out_dir)
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / "vectors.npy", vectors)
+    meta = {
+        "model": model_name,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "dimension": int(vectors.shape[-1]),
+        "categories": list(categories),
+        "grid": {k: list(v) for k, v in grid.items()},
+    }
+    with open(tmp_dir / META_NAME, "w") as f:
+        json.dump(meta, f, indent=2)
+
+    old_dir = out_dir.with_name(out_dir.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if out_dir.exists():
+        out_dir.rename(old_dir)
+    tmp_dir.rename(out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return meta
+
+
+def load_embedding_table(path: Path = TABLE_DIR) -> Optional[EmbeddingTable]:
+    """Open the table directory, or None if it hasn't been built."""
+    if not (Path(path) / META_NAME).exists():
+        logger.warning(f"Embedding table not found at {path} (run scripts/build_embedding_table.py)")
+        return None
+    table = EmbeddingTable(path)
+    logger.info(
+        f"Embedding table loaded ({len(table.categories)} categories, "
+        f"{table.vectors.size // table.vectors.shape[-1]} grid points)"
+    )
+    return table
@@ -1,17 +1,45 @@
 """Query embedding generation using sentence-transformers.
 
 Pre-loads model at startup when Pinecone is configured to avoid request timeouts.
+Concurrent cache misses are coalesced by a MicroBatcher into one batched
+encode (EMBEDDING_BATCH_WINDOW_MS / EMBEDDING_BATCH_MAX_SIZE).
+EMBEDDING_TABLE=true answers embed_query() from a precomputed grid (see
+embedding_table.py) and only falls back to the model off-table.
+EMBEDDING_BACKEND=onnx serves the same model as an int8-quantized ONNX graph
+(see onnx_embedder.py), so torch is never imported at runtime.
+Query texts from build_query_text repeat constantly, so vectors are cached
+in an in-memory LRU and, when EMBEDDING_CACHE_PATH is set, a SQLite file
+that survives restarts.
 """
 
 import gc
 import logging
 from typing import List, Optional
 
+import numpy as np
+
+from app.config import settings
+from app.services.batcher import MicroBatcher
+from app.services.cache import LRUCache, SQLiteStore
+from app.services.embedding_table import EmbeddingTable, load_embedding_table
+from app.services.onnx_embedder import ONNX_DIR, OnnxEmbedder, onnx_available
+from app.services.tracing import span, traced
+
 logger = logging.getLogger(__name__)
 
+# Same model used to generate cbr_embeddings.npz
+EMBEDDING_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+
 _model = None
+_backend: Optional[str] = None
 _should_load = False
 
+# Query text -> embedding (tuple of floats)
+_cache = LRUCache("embeddings", settings.embedding_cache_size)
+_store: Optional[SQLiteStore] = None
+_batcher: Optional[MicroBatcher] = None
+_table: Optional[EmbeddingTable] = None
+
 
 def load_embedding_model(eager: bool = False):
     """Load embedding model.
@@ -19,20 +47,70 @@ def load_embedding_model(eager: bool = False):
     Args:
         eager: If True, load model immediately (called when Pinecone is configured)
     """
-    global _should_load
+    global _should_load, _store, _batcher, _table
     _should_load = eager
 
-    if eager:
+    if settings.embedding_table and _table is None:
+        _table = load_embedding_table()
+        if _table is not None and _table.model_name != EMBEDDING_MODEL_NAME:
+            logger.warning(
+                f"Embedding table built with {_table.model_name}, "
+                f"expected {EMBEDDING_MODEL_NAME}; ignoring it"
+            )
+            _table = None
+
+    if settings.embedding_cache_path and _store is None:
+        _store = SQLiteStore("embeddings_disk", settings.embedding_cache_path)
+        logger.info(f"Embedding disk cache at {settings.embedding_cache_path}")
+
+    if settings.embedding_batch_window_ms > 0 and _batcher is None:
+        _batcher = MicroBatcher(
+            "embeddings",
+            _encode_batch,
+            settings.embedding_batch_window_ms,
+            settings.embedding_batch_max_size,
+        )
+        _batcher.start()
+
+    if eager and _table is not None:
+        # Table covers every allowed category; the model loads lazily if needed
+        logger.info("Embedding table loaded, skipping model pre-load")
+    elif eager:
         logger.info("Pre-loading embedding model at startup (Pinecone configured)...")
         _get_model()  # Force immediate load
     else:
         logger.info("Embedding model disabled (Pinecone not configured)")
 
 
+def _get_backend() -> str:
+    """Resolve EMBEDDING_BACKEND ("torch" or "onnx") once per process.
+
+    Falls back to torch when the ONNX export or its runtime is missing.
+    """
+    global _backend
+    if _backend is None:
+        _backend = "torch"
+        if settings.embedding_backend == "onnx":
+            if onnx_available(ONNX_DIR):
+                _backend = "onnx"
+            else:
+                logger.warning(
+                    f"EMBEDDING_BACKEND=onnx but no usable export in {ONNX_DIR} "
+                    "(run scripts/export_onnx_embedder.py), using torch"
+                )
+        elif settings.embedding_backend != "torch":
+            logger.warning(f"Unknown EMBEDDING_BACKEND={settings.embedding_backend}, using torch")
+    return _backend
+
+
 def _get_model():
     """Get or load the embedding model (lazy singleton)."""
     global _model
-    if _model is None:
+    if _model is None and _get_backend() == "onnx":
+        logger.info("Loading quantized ONNX embedding model (first use)...")
+        _model = OnnxEmbedder(ONNX_DIR)
+        logger.info("Embedding model loaded (onnx)")
+    elif _model is None:
         # Delay torch import to startup
         import torch
         torch.set_grad_enabled(False)
@@ -42,7 +120,7 @@ def _get_model():
 
         # Use multilingual model for French content
         # Same model used to generate cbr_embeddings.npz
-        _model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        _model = SentenceTransformer(EMBEDDING_MODEL_NAME)
         _model.eval()
 
         gc.collect()
@@ -52,21 +130,98 @@ def _get_model():
 
 def unload_embedding_model():
     """Cleanup on shutdown."""
-    global _model
+    global _model, _backend, _store, _batcher, _table
+    if _batcher is not None:
+        _batcher.stop()
+        _batcher = None
     _model = None
+    _backend = None
+    _table = None
+    _cache.clear()
+    if _store is not None:
+        _store.close()
+        _store = None
     gc.collect()
 
 
-def generate_query_embedding(text: str) -> List[float]:
-    """Generate 384-dim embedding for query text."""
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    """Run the embedding model on a batch of texts, shape (len(texts), 384) float32."""
+    model = _get_model()
+    if _get_backend() == "onnx":
+        return model.encode(texts)
+
     import torch
 
-    model = _get_model()
     with torch.inference_mode():
-        embedding = model.encode(text, convert_to_numpy=True)
-    return embedding.tolist()
+        embeddings = model.encode(texts, batch_size=len(texts), convert_to_numpy=True)
+    return embeddings.astype(np.float32)
+
+
+def embed_texts(texts: List[str]) -> np.ndarray:
+    """Embed many texts in one model call (bulk/background use, bypasses the caches)."""
+    if not texts:
+        return np.zeros((0, 384), dtype=np.float32)
+    return _encode_batch(list(texts))
 
 
+def _encode(text: str) -> np.ndarray:
+    """Run the embedding model on one text, through the batcher when it's running."""
+    if _batcher is not None and _batcher.running:
+        return _batcher.submit(text).result()
+    return _encode_batch([text])[0]
+
+
+@traced("embed")
+def generate_query_embedding(text: str) -> List[float]:
+    """Generate 384-dim embedding for query text.
+
+    Checks the in-memory cache, then the disk cache, before running the model.
+    """
+    # Backends differ slightly (int8 vs fp32), so their vectors are cached apart
+    key = f"{EMBEDDING_MODEL_NAME}:{_get_backend()}:{text}"
+    cached = _cache.get(key)
+    if cached is not None:
+        return list(cached)
+
+    if _store is not None:
+        blob = _store.get(key)
+        if blob is not None:
+            vector = np.frombuffer(blob, dtype=np.float32).tolist()
+            _cache.put(key, tuple(vector))
+            return vector
+
+    embedding = _encode(text)
+    vector = embedding.tolist()
+    _cache.put(key, tuple(vector))
+    if _store is not None:
+        _store.put(key, embedding.tobytes())
+    return vector
+
+
+def embed_query(
+    sqft: Optional[float],
+    category: str,
+    complexity: int,
+    material_lines: Optional[int] = None,
+    labor_lines: Optional[int] = None,
+) -> List[float]:
+    """Embedding for estimate inputs: table lookup when loaded, else the model."""
+    if _table is not None:
+        with span("embed"):
+            vector = _table.lookup(sqft, category, complexity, material_lines, labor_lines)
+        if vector is not None:
+            return vector.tolist()
+    query_text = build_query_text(
+        sqft=sqft,
+        category=category,
+        complexity=complexity,
+        material_lines=material_lines,
+        labor_lines=labor_lines,
+    )
+    return generate_query_embedding(query_text)
+
+
+@traced("query_build")
 def build_query_text(
     sqft: float,
     category: str,
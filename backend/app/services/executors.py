@@ -0,0 +1,169 @@
+"""Dedicated thread pools for CPU inference and blocking I/O, plus admission control.
+
+Model inference (price/material models, embeddings, numeric kNN) runs on
+the "cpu" pool and blocking I/O (SQLite caches, Supabase writes, sync
+Pinecone fallback) on the "io" pool, so a burst of quotes can't take the
+threads Starlette uses for plain sync routes (dashboard, feedback, ...).
+
+Routes that queue CPU work call admit_cpu_work() first: once
+ADMISSION_CPU_QUEUE_LIMIT tasks are waiting for a CPU worker, they get a
+429 with a Retry-After estimated from the backlog instead of an
+ever-growing latency. Queue depth and task latency per pool are reported
+at GET /health/executors.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.services.resilience import LatencyWindow
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedExecutor:
+    """Named fixed-size thread pool with queue-depth and latency gauges."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(max_workers, 1)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latency = LatencyWindow()
+
+    def _run(self, call: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        start = time.perf_counter()
+        try:
+            return call()
+        finally:
+            self.latency.record(time.perf_counter() - start)
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run fn(*args, **kwargs) on this pool (in the caller's context) and await it."""
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+        with self._lock:
+            self.queued += 1
+        try:
+            future = self._pool.submit(self._run, call)
+        except RuntimeError:
+            # Pool already shut down
+            self._dequeue()
+            raise
+        # A caller cancelled before a worker picked it up (timeout, client gone)
+        future.add_done_callback(lambda f: self._dequeue() if f.cancelled() else None)
+        return await asyncio.wrap_future(future)
+
+    def _dequeue(self) -> None:
+        with self._lock:
+            self.queued -= 1
+
+    def reject(self) -> int:
+        """Count a request turned away by admission control; returns its Retry-After."""
+        with self._lock:
+            self.rejected += 1
+        return self.retry_after()
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (1-60)."""
+        per_task = self.latency.percentile(50)
+        if per_task is None:
+            return max(settings.admission_retry_after_s, 1)
+        return min(max(math.ceil(self.queued * per_task / self.max_workers), 1), 60)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {
+                "workers": self.max_workers,
+                "active": self.active,
+                "queued": self.queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+        return {**counters, "latency": self.latency.stats()}
+
+
+# Module-level executors (same pattern as predictor.py, pinecone_cbr.py)
+_cpu: Optional[BoundedExecutor] = None
+_io: Optional[BoundedExecutor] = None
+
+
+def init_executors():
+    """Create the CPU and I/O pools. Called from lifespan."""
+    global _cpu, _io
+    cpu_workers = settings.cpu_executor_workers or os.cpu_count() or 4
+    _cpu = BoundedExecutor("cpu", cpu_workers)
+    _io = BoundedExecutor("io", settings.io_executor_workers)
+    logger.info(f"Executors ready: cpu={_cpu.max_workers} workers, io={_io.max_workers} workers")
+
+
+def shutdown_executors():
+    """Cleanup on shutdown."""
+    global _cpu, _io
+    for executor in (_cpu, _io):
+        if executor is not None:
+            executor.shutdown()
+    _cpu = None
+    _io = None
+
+
+async def run_cpu(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run CPU-bound work (model inference) off the event loop."""
+    if _cpu is None:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return await _cpu.run(fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run blocking I/O (SQLite, Supabase, sync HTTP clients) off the event loop."""
+    if _io is None:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return await _io.run(fn, *args, **kwargs)
+
+
+def admit_cpu_work() -> None:
+    """Reject the request with 429 + Retry-After if the CPU queue is full.
+
+    Raises:
+        HTTPException: 429 when ADMISSION_CPU_QUEUE_LIMIT tasks are already waiting
+    """
+    limit = settings.admission_cpu_queue_limit
+    if _cpu is None or limit <= 0 or _cpu.queued < limit:
+        return
+    retry_after = _cpu.reject()
+    logger.warning(f"CPU queue at {_cpu.queued} (limit {limit}), rejecting request")
+    raise HTTPException(
+        status_code=429,
+        detail="Server busy, retry shortly",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def executor_stats() -> Dict[str, Any]:
+    """Gauges for every pool, plus the admission limit."""
+    return {
+        "executors": {e.name: e.stats() for e in (_cpu, _io) if e is not None},
+        "admission": {"cpu_queue_limit": settings.admission_cpu_queue_limit},
+    }
@@ -5,18 +5,30 @@ in parallel, then uses OpenRouter LLM to merge results into final quote.
 
 Architecture:
 1. Parallel: CBR query + ML prediction (asyncio.gather)
-2. Sequential: LLM merger with JSON output + Pydantic validation
-3. Confidence scoring from combined signals
+2. Confidence scoring from combined signals
+3. Merger: deterministic rules (rule_merger), escalating to the LLM
+   (JSON output + Pydantic validation) when rule_merge_score (case
+   similarity, case count, ML vs CBR price spread) is below
+   MERGER_LLM_THRESHOLD or the request asks for it
+
+stream_hybrid_quote runs the same stages but yields each result as soon as
+it's available (ML, then CBR + confidence, then LLM tokens if the LLM
+merges, then the validated quote) for the SSE endpoint.
+
+Validated merger outputs are cached by a hash of the rendered prompt, the
+model and MERGER_PROMPT_VERSION (in memory, plus a SQLite file if
+MERGER_CACHE_PATH is set), so repeat quotes skip the LLM.
 
 Response time target: <5 seconds
 """
 
 import asyncio
+import hashlib
 import json
 import logging
 import re
 import time
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.config import settings
 from app.schemas.hybrid_quote import (
@@ -25,19 +37,68 @@ from app.schemas.hybrid_quote import (
     HybridQuoteOutput,
     PricingTier,
 )
+from app.services.cache import LRUCache, SQLiteStore
 from app.services.confidence_scorer import (
     calculate_confidence,
     calculate_confidence_ml_only,
     calculate_data_completeness,
 )
-from app.services.embeddings import build_query_text, generate_query_embedding
-from app.services.llm_reasoning import get_client  # Reuse existing OpenRouter client
+from app.services.embeddings import embed_query
+from app.services.executors import run_cpu, run_io
+from app.services.llm_reasoning import get_async_client  # Reuse existing OpenRouter pool
 from app.services.material_predictor import predict_materials
-from app.services.pinecone_cbr import is_pinecone_available, query_similar_cases
+from app.services.pinecone_cbr import (
+    aquery_similar_cases,
+    is_cbr_available,
+    pinecone_latency,
+    query_numeric_cases,
+    use_numeric_cbr,
+)
 from app.services.predictor import predict
+from app.services.resilience import CircuitBreaker, hedged
+from app.services.rule_merger import complexity_hours, merge_by_rules, rule_merge_score
+from app.services.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
+# Pinecone health across requests (process-wide)
+_cbr_breaker = CircuitBreaker("cbr", settings.cbr_breaker_failures, settings.cbr_breaker_cooldown_s)
+
+# Bump when _format_merger_prompt or _merger_messages change meaning, so
+# outputs cached for the old prompt are no longer served
+MERGER_PROMPT_VERSION = "1"
+
+# Merger cache key -> validated HybridQuoteOutput
+_merger_cache = LRUCache("llm_merger", settings.merger_cache_size, ttl=settings.merger_cache_ttl_s)
+_merger_store: Optional[SQLiteStore] = None
+
+
+def cbr_health() -> Dict[str, Any]:
+    """Circuit breaker state and recent Pinecone latency for /health/cbr."""
+    return {"breaker": _cbr_breaker.stats(), "latency": pinecone_latency.stats()}
+
+
+def init_merger_cache():
+    """Open the merger's SQLite cache if MERGER_CACHE_PATH is set. Called from lifespan."""
+    global _merger_store
+    if settings.merger_cache_path and _merger_store is None and settings.merger_cache_size > 0:
+        _merger_store = SQLiteStore(
+            "llm_merger_disk",
+            settings.merger_cache_path,
+            ttl=settings.merger_cache_ttl_s,
+            max_rows=settings.merger_cache_max_rows,
+        )
+        logger.info(f"LLM merger disk cache at {settings.merger_cache_path}")
+
+
+def close_merger_cache():
+    """Cleanup on shutdown."""
+    global _merger_store
+    if _merger_store is not None:
+        _merger_store.close()
+        _merger_store = None
+    _merger_cache.clear()
+
 
 def _get_complexity_for_ml(request: HybridQuoteRequest) -> int:
     """Get complexity score for ML models (0-100 scale or legacy 0-56).
@@ -58,54 +119,109 @@ def _get_complexity_for_ml(request: HybridQuoteRequest) -> int:
         return 28  # Default moderate
 
 
+def _hedge_delay() -> Optional[float]:
+    """Delay before a hedged Pinecone request: recent p95, or None if disabled."""
+    if not settings.cbr_hedge_enabled:
+        return None
+    p95 = pinecone_latency.percentile(95)
+    if p95 is None:
+        return settings.cbr_hedge_default_delay_s
+    return max(p95, settings.cbr_hedge_min_delay_s)
+
+
 async def _run_cbr_query(request: HybridQuoteRequest) -> List[Dict[str, Any]]:
     """Run CBR query in async context.
 
-    Wraps synchronous Pinecone query in run_in_executor for async compatibility.
+    Embeds in the executor (CPU work) and awaits Pinecone on the asyncio client.
     Skips embedding generation if Pinecone not configured (saves ~500MB RAM).
+    Only the vector-store query runs under CBR_TIMEOUT_S, the optional hedged
+    request and the circuit breaker, so a slow embedding under CPU load can't
+    trip the breaker while Pinecone is healthy. Any failure returns [] so the
+    quote falls back to ML-only confidence.
     """
+    if use_numeric_cbr(request.cbr_mode):
+        # Numeric kNN on the job inputs, no embedding model involved
+        def sync_numeric_cbr():
+            t0 = time.time()
+            with span("vector_search"):
+                results = query_numeric_cases(
+                    sqft=request.sqft,
+                    category=request.category,
+                    complexity=_get_complexity_for_ml(request),
+                    material_lines=request.material_lines,
+                    labor_lines=request.labor_lines,
+                    top_k=5,
+                    sqft_filter=request.sqft,  # Filter to 0.5x-2x sqft range
+                )
+            logger.info(f"CBR timing: numeric_knn={time.time()-t0:.3f}s")
+            return results
+
+        return await run_cpu(sync_numeric_cbr)
+
     # Early return if Pinecone not configured - avoids loading 500MB embedding model
-    if not is_pinecone_available():
+    if not is_cbr_available():
         logger.info("Pinecone not configured, skipping CBR query")
         return []
 
-    loop = asyncio.get_event_loop()
+    if not _cbr_breaker.allow():
+        logger.warning("CBR circuit open, skipping CBR query (ML-only)")
+        return []
 
-    def sync_cbr():
-        t0 = time.time()
-        # Get complexity score for CBR query
+    def sync_embed():
         complexity_score = _get_complexity_for_ml(request)
-        query_text = build_query_text(
+        return embed_query(
             sqft=request.sqft,
             category=request.category,
             complexity=complexity_score,
             material_lines=request.material_lines,
             labor_lines=request.labor_lines,
         )
-        t1 = time.time()
-        query_vector = generate_query_embedding(query_text)
-        t2 = time.time()
-        results = query_similar_cases(
+
+    async def query(query_vector):
+        # Awaited on the asyncio Pinecone client, no executor thread held.
+        # Round-trip latency (for the hedge delay) is recorded by pinecone_cbr,
+        # which skips result-cache hits
+        return await aquery_similar_cases(
             query_vector=query_vector,
             top_k=5,
             category_filter=None,  # Let similarity decide
             sqft_filter=request.sqft,  # Filter to 0.5x-2x sqft range
+            category=request.category,  # Partition routing (CBR_PARTITIONED)
         )
-        t3 = time.time()
-        logger.info(f"CBR timing: build_query={t1-t0:.3f}s, embedding={t2-t1:.3f}s, pinecone={t3-t2:.3f}s")
-        return results
 
-    return await loop.run_in_executor(None, sync_cbr)
+    t0 = time.time()
+    try:
+        query_vector = await run_cpu(sync_embed)
+    except Exception as e:
+        # Local failure, says nothing about Pinecone health
+        logger.warning(f"CBR embedding failed ({e}), continuing ML-only")
+        return []
+    t1 = time.time()
+
+    async def search():
+        with span("vector_search"):
+            return await hedged(lambda: query(query_vector), _hedge_delay())
+
+    try:
+        results = await asyncio.wait_for(search(), timeout=settings.cbr_timeout_s)
+    except Exception as e:
+        # Timeout or Pinecone error: degrade to ML-only instead of failing the quote
+        _cbr_breaker.record_failure()
+        reason = "deadline exceeded" if isinstance(e, asyncio.TimeoutError) else str(e)
+        logger.warning(f"CBR query failed ({reason}), continuing ML-only")
+        return []
+
+    _cbr_breaker.record_success()
+    logger.info(f"CBR timing: embedding={t1-t0:.3f}s, pinecone={time.time()-t1:.3f}s")
+    return results
 
 
 async def _run_ml_prediction(request: HybridQuoteRequest) -> Dict[str, Any]:
     """Run ML prediction in async context.
 
-    Wraps synchronous ML prediction in run_in_executor for async compatibility.
+    Runs the synchronous ML prediction on the CPU executor.
     Calls both price predictor and material predictor.
     """
-    loop = asyncio.get_event_loop()
-
     def sync_ml():
         # Get complexity score for ML models
         complexity_score = _get_complexity_for_ml(request)
@@ -138,7 +254,7 @@ async def _run_ml_prediction(request: HybridQuoteRequest) -> Dict[str, Any]:
             "materials": material_result,
         }
 
-    return await loop.run_in_executor(None, sync_ml)
+    return await run_cpu(sync_ml)
 
 
 def _format_merger_prompt(
@@ -287,6 +403,67 @@ def _normalize_confidence_values(data: dict) -> dict:
     return data
 
 
+def _merger_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "system",
+            "content": "You are a roofing quote merger. Output ONLY valid JSON, no markdown or explanation.",
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+@traced("llm_parse")
+def _parse_merger_output(response_text: str) -> HybridQuoteOutput:
+    """Parse and validate the merger's JSON answer."""
+    try:
+        data = _extract_json(response_text)
+        # Normalize confidence values (LLM sometimes returns 0-100 instead of 0-1)
+        data = _normalize_confidence_values(data)
+        return HybridQuoteOutput.model_validate(data)
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.error(f"Failed to parse LLM response: {e}")
+        logger.debug(f"Response was: {response_text[:500]}")
+        raise ValueError(f"LLM did not produce valid JSON: {e}")
+
+
+def _merger_cache_key(prompt: str) -> str:
+    """Hash of everything that determines the merger's answer.
+
+    The rendered prompt is the canonical form of the inputs: it holds only
+    the fields the LLM sees, already rounded the way it sees them.
+    """
+    payload = json.dumps(
+        {"version": MERGER_PROMPT_VERSION, "model": settings.openrouter_model, "prompt": prompt},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+async def _get_cached_merger_output(key: str) -> Optional[HybridQuoteOutput]:
+    """Cached merger output (memory, then disk) or None."""
+    output = _merger_cache.get(key)
+    if output is None and _merger_store is not None:
+        try:
+            raw = await run_io(_merger_store.get, key)
+            if raw is not None:
+                output = HybridQuoteOutput.model_validate_json(raw)
+                _merger_cache.put(key, output)
+        except Exception as e:
+            logger.warning(f"LLM merger disk cache read failed: {e}")
+    # Callers get their own copy to build the response from
+    return output.model_copy(deep=True) if output is not None else None
+
+
+async def _cache_merger_output(key: str, output: HybridQuoteOutput) -> None:
+    _merger_cache.put(key, output.model_copy(deep=True))
+    if _merger_store is not None:
+        try:
+            await run_io(_merger_store.put, key, output.model_dump_json().encode())
+        except Exception as e:
+            logger.warning(f"LLM merger disk cache write failed: {e}")
+
+
 async def _merge_with_llm(
     request: HybridQuoteRequest,
     ml_result: Dict[str, Any],
@@ -295,38 +472,51 @@ async def _merge_with_llm(
     """Use OpenRouter LLM to merge CBR + ML into final quote.
 
     Reuses the existing OpenRouter client from llm_reasoning module.
-    Uses JSON-in-prompt approach with Pydantic validation.
+    Uses JSON-in-prompt approach with Pydantic validation. Identical
+    prompts are answered from the merger cache.
     """
-    client = get_client()  # Reuse existing OpenRouter client
-
     prompt = _format_merger_prompt(request, ml_result, cbr_cases)
+    cache_key = _merger_cache_key(prompt)
+    cached = await _get_cached_merger_output(cache_key)
+    if cached is not None:
+        logger.info("LLM merger cache hit")
+        return cached
+
+    client = get_async_client()  # Reuse existing OpenRouter pool
 
     # Call OpenRouter with JSON instruction
-    response = client.chat.completions.create(
-        model=settings.openrouter_model,
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a roofing quote merger. Output ONLY valid JSON, no markdown or explanation.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=2000,
-        temperature=0.2,
-    )
+    with span("llm"):
+        response = await client.chat.completions.create(
+            model=settings.openrouter_model,
+            messages=_merger_messages(prompt),
+            max_tokens=2000,
+            temperature=0.2,
+        )
 
     response_text = response.choices[0].message.content.strip()
 
     # Parse JSON and validate with Pydantic
-    try:
-        data = _extract_json(response_text)
-        # Normalize confidence values (LLM sometimes returns 0-100 instead of 0-1)
-        data = _normalize_confidence_values(data)
-        return HybridQuoteOutput.model_validate(data)
-    except (json.JSONDecodeError, ValueError) as e:
-        logger.error(f"Failed to parse LLM response: {e}")
-        logger.debug(f"Response was: {response_text[:500]}")
-        raise ValueError(f"LLM did not produce valid JSON: {e}")
+    merged = _parse_merger_output(response_text)
+    await _cache_merger_output(cache_key, merged)
+    return merged
+
+
+async def _stream_merger_tokens(prompt: str) -> AsyncIterator[str]:
+    """Same LLM merger call as _merge_with_llm, yielding text deltas as they arrive."""
+    client = get_async_client()
+
+    # Includes the time the consumer spends between chunks (forwarding them)
+    with span("llm"):
+        stream = await client.chat.completions.create(
+            model=settings.openrouter_model,
+            messages=_merger_messages(prompt),
+            max_tokens=2000,
+            temperature=0.2,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
 
 def _generate_fallback_tiers(base_price: float) -> List[PricingTier]:
@@ -359,24 +549,12 @@ def _generate_fallback_tiers(base_price: float) -> List[PricingTier]:
     ]
 
 
-async def generate_hybrid_quote(
+def _score_confidence(
     request: HybridQuoteRequest,
-) -> HybridQuoteResponse:
-    """Main orchestration: parallel CBR+ML, then LLM merger.
-
-    Architecture:
-    1. Calculate data completeness upfront
-    2. Run CBR + ML predictions in parallel (asyncio.gather)
-    3. Handle partial failures gracefully
-    4. Calculate confidence from combined signals
-    5. Merge with LLM (or fallback to ML-only)
-    6. Track processing time for SLA monitoring
-
-    Response time target: <5 seconds
-    """
-    start_time = time.time()
-
-    # Calculate data completeness upfront
+    ml_result: Optional[Dict[str, Any]],
+    cbr_result: List[Dict[str, Any]],
+) -> Tuple[float, bool]:
+    """Confidence and review flag from whichever of CBR / ML succeeded."""
     data_completeness = calculate_data_completeness(
         sqft=request.sqft,
         category=request.category,
@@ -386,32 +564,6 @@ async def generate_hybrid_quote(
         quoted_total=request.quoted_total,
     )
 
-    # Step 1: Run CBR + ML in parallel
-    parallel_start = time.time()
-    cbr_task = _run_cbr_query(request)
-    ml_task = _run_ml_prediction(request)
-
-    results = await asyncio.gather(
-        cbr_task,
-        ml_task,
-        return_exceptions=True,
-    )
-    parallel_time = time.time() - parallel_start
-
-    cbr_result = results[0] if not isinstance(results[0], Exception) else []
-    ml_result = results[1] if not isinstance(results[1], Exception) else None
-
-    if isinstance(results[0], Exception):
-        logger.warning(f"CBR query failed: {results[0]}")
-    if isinstance(results[1], Exception):
-        logger.error(f"ML prediction failed: {results[1]}")
-
-    logger.info(f"Parallel step (CBR+ML) took {parallel_time:.3f}s")
-
-    # Step 2: Handle partial failures
-    if ml_result is None and not cbr_result:
-        raise RuntimeError("Both CBR and ML predictions failed")
-
     # Extract ML material IDs for confidence scoring
     ml_material_ids = []
     if ml_result:
@@ -420,82 +572,93 @@ async def generate_hybrid_quote(
             for m in ml_result.get("materials", {}).get("materials", [])
         ]
 
-    # Step 3: Calculate confidence
     if ml_result is None:
         # CBR-only fallback (rare)
-        confidence, needs_review = 0.4, True
         logger.warning("ML failed, using CBR-only with low confidence")
-    elif not cbr_result:
+        return 0.4, True
+    if not cbr_result:
         # ML-only fallback
-        confidence, needs_review = calculate_confidence_ml_only(
-            ml_material_ids=ml_material_ids,
-            data_completeness=data_completeness,
-        )
         logger.warning("CBR failed, using ML-only")
-    else:
-        # Normal path: both CBR and ML succeeded
-        confidence, needs_review = calculate_confidence(
-            cbr_cases=cbr_result,
+        return calculate_confidence_ml_only(
             ml_material_ids=ml_material_ids,
             data_completeness=data_completeness,
         )
+    # Normal path: both CBR and ML succeeded
+    return calculate_confidence(
+        cbr_cases=cbr_result,
+        ml_material_ids=ml_material_ids,
+        data_completeness=data_completeness,
+    )
 
-    # If request uses new tier system, calculate complexity hours breakdown
-    complexity_breakdown = None
-    if request.complexity_tier is not None:
-        from app.services.complexity_calculator import calculate_complexity_hours
-        try:
-            complexity_breakdown = calculate_complexity_hours(
-                category=request.category,
-                sqft=request.sqft,
-                tier=request.complexity_tier,
-                factors={
-                    "roof_pitch": request.factor_roof_pitch,
-                    "access_difficulty": request.factor_access_difficulty or [],
-                    "demolition": request.factor_demolition,
-                    "penetrations_count": request.factor_penetrations_count or 0,
-                    "security": request.factor_security or [],
-                    "material_removal": request.factor_material_removal,
-                    "roof_sections_count": request.factor_roof_sections_count or 2,
-                    "previous_layers_count": request.factor_previous_layers_count or 0,
-                },
-                manual_extra_hours=request.manual_extra_hours or 0,
-            )
-            logger.info(f"Complexity breakdown: {complexity_breakdown}")
-        except Exception as e:
-            logger.warning(f"Failed to calculate complexity breakdown: {e}")
 
-    # Step 4: Merge with LLM (or fallback)
-    llm_start = time.time()
+def _log_complexity_breakdown(request: HybridQuoteRequest) -> None:
+    """Log the tier-system complexity hours breakdown (new tier requests only)."""
+    if request.complexity_tier is None:
+        return
     try:
-        merged = await _merge_with_llm(request, ml_result or {}, cbr_result)
-        logger.info(f"LLM merge took {time.time() - llm_start:.3f}s")
+        logger.info(f"Complexity breakdown: {complexity_hours(request)}")
     except Exception as e:
-        logger.error(f"LLM merger failed: {e}")
-        # Fallback: use ML price with generated tiers
-        base_price = (
-            ml_result.get("price", {}).get("estimate", 0) if ml_result else 0
-        )
-        merged = HybridQuoteOutput(
-            work_items=[],
-            materials=[],
-            total_labor_hours=0,
-            total_materials_cost=(
-                ml_result.get("materials", {}).get("total_materials_cost", 0)
-                if ml_result
-                else 0
-            ),
-            total_price=base_price,
-            overall_confidence=confidence,
-            reasoning="LLM merger unavailable. Using ML predictions directly.",
-            pricing_tiers=_generate_fallback_tiers(base_price),
-        )
-        needs_review = True  # Always review if LLM failed
+        logger.warning(f"Failed to calculate complexity breakdown: {e}")
+
+
+def _use_llm_merger(
+    request: HybridQuoteRequest,
+    ml_result: Optional[Dict[str, Any]],
+    cbr_result: List[Dict[str, Any]],
+) -> bool:
+    """Whether the LLM merges this quote (request override, else MERGER_MODE)."""
+    mode = request.merger or settings.merger_mode
+    if mode == "llm":
+        return True
+    if mode == "rules":
+        return False
+    return rule_merge_score(request, ml_result, cbr_result) < settings.merger_llm_threshold
+
+
+def _rule_output(
+    request: HybridQuoteRequest,
+    ml_result: Optional[Dict[str, Any]],
+    cbr_result: List[Dict[str, Any]],
+    confidence: float,
+) -> HybridQuoteOutput:
+    """Deterministic merge, falling back to ML-only tiers if it fails."""
+    try:
+        return merge_by_rules(request, ml_result or {}, cbr_result, confidence)
+    except Exception as e:
+        logger.error(f"Rule-based merger failed: {e}")
+        return _fallback_output(ml_result, confidence)
 
-    # Step 5: Build response
-    processing_time_ms = int((time.time() - start_time) * 1000)
 
-    response = HybridQuoteResponse(
+def _fallback_output(ml_result: Optional[Dict[str, Any]], confidence: float) -> HybridQuoteOutput:
+    """ML price with generated tiers, used when the LLM merger fails."""
+    base_price = (
+        ml_result.get("price", {}).get("estimate", 0) if ml_result else 0
+    )
+    return HybridQuoteOutput(
+        work_items=[],
+        materials=[],
+        total_labor_hours=0,
+        total_materials_cost=(
+            ml_result.get("materials", {}).get("total_materials_cost", 0)
+            if ml_result
+            else 0
+        ),
+        total_price=base_price,
+        overall_confidence=confidence,
+        reasoning="LLM merger unavailable. Using ML predictions directly.",
+        pricing_tiers=_generate_fallback_tiers(base_price),
+    )
+
+
+def _build_response(
+    merged: HybridQuoteOutput,
+    needs_review: bool,
+    ml_result: Optional[Dict[str, Any]],
+    cbr_result: List[Dict[str, Any]],
+    start_time: float,
+) -> HybridQuoteResponse:
+    processing_time_ms = int((time.time() - start_time) * 1000)
+    return HybridQuoteResponse(
         work_items=merged.work_items,
         materials=merged.materials,
         total_labor_hours=merged.total_labor_hours,
@@ -514,9 +677,157 @@ async def generate_hybrid_quote(
         processing_time_ms=processing_time_ms,
     )
 
+
+async def generate_hybrid_quote(
+    request: HybridQuoteRequest,
+) -> HybridQuoteResponse:
+    """Main orchestration: parallel CBR+ML, then rule-based or LLM merger.
+
+    Architecture:
+    1. Run CBR + ML predictions in parallel (asyncio.gather)
+    2. Handle partial failures gracefully
+    3. Calculate confidence from combined signals
+    4. Merge with rules, or with the LLM when CBR and ML disagree (fallback to ML-only)
+    5. Track processing time for SLA monitoring
+
+    Response time target: <5 seconds
+    """
+    start_time = time.time()
+
+    # Step 1: Run CBR + ML in parallel
+    parallel_start = time.time()
+    cbr_task = _run_cbr_query(request)
+    ml_task = _run_ml_prediction(request)
+
+    results = await asyncio.gather(
+        cbr_task,
+        ml_task,
+        return_exceptions=True,
+    )
+    parallel_time = time.time() - parallel_start
+
+    cbr_result = results[0] if not isinstance(results[0], Exception) else []
+    ml_result = results[1] if not isinstance(results[1], Exception) else None
+
+    if isinstance(results[0], Exception):
+        logger.warning(f"CBR query failed: {results[0]}")
+    if isinstance(results[1], Exception):
+        logger.error(f"ML prediction failed: {results[1]}")
+
+    logger.info(f"Parallel step (CBR+ML) took {parallel_time:.3f}s")
+
+    # Step 2: Handle partial failures
+    if ml_result is None and not cbr_result:
+        raise RuntimeError("Both CBR and ML predictions failed")
+
+    # Step 3: Calculate confidence
+    confidence, needs_review = _score_confidence(request, ml_result, cbr_result)
+    _log_complexity_breakdown(request)
+
+    # Step 4: Merge with rules, or the LLM when CBR and ML disagree (or fallback)
+    merge_start = time.time()
+    if not _use_llm_merger(request, ml_result, cbr_result):
+        merged = _rule_output(request, ml_result, cbr_result, confidence)
+        logger.info(f"Rule-based merge took {time.time() - merge_start:.3f}s")
+    else:
+        try:
+            merged = await _merge_with_llm(request, ml_result or {}, cbr_result)
+            logger.info(f"LLM merge took {time.time() - merge_start:.3f}s")
+        except Exception as e:
+            logger.error(f"LLM merger failed: {e}")
+            # Fallback: use ML price with generated tiers
+            merged = _fallback_output(ml_result, confidence)
+            needs_review = True  # Always review if LLM failed
+
+    # Step 5: Build response
+    response = _build_response(merged, needs_review, ml_result, cbr_result, start_time)
+
     logger.info(
-        f"Hybrid quote generated in {processing_time_ms}ms "
+        f"Hybrid quote generated in {response.processing_time_ms}ms "
         f"(CBR={len(cbr_result)} cases, confidence={confidence:.2f})"
     )
 
     return response
+
+
+async def stream_hybrid_quote(
+    request: HybridQuoteRequest,
+) -> AsyncIterator[Dict[str, Any]]:
+    """generate_hybrid_quote as a sequence of events, each sent as soon as it's known.
+
+    Yields {"type", "data"} dicts in order:
+    1. "ml": price and material predictions (null if ML failed)
+    2. "cbr": similar cases plus the preliminary confidence and review flag
+    3. "llm_token": merger output text, one delta per event (none when the
+       rules merge or the merge is served from the cache)
+    4. "quote": the validated HybridQuoteResponse (fallback tiers if the
+       merger failed or returned invalid JSON)
+
+    Raises:
+        RuntimeError: If both CBR and ML fail (before any LLM call)
+    """
+    start_time = time.time()
+
+    # CBR and ML run concurrently; ML (~100ms) is sent without waiting for CBR
+    cbr_task = asyncio.ensure_future(_run_cbr_query(request))
+    try:
+        try:
+            ml_result = await _run_ml_prediction(request)
+        except Exception as e:
+            logger.error(f"ML prediction failed: {e}")
+            ml_result = None
+        yield {"type": "ml", "data": ml_result}
+
+        try:
+            cbr_result = await cbr_task
+        except Exception as e:
+            logger.warning(f"CBR query failed: {e}")
+            cbr_result = []
+    finally:
+        # Client went away before CBR finished
+        if not cbr_task.done():
+            cbr_task.cancel()
+
+    if ml_result is None and not cbr_result:
+        raise RuntimeError("Both CBR and ML predictions failed")
+
+    confidence, needs_review = _score_confidence(request, ml_result, cbr_result)
+    _log_complexity_breakdown(request)
+    yield {
+        "type": "cbr",
+        "data": {
+            "similar_cases": cbr_result,
+            "confidence": confidence,
+            "needs_review": needs_review,
+        },
+    }
+
+    merge_start = time.time()
+    response_text = ""
+    if not _use_llm_merger(request, ml_result, cbr_result):
+        merged = _rule_output(request, ml_result, cbr_result, confidence)
+        logger.info(f"Rule-based merge took {time.time() - merge_start:.3f}s")
+    else:
+        try:
+            prompt = _format_merger_prompt(request, ml_result or {}, cbr_result)
+            cache_key = _merger_cache_key(prompt)
+            # A cached merge goes straight to the quote event, no tokens
+            merged = await _get_cached_merger_output(cache_key)
+            if merged is None:
+                async for token in _stream_merger_tokens(prompt):
+                    response_text += token
+                    yield {"type": "llm_token", "data": token}
+                merged = _parse_merger_output(response_text.strip())
+                await _cache_merger_output(cache_key, merged)
+            logger.info(f"LLM merge (streamed) took {time.time() - merge_start:.3f}s")
+        except Exception as e:
+            logger.error(f"LLM merger failed: {e}")
+            merged = _fallback_output(ml_result, confidence)
+            needs_review = True  # Always review if LLM failed
+
+    response = _build_response(merged, needs_review, ml_result, cbr_result, start_time)
+    logger.info(
+        f"Hybrid quote streamed in {response.processing_time_ms}ms "
+        f"(CBR={len(cbr_result)} cases, confidence={confidence:.2f})"
+    )
+    yield {"type": "quote", "data": response.model_dump()}
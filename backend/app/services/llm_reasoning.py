@@ -4,12 +4,15 @@ Generates human-readable explanations for price estimates by referencing
 similar historical cases and explaining confidence levels.
 """
 
+import importlib.util
 import logging
 from typing import Any, Optional
 
+import httpx
 from openai import (
     APIConnectionError,
     APITimeoutError,
+    AsyncOpenAI,
     AuthenticationError,
     OpenAI,
     RateLimitError,
@@ -22,33 +25,71 @@ from tenacity import (
 )
 
 from app.config import settings
+from app.services.tracing import span
 
 logger = logging.getLogger(__name__)
 
 # Module-level client storage (same pattern as predictor.py, pinecone_cbr.py)
+# The sync client only serves the threadpool-run /estimate/stream generator;
+# everything on the event loop uses the async client.
 _client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+
+_DEFAULT_HEADERS = {
+    "HTTP-Referer": settings.app_url,
+    "X-Title": "TOITURELV Cortex",
+}
+
+
+def _build_http_client() -> httpx.AsyncClient:
+    """Shared keep-alive pool for async OpenRouter calls (HTTP/2 if h2 is installed)."""
+    http2 = settings.llm_http2 and importlib.util.find_spec("h2") is not None
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry_s,
+        ),
+    )
 
 
 def init_llm_client() -> None:
-    """Initialize OpenRouter client. Called from lifespan."""
-    global _client
+    """Initialize OpenRouter clients. Called from lifespan."""
+    global _client, _async_client
     logger.info("Initializing OpenRouter LLM client...")
     _client = OpenAI(
         base_url=settings.openrouter_base_url,
         api_key=settings.openrouter_api_key,
         timeout=30.0,
-        default_headers={
-            "HTTP-Referer": settings.app_url,
-            "X-Title": "TOITURELV Cortex",
-        },
+        default_headers=_DEFAULT_HEADERS,
+    )
+    _async_client = AsyncOpenAI(
+        base_url=settings.openrouter_base_url,
+        api_key=settings.openrouter_api_key,
+        timeout=30.0,
+        default_headers=_DEFAULT_HEADERS,
+        http_client=_build_http_client(),
     )
     logger.info("OpenRouter client initialized")
 
 
+async def aclose_llm_client() -> None:
+    """Close the async client's connection pool, then close_llm_client()."""
+    if _async_client is not None:
+        try:
+            await _async_client.close()
+        except Exception as e:
+            logger.warning(f"Error closing async OpenRouter client: {e}")
+    close_llm_client()
+
+
 def close_llm_client() -> None:
     """Cleanup on shutdown."""
-    global _client
+    global _client, _async_client
     _client = None
+    _async_client = None
     logger.info("OpenRouter client closed")
 
 
@@ -63,6 +104,17 @@ def get_client() -> OpenAI:
     return _client
 
 
+def get_async_client() -> AsyncOpenAI:
+    """Get the async OpenRouter client for calls made on the event loop.
+
+    Raises:
+        RuntimeError: If client not initialized via init_llm_client()
+    """
+    if _async_client is None:
+        raise RuntimeError("LLM client not initialized. Call init_llm_client() first.")
+    return _async_client
+
+
 def format_similar_cases(cases: list[dict[str, Any]]) -> str:
     """Format similar cases for prompt inclusion.
 
@@ -110,7 +162,7 @@ def format_similar_cases(cases: list[dict[str, Any]]) -> str:
         )
     ),
 )
-def generate_reasoning(
+async def generate_reasoning(
     estimate: float,
     confidence: str,
     sqft: float,
@@ -134,7 +186,7 @@ def generate_reasoning(
     Raises:
         Exception: On API errors after retries exhausted
     """
-    client = get_client()
+    client = get_async_client()
     model = model or settings.openrouter_model
 
     cases_text = format_similar_cases(similar_cases)
@@ -163,18 +215,19 @@ Similar Jobs:
 
 Write a brief, professional explanation referencing the similar jobs. Explain why the estimate is reasonable or note any factors affecting confidence."""
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a roofing estimation assistant. Be concise, professional, and reference specific data from similar jobs.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=150,
-        temperature=0.3,
-    )
+    with span("llm"):
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a roofing estimation assistant. Be concise, professional, and reference specific data from similar jobs.",
+                },
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=150,
+            temperature=0.3,
+        )
 
     return response.choices[0].message.content.strip()
 
@@ -0,0 +1,283 @@
+"""In-process vector index over the CBR case base (CBR_BACKEND=local).
+
+scripts/build_cbr_index.py converts cortex-data/cbr_embeddings.npz and
+cbr_cases.json into app/models/cbr_index/: unit-normalized float32 vectors
+sorted by category then sqft, per-case metadata, and the raw numeric
+features used by numeric_cbr.py. The server memory-maps the arrays, turns
+the 0.5x-2x sqft filter into a searchsorted range within each category
+shard, and scores those ranges with matrix-vector products. Results have the same shape as
+pinecone_cbr.query_similar_cases.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.cbr_cases import CASE_FIELDS, NUMERIC_FIELDS, case_metadata, case_numeric
+from app.services.cbr_partitions import category_slug
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = Path(__file__).parent.parent / "models" / "cbr_index"
+DATA_DIR = Path(__file__).parent.parent.parent.parent / "cortex-data"
+META_NAME = "index.json"
+# Row order; older builds (sorted by sqft only) must be rebuilt
+LAYOUT = "category,sqft"
+
+
+def _shard_bounds(category_codes: np.ndarray, categories: List[str]) -> Dict[str, Tuple[int, int]]:
+    """{category: (start, end)} row range of each category in a category-sorted index."""
+    codes = np.asarray(category_codes)
+    bounds = {}
+    for code, category in enumerate(categories):
+        start = int(np.searchsorted(codes, code, side="left"))
+        end = int(np.searchsorted(codes, code, side="right"))
+        if end > start:
+            bounds[category] = (start, end)
+    return bounds
+
+
+class LocalCaseIndex:
+    """Exact cosine top-k over a memory-mapped vector matrix.
+
+    Rows are sorted by category, then sqft, so each category is a
+    contiguous shard whose 0.5x-2x sqft range is one searchsorted slice.
+    """
+
+    def __init__(self, path: Path = INDEX_DIR):
+        self.path = Path(path)
+        with open(self.path / META_NAME) as f:
+            meta = json.load(f)
+        self.version: str = meta["version"]
+        self.case_ids: List[str] = meta["case_ids"]
+        self.cases: List[Dict[str, Any]] = meta["cases"]
+        self.categories: List[str] = meta["categories"]
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        self.sqft = np.load(self.path / "sqft.npy", mmap_mode="r")
+        self.category_codes = np.load(self.path / "category.npy", mmap_mode="r")
+        self._index_shards()
+
+    def _index_shards(self) -> None:
+        self.shards = _shard_bounds(self.category_codes, self.categories)
+        # Cases without sqft sort last in their shard (NaN) and never match a sqft filter
+        self._shard_sqft_end = {
+            category: start + int(np.count_nonzero(~np.isnan(self.sqft[start:end])))
+            for category, (start, end) in self.shards.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.case_ids)
+
+    def partition_sizes(self) -> Dict[str, int]:
+        """Case count per partition slug (see cbr_partitions.py)."""
+        sizes: Dict[str, int] = {}
+        for category, (start, end) in self.shards.items():
+            slug = category_slug(category)
+            sizes[slug] = sizes.get(slug, 0) + end - start
+        return sizes
+
+    def with_cases(
+        self,
+        case_ids: List[str],
+        vectors: np.ndarray,
+        cases: List[Dict[str, Any]],
+    ) -> "LocalCaseIndex":
+        """Copy of the index with cases added (replacing any with the same id).
+
+        cases are cbr_cases.json-shaped entries. The copy lives in memory;
+        callers swap it in so concurrent queries see either index whole.
+        """
+        new_ids = [str(c) for c in case_ids]
+        replaced = set(new_ids)
+        keep = np.array([cid not in replaced for cid in self.case_ids], dtype=bool)
+        metadata = [case_metadata(case) for case in cases]
+
+        categories = list(self.categories)
+        for m in metadata:
+            if m["category"] not in categories:
+                categories.append(m["category"])
+
+        new_vectors = np.asarray(vectors, dtype=np.float32).reshape(len(new_ids), -1)
+        norms = np.linalg.norm(new_vectors, axis=1, keepdims=True)
+        new_vectors = new_vectors / np.where(norms > 0, norms, 1.0)
+
+        all_ids = [cid for cid, k in zip(self.case_ids, keep) if k] + new_ids
+        all_cases = [case for case, k in zip(self.cases, keep) if k] + metadata
+        all_vectors = np.concatenate([np.asarray(self.vectors)[keep], new_vectors])
+        all_sqft = np.concatenate([
+            np.asarray(self.sqft)[keep],
+            np.array(
+                [m["sqft"] if m["sqft"] is not None else np.nan for m in metadata], dtype=np.float64
+            ),
+        ])
+        all_codes = np.concatenate([
+            np.asarray(self.category_codes)[keep],
+            np.array([categories.index(m["category"]) for m in metadata], dtype=np.int16),
+        ])
+        order = np.lexsort((all_sqft, all_codes))  # By category, then sqft (NaN last)
+
+        index = copy.copy(self)
+        index.version = f"{self.version.split('+')[0]}+{len(all_ids)}"
+        index.case_ids = [all_ids[i] for i in order]
+        index.cases = [all_cases[i] for i in order]
+        index.categories = categories
+        index.vectors = np.ascontiguousarray(all_vectors[order])
+        index.sqft = all_sqft[order]
+        index.category_codes = all_codes[order]
+        index._index_shards()
+        return index
+
+    def _ranges(
+        self,
+        categories: List[str],
+        sqft_filter: Optional[float],
+    ) -> List[Tuple[int, int]]:
+        """Row ranges to score: each shard, narrowed to the sqft range if filtered."""
+        ranges = []
+        for category in categories:
+            start, end = self.shards[category]
+            if sqft_filter and sqft_filter > 0:
+                sorted_sqft = self.sqft[start:self._shard_sqft_end[category]]
+                end = start + int(np.searchsorted(sorted_sqft, sqft_filter * 2.0, side="right"))
+                start = start + int(np.searchsorted(sorted_sqft, sqft_filter * 0.5, side="left"))
+            if end > start:
+                ranges.append((start, end))
+        return ranges
+
+    def query(
+        self,
+        query_vector: List[float],
+        top_k: int = 5,
+        category_filter: Optional[str] = None,
+        sqft_filter: Optional[float] = None,
+        partitions: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top-k cases by cosine similarity, with Pinecone-equivalent filters.
+
+        partitions limits the search to those partition slugs (see
+        cbr_partitions.select_partitions); by default every shard is scored.
+        """
+        if category_filter:
+            categories = [category_filter] if category_filter in self.shards else []
+        elif partitions is not None:
+            wanted = set(partitions)
+            categories = [c for c in self.shards if category_slug(c) in wanted]
+        else:
+            categories = list(self.shards)
+        ranges = self._ranges(categories, sqft_filter)
+        if not ranges or top_k <= 0:
+            return []
+
+        q = np.asarray(query_vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if norm > 0:
+            q = q / norm
+        scores = np.concatenate([self.vectors[lo:hi] @ q for lo, hi in ranges])
+        rows = np.concatenate([np.arange(lo, hi) for lo, hi in ranges])
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        results = []
+        for i in top:
+            row = rows[i]
+            case = self.cases[row]
+            results.append({
+                "case_id": self.case_ids[row],
+                "similarity": round(float(scores[i]), 4),
+                **{field: case.get(field) for field in CASE_FIELDS},
+            })
+        return results
+
+
+def build_local_index(data_dir: Path = DATA_DIR, out_dir: Path = INDEX_DIR) -> Dict[str, Any]:
+    """Build the index directory from cbr_embeddings.npz + cbr_cases.json.
+
+    Writes to a temporary sibling directory and swaps it in.
+
+    Returns:
+        Summary with version and case count
+    """
+    data_dir = Path(data_dir)
+    embeddings_path = data_dir / "cbr_embeddings.npz"
+    cases_path = data_dir / "cbr_cases.json"
+
+    data = np.load(embeddings_path)
+    case_ids = [str(c) for c in data["case_ids"]]
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    with open(cases_path) as f:
+        cases = {str(c["case_id"]): c for c in json.load(f)}
+
+    metadata = [case_metadata(cases.get(case_id, {})) for case_id in case_ids]
+    numeric = np.array(
+        [case_numeric(cases.get(case_id, {})) for case_id in case_ids], dtype=np.float64
+    )
+    sqft = np.array(
+        [m["sqft"] if m["sqft"] is not None else np.nan for m in metadata], dtype=np.float64
+    )
+
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    vectors = embeddings / np.where(norms > 0, norms, 1.0)
+    categories = sorted({m["category"] for m in metadata})
+    category_codes = np.array([categories.index(m["category"]) for m in metadata], dtype=np.int16)
+    order = np.lexsort((sqft, category_codes))  # By category, then sqft (NaN last)
+
+    digest = hashlib.sha256()
+    for path in (embeddings_path, cases_path):
+        digest.update(path.read_bytes())
+
+    out_dir = Path(out_dir)
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / "vectors.npy", np.ascontiguousarray(vectors[order]))
+    np.save(tmp_dir / "sqft.npy", sqft[order])
+    np.save(tmp_dir / "category.npy", category_codes[order])
+    np.save(tmp_dir / "numeric.npy", numeric[order].reshape(-1, len(NUMERIC_FIELDS)))
+    meta = {
+        "version": digest.hexdigest()[:12],
+        "layout": LAYOUT,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "dimension": int(vectors.shape[1]),
+        "numeric_fields": list(NUMERIC_FIELDS),
+        "categories": categories,
+        "case_ids": [case_ids[i] for i in order],
+        "cases": [metadata[i] for i in order],
+    }
+    with open(tmp_dir / META_NAME, "w") as f:
+        json.dump(meta, f)
+
+    old_dir = out_dir.with_name(out_dir.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if out_dir.exists():
+        out_dir.rename(old_dir)
+    tmp_dir.rename(out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return {"version": meta["version"], "cases": len(case_ids), "dimension": meta["dimension"]}
+
+
+def load_local_index(path: Path = INDEX_DIR) -> Optional[LocalCaseIndex]:
+    """Open the index directory, or None if it hasn't been built."""
+    if not (Path(path) / META_NAME).exists():
+        logger.warning(f"Local CBR index not found at {path} (run scripts/build_cbr_index.py)")
+        return None
+    with open(Path(path) / META_NAME) as f:
+        layout = json.load(f).get("layout")
+    if layout != LAYOUT:
+        logger.warning(
+            f"Local CBR index at {path} has an outdated layout (rebuild with scripts/build_cbr_index.py)"
+        )
+        return None
+    index = LocalCaseIndex(path)
+    logger.info(f"Local CBR index {index.version} loaded ({len(index)} cases)")
+    return index
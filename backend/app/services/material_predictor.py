@@ -1,42 +1,60 @@
 """Material ID and quantity prediction service.
 
 Uses lazy loading to reduce memory footprint at startup.
+Selector and quantity regressors run on the flat-array engine (tree_engine.py);
+the quantity regressors of all selected materials are evaluated in one
+stacked pass, for one job or many (predict_materials_batch).
 """
 
 import gc
 import json
 import logging
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Dict, List, Tuple
 
 import numpy as np
 
+from app.config import settings
+from app.services.cache import LRUCache, quantize
+from app.services.model_bundle import component_version, load_component
+from app.services.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 # Module-level storage (shared across requests)
 _models: dict = {}
 _loaded: bool = False
+_model_version: str = ""
+
+# Memoized predict_materials() results, keyed on (model version, canonical inputs)
+_cache = LRUCache("materials", settings.prediction_cache_size)
 
 MODEL_DIR = Path(__file__).parent.parent / "models"
 
 
 def _ensure_models_loaded() -> None:
     """Lazy-load material prediction models on first use."""
-    global _loaded
+    global _loaded, _model_version
     if _loaded:
         return
 
-    import joblib
-
     logger.info("Lazy-loading material prediction models (first use)...")
 
-    _models["selector"] = joblib.load(MODEL_DIR / "material_selector.pkl")
-    _models["binarizer"] = joblib.load(MODEL_DIR / "material_binarizer.pkl")
-    _models["quantity"] = joblib.load(MODEL_DIR / "quantity_regressors.pkl")
-    _models["category_encoder"] = joblib.load(MODEL_DIR / "category_encoder_material.pkl")
+    # Compiled ensembles + label lists (memory-mapped from the model bundle when exported)
+    _models["selector"], _ = load_component("material_selector")
+    _, _models["material_ids"] = load_component("material_binarizer")
+    _models["quantity"], quantity_ids = load_component("quantity_regressors")
+    _models["quantity_index"] = {mat_id: i for i, mat_id in enumerate(quantity_ids)}
+    _, categories = load_component("category_encoder_material")
+    _models["category_index"] = {cat: i for i, cat in enumerate(categories)}
+
+    _model_version = ":".join(
+        component_version(name) for name in ("material_selector", "quantity_regressors")
+    )
 
     with open(MODEL_DIR / "co_occurrence_rules.json") as f:
         _models["rules"] = json.load(f)
+    _models["rule_closure"] = _compile_rules(_models["rules"])
 
     with open(MODEL_DIR / "feature_triggers.json") as f:
         _models["triggers"] = json.load(f)
@@ -49,6 +67,200 @@ def _ensure_models_loaded() -> None:
     logger.info("Material prediction models loaded successfully")
 
 
+def _compile_rules(rules: List[Dict[str, Any]]) -> Dict[Any, List[Tuple[Any, str]]]:
+    """Index co-occurrence rules by antecedent with the transitive closure precomputed.
+
+    For each antecedent, lists every material reachable through chained
+    rules (breadth-first), each with the description of the rule that adds
+    it. Applying rules at request time is then one lookup per selected
+    material instead of a pass over all rules.
+    """
+    direct: Dict[Any, List[Tuple[Any, str]]] = {}
+    for rule in rules:
+        direct.setdefault(rule["antecedent"], []).append((
+            rule["consequent"],
+            f"{rule['antecedent']} -> {rule['consequent']} (conf={rule['confidence']:.2f})",
+        ))
+
+    closure: Dict[Any, List[Tuple[Any, str]]] = {}
+    for antecedent in direct:
+        reached = {antecedent}
+        frontier = [antecedent]
+        implied: List[Tuple[Any, str]] = []
+        while frontier:
+            next_frontier = []
+            for mat_id in frontier:
+                for consequent, description in direct.get(mat_id, []):
+                    if consequent not in reached:
+                        reached.add(consequent)
+                        implied.append((consequent, description))
+                        next_frontier.append(consequent)
+            frontier = next_frontier
+        closure[antecedent] = implied
+    return closure
+
+
+def _copy_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a cached result so callers can't mutate the cache entry."""
+    return {
+        **result,
+        "materials": [dict(m) for m in result["materials"]],
+        "applied_rules": list(result["applied_rules"]),
+    }
+
+
+def _canonical_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalize one job's input types and defaults (shared by cache keys and feature rows)."""
+    quoted_total = job.get("quoted_total")
+    return {
+        "sqft": float(job["sqft"]),
+        "category": job["category"],
+        "complexity": int(job.get("complexity", 10)),
+        "has_chimney": bool(job.get("has_chimney", False)),
+        "has_skylights": bool(job.get("has_skylights", False)),
+        "material_lines": int(job.get("material_lines", 5)),
+        "labor_lines": int(job.get("labor_lines", 2)),
+        "has_subs": bool(job.get("has_subs", False)),
+        "quoted_total": float(quoted_total) if quoted_total else None,
+    }
+
+
+def _cache_key(job: Dict[str, Any]) -> Tuple:
+    """Cache key for a canonical job: sqft and quoted_total snapped to a grid.
+
+    Only the key is snapped, so near-identical form submissions share an
+    entry while the model still sees the raw inputs.
+    """
+    snapped = {
+        **job,
+        "sqft": quantize(job["sqft"], settings.prediction_cache_sqft_step),
+        "quoted_total": quantize(job["quoted_total"], 1.0),
+    }
+    return (_model_version, *snapped.values())
+
+
+def _feature_row(job: Dict[str, Any]) -> List[float]:
+    """Build the feature vector for a canonical job (same order as training)."""
+    return [
+        job["sqft"],
+        job["complexity"],
+        job["quoted_total"] if job["quoted_total"] else job["sqft"] * 15,  # Estimate if not provided
+        1 if job["has_chimney"] else 0,
+        1 if job["has_skylights"] else 0,
+        job["material_lines"],
+        job["labor_lines"],
+        1 if job["has_subs"] else 0,
+        # Encode category (LabelEncoder order, 0 if unknown)
+        _models["category_index"].get(job["category"], 0),
+    ]
+
+
+def _select_materials(probs: np.ndarray, job: Dict[str, Any]) -> Tuple[List[int], List[str]]:
+    """Turn selector probabilities into material IDs, then apply triggers and rules.
+
+    Returns:
+        Tuple of (predicted material IDs, applied co-occurrence rule descriptions)
+    """
+    # Use 0.3 threshold (tuned during training)
+    predicted_ids = [
+        mat_id for mat_id, prob in zip(_models["material_ids"], probs) if prob > 0.3
+    ]
+
+    selected = set(predicted_ids)
+
+    # Apply feature triggers (each trigger is an object with material_id key)
+    if job["has_chimney"] and "chimney_materials" in _models["triggers"]:
+        for trigger in _models["triggers"]["chimney_materials"]:
+            mat_id = trigger["material_id"]
+            if mat_id not in selected:
+                selected.add(mat_id)
+                predicted_ids.append(mat_id)
+
+    if job["has_skylights"] and "skylight_materials" in _models["triggers"]:
+        for trigger in _models["triggers"]["skylight_materials"]:
+            mat_id = trigger["material_id"]
+            if mat_id not in selected:
+                selected.add(mat_id)
+                predicted_ids.append(mat_id)
+
+    # Apply co-occurrence rules (closure already includes chained implications)
+    applied_rules = []
+    for antecedent in list(predicted_ids):
+        for consequent, description in _models["rule_closure"].get(antecedent, ()):
+            if consequent not in selected:
+                selected.add(consequent)
+                predicted_ids.append(consequent)
+                applied_rules.append(description)
+
+    return predicted_ids, applied_rules
+
+
+def _predict_rows(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Predict materials for canonical jobs with one selector pass and one quantity pass.
+
+    The quantity regressors of every material selected by any job are
+    evaluated together as one stacked ensemble call over all rows.
+    """
+    X = np.array([_feature_row(job) for job in jobs], dtype=np.float64)
+
+    # Predict material IDs (one probability column per material)
+    probs = _models["selector"].predict(X)
+    selections = [_select_materials(probs[i], job) for i, job in enumerate(jobs)]
+
+    # Quantity outputs needed by any job, evaluated in a single pass
+    quantity_index = _models["quantity_index"]
+    needed = sorted({
+        quantity_index[str(mat_id)]
+        for predicted_ids, _ in selections
+        for mat_id in predicted_ids
+        if str(mat_id) in quantity_index
+    })
+    quantities = _models["quantity"].predict(X, outputs=needed) if needed else None
+    column = {qty_idx: j for j, qty_idx in enumerate(needed)}
+
+    results = []
+    for row, (predicted_ids, applied_rules) in enumerate(selections):
+        materials = []
+        for mat_id in predicted_ids:
+            mat_id_str = str(mat_id)
+
+            # Get quantity from regressor or default to 1
+            qty_idx = quantity_index.get(mat_id_str)
+            if qty_idx is not None:
+                qty = max(1, round(float(quantities[row, column[qty_idx]]), 1))
+                confidence = "HIGH"
+            else:
+                qty = 1.0
+                confidence = "LOW"
+
+            # Get unit price from lookup
+            unit_price = _models["prices"].get(mat_id_str, 50.0)
+            total = round(qty * unit_price, 2)
+
+            materials.append({
+                "material_id": mat_id,
+                "quantity": qty,
+                "unit_price": unit_price,
+                "total": total,
+                "confidence": confidence,
+            })
+
+        # Sort by total (descending) for usability
+        materials.sort(key=lambda x: x["total"], reverse=True)
+
+        total_cost = sum(m["total"] for m in materials)
+
+        results.append({
+            "materials": materials,
+            "total_materials_cost": round(total_cost, 2),
+            "model_info": "OneVsRest + GradientBoosting (v1)",
+            "applied_rules": applied_rules,
+        })
+
+    return results
+
+
+@traced("material_model")
 def predict_materials(
     sqft: float,
     category: str,
@@ -70,87 +282,42 @@ def predict_materials(
     """
     _ensure_models_loaded()
 
-    # Encode category
-    try:
-        cat_enc = _models["category_encoder"].transform([category])[0]
-    except ValueError:
-        cat_enc = 0  # Unknown category
-
-    # Build feature vector (same order as training)
-    X = np.array([[
-        sqft,
-        complexity,
-        quoted_total if quoted_total else sqft * 15,  # Estimate if not provided
-        1 if has_chimney else 0,
-        1 if has_skylights else 0,
-        material_lines,
-        labor_lines,
-        1 if has_subs else 0,
-        cat_enc,
-    ]])
-
-    # Predict material IDs
-    probs = _models["selector"].predict_proba(X)[0]
-    # Use 0.3 threshold (tuned during training)
-    predicted_binary = (probs > 0.3).astype(int).reshape(1, -1)
-    predicted_ids = _models["binarizer"].inverse_transform(predicted_binary)[0]
-    predicted_ids = list(predicted_ids)
+    job = _canonical_job({
+        "sqft": sqft,
+        "category": category,
+        "complexity": complexity,
+        "has_chimney": has_chimney,
+        "has_skylights": has_skylights,
+        "material_lines": material_lines,
+        "labor_lines": labor_lines,
+        "has_subs": has_subs,
+        "quoted_total": quoted_total,
+    })
+    key = _cache_key(job)
+    cached = _cache.get(key)
+    if cached is not None:
+        return _copy_result(cached)
 
-    # Apply feature triggers (each trigger is an object with material_id key)
-    if has_chimney and "chimney_materials" in _models["triggers"]:
-        for trigger in _models["triggers"]["chimney_materials"]:
-            mat_id = trigger["material_id"]
-            if mat_id not in predicted_ids:
-                predicted_ids.append(mat_id)
+    result = _predict_rows([job])[0]
+    _cache.put(key, result)
+    return _copy_result(result)
 
-    if has_skylights and "skylight_materials" in _models["triggers"]:
-        for trigger in _models["triggers"]["skylight_materials"]:
-            mat_id = trigger["material_id"]
-            if mat_id not in predicted_ids:
-                predicted_ids.append(mat_id)
 
-    # Apply co-occurrence rules
-    applied_rules = []
-    for rule in _models["rules"]:
-        if rule["antecedent"] in predicted_ids and rule["consequent"] not in predicted_ids:
-            predicted_ids.append(rule["consequent"])
-            applied_rules.append(
-                f"{rule['antecedent']} -> {rule['consequent']} (conf={rule['confidence']:.2f})"
-            )
-
-    # Predict quantities for each material
-    materials = []
-    for mat_id in predicted_ids:
-        mat_id_str = str(mat_id)
-
-        # Get quantity from regressor or default to 1
-        if mat_id_str in _models["quantity"]:
-            qty = max(1, round(_models["quantity"][mat_id_str].predict(X)[0], 1))
-            confidence = "HIGH"
-        else:
-            qty = 1.0
-            confidence = "LOW"
-
-        # Get unit price from lookup
-        unit_price = _models["prices"].get(mat_id_str, 50.0)
-        total = round(qty * unit_price, 2)
-
-        materials.append({
-            "material_id": mat_id,
-            "quantity": qty,
-            "unit_price": unit_price,
-            "total": total,
-            "confidence": confidence,
-        })
+def predict_materials_batch(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Predict materials for many jobs at once.
 
-    # Sort by total (descending) for usability
-    materials.sort(key=lambda x: x["total"], reverse=True)
+    Runs the selector once over all jobs and every needed quantity regressor
+    in one stacked pass. Bypasses the prediction cache.
 
-    total_cost = sum(m["total"] for m in materials)
+    Args:
+        jobs: List of dicts with the same keys as predict_materials() arguments
+              (sqft and category required, others use its defaults)
 
-    return {
-        "materials": materials,
-        "total_materials_cost": round(total_cost, 2),
-        "model_info": "OneVsRest + GradientBoosting (v1)",
-        "applied_rules": applied_rules,
-    }
+    Returns:
+        List of results (same shape as predict_materials()), in input order
+    """
+    _ensure_models_loaded()
+
+    if not jobs:
+        return []
+    return _predict_rows([_canonical_job(job) for job in jobs])
@@ -0,0 +1,305 @@
+"""Memory-mapped model bundle shared across uvicorn workers.
+
+scripts/export_bundle.py converts every pickled serving artifact (price
+models, material selector, quantity regressors, encoders) into one
+directory of .npy arrays plus a JSON manifest. Workers open the arrays with
+np.load(mmap_mode="r"), so N processes share the same page-cache pages
+instead of each holding its own unpickled copy.
+
+Components missing from the bundle, or whose source pickle changed since
+export, are unpickled and compiled in-process instead.
+"""
+
+import hashlib
+import json
+import logging
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.tree_engine import (
+    CompiledEnsemble,
+    compile_gradient_boosting,
+    compile_one_vs_rest,
+    stack_ensembles,
+)
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT_VERSION = 1
+MODEL_DIR = Path(__file__).parent.parent / "models"
+BUNDLE_DIR = MODEL_DIR / "bundle"
+MANIFEST_NAME = "manifest.json"
+
+_ENSEMBLE_ARRAYS = (
+    "feature",
+    "threshold",
+    "left",
+    "right",
+    "value",
+    "roots",
+    "base",
+    "output_offsets",
+)
+
+# Process-wide bundle (loaded once, shared by predictor and material_predictor)
+_bundle = None
+_bundle_checked: bool = False
+
+Compiled = Tuple[Optional[CompiledEnsemble], Optional[List[Any]]]
+
+
+def _compile_ensemble(model: Any) -> Compiled:
+    return compile_gradient_boosting(model), None
+
+
+def _compile_selector(clf: Any) -> Compiled:
+    return compile_one_vs_rest(clf), None
+
+
+def _compile_regressor_dict(regressors: Dict[Any, Any]) -> Compiled:
+    # Keys normalized to str to match material_predictor's lookups
+    keys = sorted(regressors, key=str)
+    ensemble = stack_ensembles([compile_gradient_boosting(regressors[k]) for k in keys])
+    return ensemble, [str(k) for k in keys]
+
+
+def _encoder_labels(encoder: Any) -> Compiled:
+    return None, [str(c) for c in encoder.classes_]
+
+
+def _binarizer_labels(binarizer: Any) -> Compiled:
+    return None, [int(c) for c in binarizer.classes_]
+
+
+# Bundle component name (= pickle stem in MODEL_DIR) -> converter
+COMPONENTS: Dict[str, Callable[[Any], Compiled]] = {
+    "cortex_model_global": _compile_ensemble,
+    "cortex_model_Bardeaux": _compile_ensemble,
+    "material_selector": _compile_selector,
+    "quantity_regressors": _compile_regressor_dict,
+    "material_binarizer": _binarizer_labels,
+    "category_encoder_material": _encoder_labels,
+}
+
+
+def file_sha256(path: Path) -> str:
+    """Hash a source pickle so bundle components can be checked for staleness."""
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+class ModelBundle:
+    """Read-only view over an exported bundle directory."""
+
+    def __init__(self, path: Path, manifest: Dict[str, Any], model_dir: Path = MODEL_DIR):
+        self.path = Path(path)
+        self.manifest = manifest
+        self.model_dir = Path(model_dir)
+        self._fresh: Dict[str, bool] = {}
+
+    @property
+    def version(self) -> str:
+        return self.manifest["version"]
+
+    def _is_fresh(self, name: str) -> bool:
+        """A component is stale if its source pickle exists and changed since export."""
+        if name not in self._fresh:
+            entry = self.manifest["components"][name]
+            source = self.model_dir / entry["source"]
+            self._fresh[name] = (
+                not source.exists() or file_sha256(source) == entry["source_sha256"]
+            )
+            if not self._fresh[name]:
+                logger.warning(f"Bundle component {name} is stale (source changed), ignoring")
+        return self._fresh[name]
+
+    def has(self, name: str) -> bool:
+        return name in self.manifest["components"] and self._is_fresh(name)
+
+    def ensemble(self, name: str) -> Optional[CompiledEnsemble]:
+        """Memory-map a compiled ensemble, or None if absent/stale."""
+        if not self.has(name):
+            return None
+        entry = self.manifest["components"][name]
+        if "ensemble" not in entry:
+            return None
+        arrays = {
+            key: np.load(self.path / f"{name}.{key}.npy", mmap_mode="r")
+            for key in _ENSEMBLE_ARRAYS
+        }
+        meta = entry["ensemble"]
+        return CompiledEnsemble(
+            feature=arrays["feature"],
+            threshold=arrays["threshold"],
+            left=arrays["left"],
+            right=arrays["right"],
+            value=arrays["value"],
+            roots=arrays["roots"],
+            base=arrays["base"],
+            max_depth=meta["max_depth"],
+            n_features=meta["n_features"],
+            output_offsets=arrays["output_offsets"],
+            link=meta["link"],
+        )
+
+    def labels(self, name: str) -> Optional[List[Any]]:
+        """Labels stored with a component (encoder classes, per-output ids)."""
+        if not self.has(name):
+            return None
+        return self.manifest["components"][name].get("labels")
+
+
+def load_bundle(path: Path = BUNDLE_DIR, model_dir: Path = MODEL_DIR) -> Optional[ModelBundle]:
+    """Open a bundle directory, or None if missing or an unknown format."""
+    manifest_path = Path(path) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != BUNDLE_FORMAT_VERSION:
+        logger.warning(
+            f"Ignoring model bundle: format v{manifest.get('format_version')} "
+            f"!= v{BUNDLE_FORMAT_VERSION}"
+        )
+        return None
+    logger.info(f"Using model bundle {manifest['version']} ({len(manifest['components'])} components)")
+    return ModelBundle(path, manifest, model_dir)
+
+
+def get_bundle() -> Optional[ModelBundle]:
+    """Get the process-wide bundle (loaded on first call)."""
+    global _bundle, _bundle_checked
+    if not _bundle_checked:
+        _bundle = load_bundle()
+        _bundle_checked = True
+    return _bundle
+
+
+def reset_bundle() -> None:
+    """Forget the cached bundle (next get_bundle() re-reads the manifest)."""
+    global _bundle, _bundle_checked
+    _bundle = None
+    _bundle_checked = False
+
+
+def load_component(name: str) -> Compiled:
+    """Load a serving component: bundle first, else unpickle and compile.
+
+    Returns:
+        Tuple of (compiled ensemble or None, labels or None)
+
+    Raises:
+        FileNotFoundError: If neither the bundle nor the pickle has it
+    """
+    bundle = get_bundle()
+    if bundle is not None and bundle.has(name):
+        return bundle.ensemble(name), bundle.labels(name)
+
+    import joblib
+
+    logger.info(f"Unpickling {name}.pkl (not in model bundle)")
+    return COMPONENTS[name](joblib.load(MODEL_DIR / f"{name}.pkl"))
+
+
+def component_version(name: str) -> str:
+    """Short hash identifying the model behind a component (for cache keys).
+
+    Uses the source hash recorded in the bundle when the component is served
+    from it, otherwise hashes the pickle on disk.
+    """
+    bundle = get_bundle()
+    if bundle is not None and bundle.has(name):
+        return bundle.manifest["components"][name]["source_sha256"][:12]
+    source = MODEL_DIR / f"{name}.pkl"
+    return file_sha256(source)[:12] if source.exists() else "missing"
+
+
+def export_bundle(out_dir: Path = BUNDLE_DIR, model_dir: Path = MODEL_DIR) -> Dict[str, Any]:
+    """Convert all available pickled artifacts into a bundle directory.
+
+    stage_bundle() then publish_bundle(), so running workers never see a
+    half-written bundle. Missing pickles are skipped.
+
+    Returns:
+        The written manifest
+    """
+    tmp_dir, manifest = stage_bundle(out_dir, model_dir)
+    publish_bundle(tmp_dir, out_dir)
+    return manifest
+
+
+def stage_bundle(out_dir: Path = BUNDLE_DIR, model_dir: Path = MODEL_DIR) -> Tuple[Path, Dict[str, Any]]:
+    """Write the bundle to a temporary sibling of out_dir (not yet served).
+
+    Load it with load_bundle(tmp_dir) to check it, then publish_bundle()
+    or discard_bundle().
+
+    Returns:
+        Tuple of (staging directory, manifest)
+    """
+    import joblib
+
+    out_dir = Path(out_dir)
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    components: Dict[str, Any] = {}
+    for name, convert in COMPONENTS.items():
+        source = Path(model_dir) / f"{name}.pkl"
+        if not source.exists():
+            logger.warning(f"Skipping {name}: {source.name} not found")
+            continue
+
+        ensemble, labels = convert(joblib.load(source))
+        entry: Dict[str, Any] = {
+            "source": source.name,
+            "source_sha256": file_sha256(source),
+        }
+        if ensemble is not None:
+            for key in _ENSEMBLE_ARRAYS:
+                np.save(tmp_dir / f"{name}.{key}.npy", np.ascontiguousarray(getattr(ensemble, key)))
+            entry["ensemble"] = {
+                "link": ensemble.link,
+                "max_depth": ensemble.max_depth,
+                "n_features": ensemble.n_features,
+                "n_outputs": ensemble.n_outputs,
+                "n_trees": ensemble.n_trees,
+                "n_nodes": ensemble.n_nodes,
+            }
+        if labels is not None:
+            entry["labels"] = labels
+        components[name] = entry
+
+    digest = hashlib.sha256(
+        json.dumps({k: v["source_sha256"] for k, v in components.items()}, sort_keys=True).encode()
+    ).hexdigest()
+    manifest = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "version": digest[:12],
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "components": components,
+    }
+    with open(tmp_dir / MANIFEST_NAME, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    return tmp_dir, manifest
+
+
+def publish_bundle(tmp_dir: Path, out_dir: Path = BUNDLE_DIR) -> None:
+    """Swap a staged bundle into out_dir (replacing the served one)."""
+    out_dir = Path(out_dir)
+    old_dir = out_dir.with_name(out_dir.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if out_dir.exists():
+        out_dir.rename(old_dir)
+    Path(tmp_dir).rename(out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def discard_bundle(tmp_dir: Path) -> None:
+    """Delete a staged bundle that failed its checks."""
+    shutil.rmtree(tmp_dir, ignore_errors=True)
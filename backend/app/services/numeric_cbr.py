@@ -0,0 +1,197 @@
+"""Structured numeric kNN over the CBR case base (CBR_MODE=numeric).
+
+build_query_text only encodes category, sqft, complexity and line counts,
+so neighbors can be found directly on those values without an embedding
+model. Cases from app/models/cbr_index/ (see local_cbr.py) are indexed in a
+KD-tree on standardized [log sqft, complexity, material lines, labor lines]
+plus a one-hot category block. Results have the same shape as
+pinecone_cbr.query_similar_cases, with similarity = 1 / (1 + distance).
+"""
+
+import copy
+import json
+import logging
+import warnings
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from app.services.cbr_cases import CASE_FIELDS, case_metadata, case_numeric
+from app.services.local_cbr import INDEX_DIR, META_NAME
+
+logger = logging.getLogger(__name__)
+
+# Distance between two categories relative to one std of a numeric feature
+CATEGORY_WEIGHT = 2.0
+
+
+def _numeric_row(
+    sqft: Optional[float],
+    complexity: Optional[float],
+    material_lines: Optional[float],
+    labor_lines: Optional[float],
+) -> np.ndarray:
+    """Raw feature row, log-scaling sqft (NaN where missing)."""
+    values = [
+        np.log1p(sqft) if sqft is not None and sqft > 0 else np.nan,
+        complexity,
+        material_lines,
+        labor_lines,
+    ]
+    return np.array([v if v is not None else np.nan for v in values], dtype=np.float64)
+
+
+class NumericCaseIndex:
+    """KD-tree over standardized numeric features and one-hot category."""
+
+    def __init__(self, path: Path = INDEX_DIR):
+        self.path = Path(path)
+        with open(self.path / META_NAME) as f:
+            meta = json.load(f)
+        self.version: str = meta["version"]
+        self.case_ids: List[str] = meta["case_ids"]
+        self.cases: List[Dict[str, Any]] = meta["cases"]
+        self.categories: List[str] = meta["categories"]
+        self.category_codes = np.load(self.path / "category.npy")
+        self.sqft = np.load(self.path / "sqft.npy")
+
+        self._fit(np.load(self.path / "numeric.npy"))
+
+    def _fit(self, numeric: np.ndarray) -> None:
+        """Standardize raw NUMERIC_FIELDS rows and (re)build the KD-tree."""
+        self.numeric = numeric
+        raw = np.column_stack([
+            np.where(numeric[:, 0] > 0, np.log1p(np.clip(numeric[:, 0], 0, None)), np.nan),
+            numeric[:, 1:],
+        ])
+        # Missing values sit at the column mean (0 after standardizing)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN columns
+            self.mean = np.nan_to_num(np.nanmean(raw, axis=0))
+            std = np.nan_to_num(np.nanstd(raw, axis=0))
+        self.std = np.where(std > 0, std, 1.0)
+
+        self.tree = cKDTree(np.column_stack([
+            self._standardize(raw),
+            self._one_hot(self.category_codes),
+        ]))
+
+    def __len__(self) -> int:
+        return len(self.case_ids)
+
+    def with_cases(self, case_ids: List[str], cases: List[Dict[str, Any]]) -> "NumericCaseIndex":
+        """Copy of the index with cases added (replacing any with the same id).
+
+        cases are cbr_cases.json-shaped entries; the copy is refit in memory.
+        """
+        new_ids = [str(c) for c in case_ids]
+        replaced = set(new_ids)
+        keep = np.array([cid not in replaced for cid in self.case_ids], dtype=bool)
+        metadata = [case_metadata(case) for case in cases]
+
+        categories = list(self.categories)
+        for m in metadata:
+            if m["category"] not in categories:
+                categories.append(m["category"])
+
+        index = copy.copy(self)
+        index.version = f"{self.version.split('+')[0]}+{int(keep.sum()) + len(new_ids)}"
+        index.case_ids = [cid for cid, k in zip(self.case_ids, keep) if k] + new_ids
+        index.cases = [case for case, k in zip(self.cases, keep) if k] + metadata
+        index.categories = categories
+        index.category_codes = np.concatenate([
+            self.category_codes[keep],
+            np.array(
+                [categories.index(m["category"]) for m in metadata], dtype=self.category_codes.dtype
+            ),
+        ])
+        index.sqft = np.concatenate([
+            self.sqft[keep],
+            np.array(
+                [m["sqft"] if m["sqft"] is not None else np.nan for m in metadata], dtype=np.float64
+            ),
+        ])
+        new_numeric = np.array([case_numeric(case) for case in cases], dtype=np.float64)
+        index._fit(np.concatenate([
+            self.numeric[keep],
+            new_numeric.reshape(-1, self.numeric.shape[1]),
+        ]))
+        return index
+
+    def _standardize(self, raw: np.ndarray) -> np.ndarray:
+        return np.nan_to_num((raw - self.mean) / self.std)
+
+    def _one_hot(self, codes: np.ndarray) -> np.ndarray:
+        codes = np.atleast_1d(codes)
+        one_hot = np.zeros((len(codes), len(self.categories)))
+        valid = codes >= 0
+        one_hot[np.flatnonzero(valid), codes[valid]] = CATEGORY_WEIGHT / np.sqrt(2)
+        return one_hot
+
+    def query(
+        self,
+        sqft: Optional[float],
+        category: str,
+        complexity: Optional[float] = None,
+        material_lines: Optional[float] = None,
+        labor_lines: Optional[float] = None,
+        top_k: int = 5,
+        category_filter: Optional[str] = None,
+        sqft_filter: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Nearest cases to the job, with Pinecone-equivalent filters.
+
+        Widens the KD-tree search until top_k cases pass the filters or
+        every case has been considered.
+        """
+        n = len(self.case_ids)
+        if n == 0 or top_k <= 0:
+            return []
+
+        code = self.categories.index(category) if category in self.categories else -1
+        point = np.concatenate([
+            self._standardize(_numeric_row(sqft, complexity, material_lines, labor_lines)),
+            self._one_hot(np.array([code]))[0],
+        ])
+
+        keep = np.ones(n, dtype=bool)
+        if category_filter:
+            if category_filter not in self.categories:
+                return []
+            keep &= self.category_codes == self.categories.index(category_filter)
+        if sqft_filter and sqft_filter > 0:
+            with np.errstate(invalid="ignore"):
+                keep &= (self.sqft >= sqft_filter * 0.5) & (self.sqft <= sqft_filter * 2.0)
+        n_eligible = int(keep.sum())
+        if n_eligible == 0:
+            return []
+
+        k = min(n, top_k)
+        while True:
+            distances, indices = self.tree.query(point, k=k)
+            distances, indices = np.atleast_1d(distances), np.atleast_1d(indices)
+            matched = keep[indices]
+            if matched.sum() >= min(top_k, n_eligible) or k == n:
+                break
+            k = min(n, k * 4)
+
+        results = []
+        for distance, i in zip(distances[matched][:top_k], indices[matched][:top_k]):
+            case = self.cases[i]
+            results.append({
+                "case_id": self.case_ids[i],
+                "similarity": round(1.0 / (1.0 + float(distance)), 4),
+                **{field: case.get(field) for field in CASE_FIELDS},
+            })
+        return results
+
+
+def load_numeric_index(path: Path = INDEX_DIR) -> Optional[NumericCaseIndex]:
+    """Build the KD-tree from the index directory, or None if it's missing."""
+    if not (Path(path) / "numeric.npy").exists():
+        return None
+    index = NumericCaseIndex(path)
+    logger.info(f"Numeric CBR index {index.version} loaded ({len(index)} cases)")
+    return index
@@ -0,0 +1,198 @@
+"""ONNX Runtime embedding backend (no torch at serving time).
+
+scripts/export_onnx_embedder.py exports the sentence-transformers
+transformer to ONNX, applies int8 dynamic quantization and saves the fast
+tokenizer as tokenizer.json. Serving then only needs onnxruntime and
+tokenizers: token ids go through the quantized graph and mean pooling is
+done in numpy, reproducing SentenceTransformer.encode().
+"""
+
+import json
+import logging
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ONNX_DIR = Path(__file__).parent.parent / "models" / "embedder"
+ONNX_MODEL_NAME = "model.int8.onnx"
+TOKENIZER_NAME = "tokenizer.json"
+META_NAME = "embedder.json"
+
+
+def onnx_available(model_dir: Path = ONNX_DIR) -> bool:
+    """True if an exported model exists and onnxruntime/tokenizers import."""
+    model_dir = Path(model_dir)
+    if not all((model_dir / name).exists() for name in (ONNX_MODEL_NAME, TOKENIZER_NAME, META_NAME)):
+        return False
+    try:
+        import onnxruntime  # noqa: F401
+        import tokenizers  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class OnnxEmbedder:
+    """Quantized transformer + mean pooling, matching SentenceTransformer.encode."""
+
+    def __init__(self, model_dir: Path = ONNX_DIR, num_threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = Path(model_dir)
+        with open(model_dir / META_NAME) as f:
+            self.meta: Dict[str, Any] = json.load(f)
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / TOKENIZER_NAME))
+        self.tokenizer.enable_truncation(max_length=self.meta["max_seq_length"])
+        self.tokenizer.enable_padding(
+            pad_id=self.meta["pad_token_id"], pad_token=self.meta["pad_token"]
+        )
+
+        options = ort.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            str(model_dir / ONNX_MODEL_NAME),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    @property
+    def model_name(self) -> str:
+        return self.meta["model"]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts, shape (len(texts), dim) float32."""
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over non-padding tokens (sentence-transformers Pooling)
+        mask = attention_mask[:, :, None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        return (summed / counts).astype(np.float32)
+
+
+def export_onnx_embedder(model_name: str, out_dir: Path = ONNX_DIR) -> Dict[str, Any]:
+    """Export a mean-pooling SentenceTransformer to a quantized ONNX directory.
+
+    stage_onnx_embedder() then publish_onnx_embedder(), so the server never
+    sees a half-written export.
+
+    Returns:
+        The written metadata
+
+    Raises:
+        ValueError: If the model isn't Transformer + mean Pooling
+    """
+    tmp_dir, meta = stage_onnx_embedder(model_name, out_dir)
+    publish_onnx_embedder(tmp_dir, out_dir)
+    return meta
+
+
+def stage_onnx_embedder(model_name: str, out_dir: Path = ONNX_DIR) -> Tuple[Path, Dict[str, Any]]:
+    """Export to a temporary sibling of out_dir (not yet served).
+
+    Needs torch, sentence-transformers, onnx and onnxruntime (export only).
+    Check it with OnnxEmbedder(tmp_dir), then publish_onnx_embedder() or
+    discard_onnx_embedder().
+
+    Returns:
+        Tuple of (staging directory, metadata)
+
+    Raises:
+        ValueError: If the model isn't Transformer + mean Pooling
+    """
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    st = SentenceTransformer(model_name, device="cpu")
+    st.eval()
+    modules = list(st)
+    pooling = modules[1] if len(modules) == 2 else None
+    # sentence-transformers < 6 exposes pooling_mode_mean_tokens, >= 6 pooling_mode
+    is_mean = pooling is not None and (
+        getattr(pooling, "pooling_mode_mean_tokens", False)
+        or getattr(pooling, "pooling_mode", None) == "mean"
+    )
+    if not is_mean:
+        raise ValueError(f"{model_name}: only Transformer + mean Pooling models can be exported")
+
+    transformer = modules[0].auto_model
+    tokenizer = st.tokenizer
+
+    class _TokenEmbeddings(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return self.model(input_ids=input_ids, attention_mask=attention_mask).last_hidden_state
+
+    out_dir = Path(out_dir)
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    dummy = tokenizer(["Toiture Bardeaux, 1500 pieds carres"], return_tensors="pt")
+    fp32_path = tmp_dir / "model.onnx"
+    with torch.no_grad():
+        torch.onnx.export(
+            _TokenEmbeddings(transformer),
+            (dummy["input_ids"], dummy["attention_mask"]),
+            str(fp32_path),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["token_embeddings"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "token_embeddings": {0: "batch", 1: "sequence"},
+            },
+            opset_version=17,
+            dynamo=False,
+        )
+    quantize_dynamic(str(fp32_path), str(tmp_dir / ONNX_MODEL_NAME), weight_type=QuantType.QInt8)
+    fp32_path.unlink()
+
+    tokenizer.backend_tokenizer.save(str(tmp_dir / TOKENIZER_NAME))
+    meta = {
+        "model": model_name,
+        "max_seq_length": int(st.max_seq_length),
+        "pad_token": tokenizer.pad_token,
+        "pad_token_id": int(tokenizer.pad_token_id),
+        "dimension": int(st.get_sentence_embedding_dimension()),
+        "quantization": "int8-dynamic",
+    }
+    with open(tmp_dir / META_NAME, "w") as f:
+        json.dump(meta, f, indent=2)
+
+    return tmp_dir, meta
+
+
+def publish_onnx_embedder(tmp_dir: Path, out_dir: Path = ONNX_DIR) -> None:
+    """Swap a staged export into out_dir (replacing the served one)."""
+    out_dir = Path(out_dir)
+    old_dir = out_dir.with_name(out_dir.name + ".old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if out_dir.exists():
+        out_dir.rename(old_dir)
+    Path(tmp_dir).rename(out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def discard_onnx_embedder(tmp_dir: Path) -> None:
+    """Delete a staged export that failed its parity check."""
+    shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -1,21 +1,83 @@
-"""Pinecone operations for Case-Based Reasoning."""
+"""Pinecone operations for Case-Based Reasoning.
 
-from typing import Any, Dict, List, Optional
+CBR_BACKEND=local answers the same queries from the in-process index in
+local_cbr.py instead of calling Pinecone. CBR_MODE=numeric (or cbr_mode on
+a request) skips embeddings and uses the numeric kNN in numeric_cbr.py.
+
+Pinecone results are cached (TTL + LRU) per quantized query vector and
+filters. scripts/upload_embeddings.py writes a version stamp record into
+the index; the stamp is part of every cache key and is re-read every
+CBR_VERSION_CHECK_S, so a re-upload invalidates cached results.
+
+Async callers use aquery_similar_cases, which awaits Pinecone on an
+asyncio client (pooled aiohttp session opened in init_pinecone) instead
+of holding an executor thread for the network wait.
+
+With CBR_PARTITIONED=true and an index uploaded with --partitioned (the
+stamp lists per-category namespaces and their sizes), a query searches
+only the job category's namespace, fanning out to neighboring categories
+when it's small (see cbr_partitions.py). The local index is sharded by
+category the same way.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
 import logging
+import threading
+import time
 
+import numpy as np
 from pinecone.grpc import PineconeGRPC as Pinecone
 
 from app.config import settings
+from app.services.cache import LRUCache
+from app.services.cbr_partitions import category_slug, partition_namespace, select_partitions
+from app.services.executors import run_io
+from app.services.local_cbr import LocalCaseIndex, load_local_index
+from app.services.numeric_cbr import NumericCaseIndex, load_numeric_index
+from app.services.resilience import LatencyWindow
 
 logger = logging.getLogger(__name__)
 
 _pc: Pinecone = None
 _index = None
+_aindex = None  # asyncio client sharing one aiohttp connection pool
+_local_index: Optional[LocalCaseIndex] = None
+_numeric_index: Optional[NumericCaseIndex] = None
+
+# Version stamp record written by upload_embeddings.py (dummy unit vector)
+VERSION_NAMESPACE = "meta"
+VERSION_RECORD_ID = "cbr_version"
+
+# Case ids of approved submissions added at runtime (see cbr_ingest.py);
+# upload_embeddings.py leaves them alone when pruning stale vectors
+INGESTED_ID_PREFIX = "submission-"
+
+# Query vectors are rounded before hashing so float noise still hits
+_VECTOR_DECIMALS = 4
+
+_result_cache = LRUCache("cbr_results", settings.cbr_cache_size, ttl=settings.cbr_cache_ttl_s)
+# Latency of real Pinecone round trips (not result-cache hits or the local
+# index); drives the hybrid quote hedge delay
+pinecone_latency = LatencyWindow()
+_index_version: Optional[str] = None
+_version_checked_at: float = 0.0
+_version_lock = threading.Lock()
+# Partition slug -> case count when the index is split per category
+_partition_sizes: Dict[str, int] = {}
 
 
 def init_pinecone():
-    """Initialize Pinecone client. Called from lifespan."""
-    global _pc, _index
+    """Initialize the CBR backend (Pinecone client or local index). Called from lifespan."""
+    global _pc, _index, _aindex, _local_index, _numeric_index
+    # Numeric kNN is cheap to build and can be requested per call, so load it
+    # whenever the index directory exists
+    _numeric_index = load_numeric_index()
+    if settings.cbr_mode == "numeric" and _numeric_index is None:
+        logger.warning("CBR_MODE=numeric but no cbr_index built (run scripts/build_cbr_index.py)")
+    if settings.cbr_backend == "local":
+        _local_index = load_local_index()
+        return
     if not settings.pinecone_api_key:
         logger.warning("Pinecone API key not set, skipping initialization")
         return
@@ -25,14 +87,59 @@ def init_pinecone():
     logger.info("Connecting to Pinecone...")
     _pc = Pinecone(api_key=settings.pinecone_api_key)
     _index = _pc.Index(host=settings.pinecone_index_host)
+    try:
+        # Pooled aiohttp client for async callers (hybrid quotes)
+        _aindex = _pc.IndexAsyncio(host=settings.pinecone_index_host)
+    except Exception as e:
+        logger.warning(f"Pinecone asyncio client unavailable ({e}), async queries use threads")
+        _aindex = None
+    if _aindex is not None:
+        try:
+            _size_async_pool(_aindex, settings.pinecone_pool_size)
+        except Exception as e:
+            # Client internals moved (other pinecone/aiohttp version): keep the
+            # client with its default pool rather than dropping to threads
+            logger.warning(f"Could not apply PINECONE_POOL_SIZE ({e}), using the client's default pool")
     logger.info("Pinecone connected successfully")
 
 
+def _size_async_pool(aindex: Any, pool_size: int) -> None:
+    """Cap the asyncio client's aiohttp connection pool at pool_size.
+
+    pinecone 7.x ignores connection_pool_maxsize for IndexAsyncio and builds
+    its TCPConnector with aiohttp's default limit (100), so the limit is set
+    on that connector directly, before any connection is opened.
+
+    Raises:
+        AttributeError: If the client's internals differ from pinecone 7.x
+    """
+    connector = aindex._api_client.rest_client._session.connector
+    connector._limit = max(pool_size, 1)
+
+
+async def aclose_pinecone():
+    """Close the asyncio client's connection pool, then close_pinecone()."""
+    if _aindex is not None:
+        try:
+            await _aindex.close()
+        except Exception as e:
+            logger.warning(f"Error closing Pinecone asyncio client: {e}")
+    close_pinecone()
+
+
 def close_pinecone():
     """Cleanup on shutdown."""
-    global _pc, _index
+    global _pc, _index, _aindex, _local_index, _numeric_index
+    global _index_version, _version_checked_at, _partition_sizes
     _pc = None
     _index = None
+    _aindex = None
+    _local_index = None
+    _numeric_index = None
+    _index_version = None
+    _version_checked_at = 0.0
+    _partition_sizes = {}
+    _result_cache.clear()
 
 
 def is_pinecone_available() -> bool:
@@ -40,55 +147,152 @@ def is_pinecone_available() -> bool:
     return _index is not None
 
 
-def query_similar_cases(
-    query_vector: List[float],
+def is_cbr_available() -> bool:
+    """Check if the configured CBR backend (Pinecone or local) can answer queries."""
+    return _local_index is not None or _index is not None
+
+
+def use_numeric_cbr(requested_mode: Optional[str] = None) -> bool:
+    """Whether a query should use numeric kNN (request override, else CBR_MODE)."""
+    mode = requested_mode or settings.cbr_mode
+    return mode == "numeric" and _numeric_index is not None
+
+
+def query_numeric_cases(
+    sqft: Optional[float],
+    category: str,
+    complexity: Optional[float] = None,
+    material_lines: Optional[int] = None,
+    labor_lines: Optional[int] = None,
     top_k: int = 5,
     category_filter: Optional[str] = None,
     sqft_filter: Optional[float] = None,
-    namespace: str = "cbr"
 ) -> List[Dict[str, Any]]:
-    """Query Pinecone for similar historical cases.
+    """Find similar cases from job inputs alone (no embedding model).
 
-    Args:
-        query_vector: Embedding vector for similarity search
-        top_k: Number of results to return
-        category_filter: Optional category to filter by
-        sqft_filter: If provided, filters to cases within 0.5x-2x this sqft value
-        namespace: Pinecone namespace
+    Same arguments as build_query_text plus the query_similar_cases filters;
+    returns the same structure as query_similar_cases.
     """
-    if _index is None:
-        logger.warning("Pinecone not initialized, returning empty results")
+    if _numeric_index is None:
+        logger.warning("Numeric CBR index not loaded, returning empty results")
         return []
+    return _numeric_index.query(
+        sqft, category, complexity, material_lines, labor_lines,
+        top_k=top_k, category_filter=category_filter, sqft_filter=sqft_filter,
+    )
+
+
+def _record_version(response: Any) -> Optional[str]:
+    """Version from a fetch response for the stamp record (None if absent)."""
+    record = response.vectors.get(VERSION_RECORD_ID)
+    if record is None or not record.metadata:
+        return None
+    return record.metadata.get("version")
+
+
+def _record_partitions(response: Any) -> Dict[str, int]:
+    """{partition slug: case count} from the stamp record ({} if unpartitioned).
+
+    upload_embeddings.py --partitioned stores them as "slug:count" strings.
+    """
+    record = response.vectors.get(VERSION_RECORD_ID)
+    if record is None or not record.metadata:
+        return {}
+    sizes = {}
+    for entry in record.metadata.get("partitions") or []:
+        slug, _, count = str(entry).rpartition(":")
+        if slug and count.isdigit():
+            sizes[slug] = int(count)
+    return sizes
+
+
+def _version_check_due() -> bool:
+    """True (and marks the check as done) if the stamp should be re-read now."""
+    global _version_checked_at
+    with _version_lock:
+        now = time.monotonic()
+        if now - _version_checked_at < settings.cbr_version_check_s:
+            return False
+        _version_checked_at = now
+        return True
+
+
+def _set_index_version(version: Optional[str], partitions: Optional[Dict[str, int]] = None) -> str:
+    """Adopt a freshly read stamp, clearing the result cache if it changed."""
+    global _index_version, _partition_sizes
+    with _version_lock:
+        version = version or _index_version or "unversioned"
+        if _index_version is not None and version != _index_version:
+            logger.info(f"CBR index version {_index_version} -> {version}, clearing result cache")
+            _result_cache.clear()
+        _index_version = version
+        if partitions is not None:
+            _partition_sizes = partitions
+        return version
+
+
+def get_index_version() -> str:
+    """Current index version stamp, re-read at most every CBR_VERSION_CHECK_S.
+
+    Clears the result cache when the stamp changes. Keeps the last known
+    version if the fetch fails.
+    """
+    if _index is None or not _version_check_due():
+        return _index_version or "unversioned"
+    try:
+        response = _index.fetch(ids=[VERSION_RECORD_ID], namespace=VERSION_NAMESPACE)
+        version = _record_version(response) or "unversioned"
+        partitions = _record_partitions(response)
+    except Exception as e:
+        logger.warning(f"Pinecone version check failed: {e}")
+        version, partitions = None, None
+    return _set_index_version(version, partitions)
+
 
-    # Build filter conditions
+async def aget_index_version() -> str:
+    """Async get_index_version() using the asyncio client."""
+    if _aindex is None or not _version_check_due():
+        return _index_version or "unversioned"
+    try:
+        response = await _aindex.fetch(ids=[VERSION_RECORD_ID], namespace=VERSION_NAMESPACE)
+        version = _record_version(response) or "unversioned"
+        partitions = _record_partitions(response)
+    except Exception as e:
+        logger.warning(f"Pinecone version check failed: {e}")
+        version, partitions = None, None
+    return _set_index_version(version, partitions)
+
+
+def _sqft_range(sqft_filter: Optional[float]) -> Optional[Tuple[float, float]]:
+    """0.5x-2x sqft range, so similar cases are actually comparable in size."""
+    if sqft_filter and sqft_filter > 0:
+        return sqft_filter * 0.5, sqft_filter * 2.0
+    return None
+
+
+def _build_filter(
+    category_filter: Optional[str],
+    sqft_range: Optional[Tuple[float, float]],
+) -> Optional[Dict[str, Any]]:
+    """Pinecone metadata filter for the category and sqft range."""
     filter_conditions = []
 
     if category_filter:
         filter_conditions.append({"category": {"$eq": category_filter}})
 
-    # Add sqft range filter: 0.5x to 2x the input sqft
-    # This ensures similar cases are actually comparable in size
-    if sqft_filter and sqft_filter > 0:
-        sqft_min = sqft_filter * 0.5
-        sqft_max = sqft_filter * 2.0
-        filter_conditions.append({"sqft": {"$gte": sqft_min}})
-        filter_conditions.append({"sqft": {"$lte": sqft_max}})
+    if sqft_range is not None:
+        filter_conditions.append({"sqft": {"$gte": sqft_range[0]}})
+        filter_conditions.append({"sqft": {"$lte": sqft_range[1]}})
 
     # Combine filters with $and if multiple conditions
-    filter_dict = None
     if len(filter_conditions) == 1:
-        filter_dict = filter_conditions[0]
-    elif len(filter_conditions) > 1:
-        filter_dict = {"$and": filter_conditions}
-
-    results = _index.query(
-        vector=query_vector,
-        top_k=top_k,
-        include_metadata=True,
-        namespace=namespace,
-        filter=filter_dict
-    )
+        return filter_conditions[0]
+    if len(filter_conditions) > 1:
+        return {"$and": filter_conditions}
+    return None
+
 
+def _parse_matches(results: Any) -> List[Dict[str, Any]]:
     similar_cases = []
     for match in results.matches:
         similar_cases.append({
@@ -100,5 +304,263 @@ def query_similar_cases(
             "per_sqft": match.metadata.get("per_sqft"),
             "year": match.metadata.get("year"),
         })
+    return similar_cases
+
+
+def _result_cache_key(
+    version: str,
+    query_vector: List[float],
+    top_k: int,
+    category_filter: Optional[str],
+    sqft_range: Optional[Tuple[float, float]],
+    namespaces: List[str],
+) -> str:
+    # + 0.0 folds -0.0 into 0.0 so both hash the same
+    vector = np.round(np.asarray(query_vector, dtype=np.float32), _VECTOR_DECIMALS) + 0.0
+    vector_hash = hashlib.sha1(vector.tobytes()).hexdigest()
+    if sqft_range is not None:
+        sqft_range = (round(sqft_range[0], 2), round(sqft_range[1], 2))
+    return f"{version}:{','.join(namespaces)}:{top_k}:{category_filter}:{sqft_range}:{vector_hash}"
+
+
+def _use_partitions() -> bool:
+    """Whether queries are routed to category partitions (setting on, index partitioned)."""
+    return settings.cbr_partitioned and bool(_partition_sizes)
+
 
+def _search_plan(
+    category: Optional[str],
+    category_filter: Optional[str],
+    namespace: str,
+) -> Tuple[List[str], Optional[str]]:
+    """Namespaces to query and the category filter still needed within them.
+
+    In partitioned mode the partition replaces the category filter: a
+    filtered query searches that category's namespace only; otherwise the
+    job's own partition is searched, fanned out to neighbors if it's small.
+    """
+    if not _use_partitions():
+        return [namespace], category_filter
+    if category_filter:
+        slugs = [category_slug(category_filter)]
+        slugs = [slug for slug in slugs if slug in _partition_sizes]
+    else:
+        slugs = select_partitions(category, _partition_sizes, settings.cbr_partition_min_cases)
+    return [f"{namespace}-{slug}" for slug in slugs], None
+
+
+def _local_partitions(category: Optional[str]) -> Optional[List[str]]:
+    """Local shards to search for a job in this category (None = all)."""
+    if not settings.cbr_partitioned or not category:
+        return None
+    return select_partitions(
+        category, _local_index.partition_sizes(), settings.cbr_partition_min_cases
+    )
+
+
+def query_similar_cases(
+    query_vector: List[float],
+    top_k: int = 5,
+    category_filter: Optional[str] = None,
+    sqft_filter: Optional[float] = None,
+    namespace: str = "cbr",
+    category: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Query Pinecone for similar historical cases.
+
+    Args:
+        query_vector: Embedding vector for similarity search
+        top_k: Number of results to return
+        category_filter: Optional category to filter by
+        sqft_filter: If provided, filters to cases within 0.5x-2x this sqft value
+        namespace: Pinecone namespace (the local index has a single namespace)
+        category: Job category; with CBR_PARTITIONED only its partition (plus
+            neighbors when small) is searched
+    """
+    if _local_index is not None:
+        return _local_index.query(
+            query_vector, top_k, category_filter, sqft_filter, _local_partitions(category)
+        )
+
+    if _index is None:
+        logger.warning("Pinecone not initialized, returning empty results")
+        return []
+
+    sqft_range = _sqft_range(sqft_filter)
+    version = get_index_version()
+    namespaces, category_filter = _search_plan(category, category_filter, namespace)
+    if not namespaces:
+        return []
+    cache_key = _result_cache_key(
+        version, query_vector, top_k, category_filter, sqft_range, namespaces
+    )
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        return [dict(case) for case in cached]
+
+    query_filter = _build_filter(category_filter, sqft_range)
+    t0 = time.perf_counter()
+    if len(namespaces) == 1:
+        results = _index.query(
+            vector=query_vector,
+            top_k=top_k,
+            include_metadata=True,
+            namespace=namespaces[0],
+            filter=query_filter,
+        )
+    else:
+        # Fan-out: the client queries the partitions concurrently and merges by score
+        results = _index.query_namespaces(
+            vector=list(query_vector),
+            namespaces=namespaces,
+            metric="cosine",
+            top_k=top_k,
+            include_metadata=True,
+            filter=query_filter,
+        )
+
+    pinecone_latency.record(time.perf_counter() - t0)
+    similar_cases = _parse_matches(results)
+    _result_cache.put(cache_key, [dict(case) for case in similar_cases])
     return similar_cases
+
+
+async def aquery_similar_cases(
+    query_vector: List[float],
+    top_k: int = 5,
+    category_filter: Optional[str] = None,
+    sqft_filter: Optional[float] = None,
+    namespace: str = "cbr",
+    category: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Async query_similar_cases: awaits Pinecone on the pooled asyncio client.
+
+    Same arguments and results. The network wait holds no thread; if the
+    asyncio client isn't available the sync client runs on the I/O executor.
+    """
+    if _local_index is not None:
+        return _local_index.query(
+            query_vector, top_k, category_filter, sqft_filter, _local_partitions(category)
+        )
+
+    if _aindex is None:
+        return await run_io(
+            query_similar_cases,
+            query_vector, top_k, category_filter, sqft_filter, namespace, category,
+        )
+
+    sqft_range = _sqft_range(sqft_filter)
+    version = await aget_index_version()
+    namespaces, category_filter = _search_plan(category, category_filter, namespace)
+    if not namespaces:
+        return []
+    cache_key = _result_cache_key(
+        version, query_vector, top_k, category_filter, sqft_range, namespaces
+    )
+    cached = _result_cache.get(cache_key)
+    if cached is not None:
+        return [dict(case) for case in cached]
+
+    query_filter = _build_filter(category_filter, sqft_range)
+    t0 = time.perf_counter()
+    if len(namespaces) == 1:
+        results = await _aindex.query(
+            vector=list(query_vector),
+            top_k=top_k,
+            include_metadata=True,
+            namespace=namespaces[0],
+            filter=query_filter,
+        )
+    else:
+        results = await _aindex.query_namespaces(
+            vector=list(query_vector),
+            namespaces=namespaces,
+            metric="cosine",
+            top_k=top_k,
+            include_metadata=True,
+            filter=query_filter,
+        )
+
+    pinecone_latency.record(time.perf_counter() - t0)
+    similar_cases = _parse_matches(results)
+    _result_cache.put(cache_key, [dict(case) for case in similar_cases])
+    return similar_cases
+
+
+def pinecone_metadata(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a cbr_cases.json-shaped case into Pinecone record metadata.
+
+    Pinecone rejects null values, so missing fields are dropped.
+    """
+    features = case.get("features", {})
+    pricing = case.get("pricing", {})
+    metadata = {
+        "case_id": str(case.get("case_id")),
+        "year": case.get("year"),
+        "category": features.get("category", "Unknown"),
+        "sqft": features.get("sqft"),
+        "total": pricing.get("total"),
+        "per_sqft": pricing.get("per_sqft"),
+        "material_sell": pricing.get("material_sell"),
+        "labor_sell": pricing.get("labor_sell"),
+        "complexity_score": features.get("complexity_score"),
+    }
+    return {k: v for k, v in metadata.items() if v is not None}
+
+
+def add_cases(
+    cases: List[Dict[str, Any]],
+    vectors: Optional[np.ndarray] = None,
+    namespace: str = "cbr",
+) -> int:
+    """Add (or replace) cases in the live CBR backends.
+
+    Upserts to Pinecone, or swaps in a local index copy containing the cases,
+    and always updates the numeric kNN index when it's loaded. Cached
+    Pinecone results are dropped so the new cases show up immediately.
+
+    Args:
+        cases: cbr_cases.json-shaped entries (case_id, year, features, pricing)
+        vectors: Case embeddings, one row per case (needed for Pinecone/local)
+        namespace: Pinecone namespace
+
+    Returns:
+        Number of backends updated
+    """
+    global _local_index, _numeric_index, _partition_sizes
+    if not cases:
+        return 0
+    case_ids = [str(case["case_id"]) for case in cases]
+    updated = 0
+
+    if vectors is not None and _local_index is not None:
+        _local_index = _local_index.with_cases(case_ids, vectors, cases)
+        updated += 1
+    elif vectors is not None and _index is not None:
+        # Partition sizes come from the version stamp; read it now in case
+        # no query has yet (else early ingests land in the unpartitioned namespace)
+        get_index_version()
+        by_namespace: Dict[str, List[Dict[str, Any]]] = {}
+        for case_id, vector, case in zip(case_ids, vectors, cases):
+            metadata = pinecone_metadata(case)
+            # A partitioned index keeps each case in its category's namespace
+            target = (
+                partition_namespace(metadata["category"], namespace) if _partition_sizes else namespace
+            )
+            by_namespace.setdefault(target, []).append({
+                "id": case_id,
+                "values": np.asarray(vector, dtype=np.float32).tolist(),
+                "metadata": metadata,
+            })
+        for target, records in by_namespace.items():
+            _index.upsert(vectors=records, namespace=target)
+            if _partition_sizes:
+                slug = target[len(namespace) + 1:]
+                _partition_sizes = {**_partition_sizes, slug: _partition_sizes.get(slug, 0) + len(records)}
+        _result_cache.clear()
+        updated += 1
+
+    if _numeric_index is not None:
+        _numeric_index = _numeric_index.with_cases(case_ids, cases)
+        updated += 1
+    return updated
@@ -1,51 +1,121 @@
 """ML model loading and prediction service.
 
 Adapted from cortex-data/predict_final.py for FastAPI serving.
-Uses lazy loading to reduce memory footprint at startup.
+Uses lazy loading to reduce memory footprint at startup. With background
+loading enabled, predict() answers from the percentile table
+(model_b_percentiles.csv) until the models are ready.
+Price models are evaluated with the flat-array engine in tree_engine.py and
+shared across workers through the memory-mapped bundle (model_bundle.py).
 """
 
+import csv
 import gc
 import json
 import logging
+import threading
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 
+from app.config import settings
+from app.services.cache import LRUCache, quantize
+from app.services.model_bundle import component_version, load_component
+from app.services.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 # Module-level storage (shared across requests)
 _models: dict = {}
 _config: dict = {}
 _loaded: bool = False
+_model_version: str = ""
+_load_lock = threading.Lock()
+_background_loading: bool = False
+
+# (job_category, size_bucket) -> {"p25", "p50", "p75"} from model_b_percentiles.csv
+_percentiles: Dict[Tuple[str, str], Dict[str, float]] = {}
+SIZE_BUCKETS = ["Small", "Medium", "Large"]
+
+# Memoized predict() results, keyed on (model version, canonical inputs)
+_cache = LRUCache("price", settings.prediction_cache_size)
 
 MODEL_DIR = Path(__file__).parent.parent / "models"
 
 
 def _ensure_models_loaded() -> None:
-    """Lazy-load ML models on first use."""
-    global _loaded
+    """Lazy-load ML models on first use (thread-safe)."""
+    global _loaded, _model_version
     if _loaded:
         return
 
-    import joblib
+    with _load_lock:
+        if _loaded:
+            return
 
-    logger.info("Lazy-loading ML models (first use)...")
+        logger.info("Loading ML models...")
 
-    _models["global"] = joblib.load(MODEL_DIR / "cortex_model_global.pkl")
-    _models["bardeaux"] = joblib.load(MODEL_DIR / "cortex_model_Bardeaux.pkl")
-    _models["encoder"] = joblib.load(MODEL_DIR / "category_encoder_v3.pkl")
+        # Compiled flat-array ensembles (memory-mapped from the model bundle when exported)
+        _models["global"], _ = load_component("cortex_model_global")
+        _models["bardeaux"], _ = load_component("cortex_model_Bardeaux")
+        _model_version = (
+            f"{component_version('cortex_model_global')}:{component_version('cortex_model_Bardeaux')}"
+        )
 
-    with open(MODEL_DIR / "cortex_config_v3.json") as f:
-        _config.update(json.load(f))
+        with open(MODEL_DIR / "cortex_config_v3.json") as f:
+            _config.update(json.load(f))
 
-    gc.collect()
-    _loaded = True
-    logger.info("ML models loaded successfully")
+        gc.collect()
+        _loaded = True
+        logger.info("ML models loaded successfully")
+
+
+def _load_percentiles() -> None:
+    """Load the per-category/size-bucket price percentiles (tiny CSV)."""
+    if _percentiles:
+        return
+    with open(MODEL_DIR / "model_b_percentiles.csv", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            _percentiles[(row["job_category"], row["size_bucket"])] = {
+                "p25": float(row["p25"]),
+                "p50": float(row["p50"]),
+                "p75": float(row["p75"]),
+            }
+
+
+def _background_load() -> None:
+    """Load models off the request path (runs in a daemon thread)."""
+    global _background_loading
+    try:
+        _ensure_models_loaded()
+    except Exception as e:
+        logger.error(f"Background model load failed: {e}")
+    finally:
+        _background_loading = False
 
 
-def load_models() -> None:
-    """No-op for backward compatibility. Models load lazily on first use."""
-    logger.info("ML models will load on first prediction request (lazy loading)")
+def load_models(background: bool = False) -> None:
+    """Prepare price models at startup.
+
+    By default models still load lazily on the first predict(). With
+    background=True, loading starts in a daemon thread and predict()
+    answers from the percentile table until it finishes.
+    """
+    global _background_loading
+    _load_percentiles()
+
+    if not background:
+        logger.info("ML models will load on first prediction request (lazy loading)")
+        return
+
+    logger.info("Loading ML models in background (percentile fallback until ready)")
+    _background_loading = True
+    threading.Thread(target=_background_load, name="model-loader", daemon=True).start()
+
+
+def models_ready() -> bool:
+    """Whether the price models are loaded."""
+    return _loaded
 
 
 def unload_models() -> None:
@@ -53,10 +123,82 @@ def unload_models() -> None:
     global _loaded
     _models.clear()
     _config.clear()
+    _cache.clear()
     _loaded = False
     gc.collect()
 
 
+def _size_bucket(sqft: Optional[float]) -> str:
+    """Size bucket used by model_b_percentiles.csv (see train_cortex.py)."""
+    if not sqft or sqft < 800:
+        return "Small"
+    elif sqft < 2000:
+        return "Medium"
+    return "Large"
+
+
+def predict_percentile(sqft: Optional[float], category: str) -> dict:
+    """Ballpark estimate from historical price percentiles (no ML model).
+
+    Uses the category's nearest available size bucket, or "Other" for
+    categories missing from the table. Range is p25-p75.
+
+    Returns:
+        dict with the same keys as predict(), model="percentile-fallback"
+    """
+    _load_percentiles()
+
+    bucket = _size_bucket(sqft)
+    table_category = category if any(c == category for c, _ in _percentiles) else "Other"
+    available = [b for b in SIZE_BUCKETS if (table_category, b) in _percentiles]
+    nearest = min(
+        available,
+        key=lambda b: abs(SIZE_BUCKETS.index(b) - SIZE_BUCKETS.index(bucket)),
+    )
+    row = _percentiles[(table_category, nearest)]
+
+    return {
+        "estimate": round(row["p50"], 2),
+        "range_low": round(row["p25"], 2),
+        "range_high": round(row["p75"], 2),
+        "model": "percentile-fallback",
+        "confidence": "LOW",
+    }
+
+
+def _format_result(prediction: float, category: str) -> dict:
+    """Build the estimate dict for a raw model prediction."""
+    if category == "Bardeaux":
+        model_used = "Bardeaux (R2=0.65)"
+        confidence = "HIGH"
+    else:
+        model_used = "Global (R2=0.59)"
+        # Elastomere with accent from config
+        confidence = "MEDIUM" if category in ["Other", "\u00c9lastom\u00e8re"] else "LOW"
+
+    return {
+        "estimate": round(float(prediction), 2),
+        "range_low": round(float(prediction * 0.80), 2),
+        "range_high": round(float(prediction * 1.20), 2),
+        "model": model_used,
+        "confidence": confidence,
+    }
+
+
+def _models_available() -> bool:
+    """Load the models if needed, unless a background load is in flight.
+
+    Returns:
+        False while the background load runs (answer from percentiles instead)
+    """
+    # Don't block on a cold start: answer from percentiles while models load
+    if not _loaded and _background_loading:
+        return False
+    _ensure_models_loaded()
+    return True
+
+
+@traced("price_model")
 def predict(
     sqft: float,
     category: str,
@@ -78,7 +220,23 @@ def predict(
     Returns:
         dict with estimate, range_low, range_high, model, confidence
     """
-    _ensure_models_loaded()
+    if not _models_available():
+        return predict_percentile(sqft, category)
+
+    # Snap sqft in the key only, so near-identical form submissions share a
+    # cache entry while the model still sees the raw input
+    key = (
+        _model_version,
+        quantize(sqft, settings.prediction_cache_sqft_step),
+        category,
+        int(material_lines),
+        int(labor_lines),
+        int(has_subs),
+        int(complexity),
+    )
+    cached = _cache.get(key)
+    if cached is not None:
+        return dict(cached)
 
     # Per-category features (no cat_enc)
     X_cat = np.array([[sqft, material_lines, labor_lines, has_subs, complexity]])
@@ -92,18 +250,67 @@ def predict(
     # Use specialized model for Bardeaux, global for others
     if category == "Bardeaux":
         prediction = _models["bardeaux"].predict(X_cat)[0]
-        model_used = "Bardeaux (R2=0.65)"
-        confidence = "HIGH"
     else:
         prediction = _models["global"].predict(X_global)[0]
-        model_used = "Global (R2=0.59)"
-        # Elastomere with accent from config
-        confidence = "MEDIUM" if category in ["Other", "\u00c9lastom\u00e8re"] else "LOW"
 
-    return {
-        "estimate": round(float(prediction), 2),
-        "range_low": round(float(prediction * 0.80), 2),
-        "range_high": round(float(prediction * 1.20), 2),
-        "model": model_used,
-        "confidence": confidence,
-    }
+    result = _format_result(prediction, category)
+    _cache.put(key, result)
+    return dict(result)
+
+
+def predict_batch(jobs: List[Dict[str, Any]]) -> List[dict]:
+    """Generate price estimates for many jobs with one model call per group.
+
+    Jobs are split into Bardeaux (specialized model) and everything else
+    (global model). Each group is predicted as a single feature matrix, which
+    avoids paying sklearn's per-call validation overhead once per job.
+
+    Args:
+        jobs: List of dicts with the same keys as predict() arguments
+              (sqft and category required, others use predict() defaults)
+
+    Returns:
+        List of estimate dicts (same shape as predict()), in input order
+    """
+    if not jobs:
+        return []
+    if not _models_available():
+        return [predict_percentile(job.get("sqft"), job["category"]) for job in jobs]
+
+    bardeaux_idx: List[int] = []
+    bardeaux_rows: List[List[float]] = []
+    global_idx: List[int] = []
+    global_rows: List[List[float]] = []
+
+    for i, job in enumerate(jobs):
+        category = job["category"]
+        row = [
+            # Service calls may omit sqft
+            job.get("sqft") or 0,
+            job.get("material_lines", 5),
+            job.get("labor_lines", 2),
+            job.get("has_subs", 0),
+            job.get("complexity", 10),
+        ]
+        if category == "Bardeaux":
+            bardeaux_idx.append(i)
+            bardeaux_rows.append(row)
+        else:
+            row.append(_config["category_mapping"].get(category, 0))
+            global_idx.append(i)
+            global_rows.append(row)
+
+    predictions = np.empty(len(jobs), dtype=np.float64)
+    if bardeaux_rows:
+        predictions[bardeaux_idx] = _models["bardeaux"].predict(
+            np.array(bardeaux_rows, dtype=np.float64)
+        )
+    if global_rows:
+        predictions[global_idx] = _models["global"].predict(
+            np.array(global_rows, dtype=np.float64)
+        )
+
+    return [
+        _format_result(prediction, job["category"])
+        for prediction, job in zip(predictions, jobs)
+    ]
@@ -0,0 +1,157 @@
+"""Deadlines, hedged requests and circuit breaking for remote calls.
+
+Used by hybrid_quote to keep Pinecone's tail latency out of quote latency:
+CBR runs under a deadline, a second (hedged) request can start once the
+first is slower than the recent p95, and repeated failures open a breaker
+that skips CBR entirely for a cool-down period.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed -> open -> half-open -> closed.
+
+    After failure_threshold consecutive failures the breaker opens and
+    allow() returns False for cooldown_s. Then one trial call is let through
+    (half-open); its success closes the breaker, its failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown_s: float):
+        self.name = name
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.cooldown_s:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may proceed now."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"Circuit {self.name} closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            reopen = self._trial_in_flight
+            self._trial_in_flight = False
+            if reopen or (self._opened_at is None and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.times_opened += 1
+                logger.warning(
+                    f"Circuit {self.name} open for {self.cooldown_s:.0f}s "
+                    f"after {self._failures} consecutive failures"
+                )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
+
+
+class LatencyWindow:
+    """Rolling window of recent latencies (seconds) for percentile estimates."""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.min_samples = min_samples
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """q-th percentile, or None until min_samples have been recorded."""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            return float(np.percentile(self._samples, q))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return {"samples": 0}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            "samples": len(samples),
+            "p50_ms": round(p50 * 1000, 1),
+            "p95_ms": round(p95 * 1000, 1),
+            "p99_ms": round(p99 * 1000, 1),
+        }
+
+
+async def hedged(
+    call: Callable[[], Awaitable[Any]],
+    hedge_delay: Optional[float],
+) -> Any:
+    """Await call(); if it hasn't finished after hedge_delay, start a second one.
+
+    Returns whichever attempt succeeds first. Raises the last error only if
+    every attempt fails. hedge_delay None disables hedging.
+    """
+    first = asyncio.ensure_future(call())
+    if hedge_delay is None:
+        return await first
+
+    # The finally also covers the initial wait, so a caller's deadline
+    # (wait_for cancelling us) never leaves an attempt running
+    pending = {first}
+    error: Optional[BaseException] = None
+    try:
+        done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+        if done:
+            return first.result()
+
+        logger.info(f"Hedging slow call after {hedge_delay * 1000:.0f}ms")
+        pending = {first, asyncio.ensure_future(call())}
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
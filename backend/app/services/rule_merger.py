@@ -0,0 +1,270 @@
+"""Deterministic CBR + ML merger (no LLM).
+
+Builds the same HybridQuoteOutput the LLM merger returns, directly from
+the structured signals:
+- Price: ML estimate blended with a similarity-weighted CBR price
+  (per-sqft of each similar case scaled to this job's sqft)
+- Work items: calculate_complexity_hours breakdown (base, tier, factors,
+  manual extra hours)
+- Materials: ML material predictions
+- Tiers: Basic (-15%), Standard (base), Premium (+18%), keeping the
+  Standard materials/labor split
+
+hybrid_quote escalates to the LLM only when rule_merge_score is below
+MERGER_LLM_THRESHOLD or the request asks for it. The score uses only what
+the CBR backends return (case count, similarity, price) - not the review
+confidence, whose material-agreement term needs case materials they don't
+carry.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.schemas.hybrid_quote import (
+    HybridQuoteOutput,
+    HybridQuoteRequest,
+    MaterialLineItem,
+    PricingTier,
+    WorkItem,
+)
+from app.services.cbr_partitions import category_slug
+from app.services.complexity_calculator import calculate_complexity_hours, get_tier_config
+from app.services.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Share of the Standard price taken from ML when CBR cases are available
+ML_PRICE_WEIGHT = 0.6
+
+# Tier multipliers (same percentages the LLM is told to use)
+TIER_MULTIPLIERS = {"Basic": 0.85, "Standard": 1.0, "Premium": 1.18}
+TIER_DESCRIPTIONS = {
+    "Basic": "Essential materials, standard timeline",
+    "Standard": "Full material coverage, standard labor",
+    "Premium": "Premium materials, expedited timeline",
+}
+
+# rule_merge_score weights and saturation points
+WEIGHT_SIMILARITY = 0.4
+WEIGHT_CASE_COUNT = 0.2
+WEIGHT_PRICE_AGREEMENT = 0.4
+FULL_CASE_COUNT = 5
+# ML vs CBR price spread (relative to the larger) at which agreement hits 0
+MAX_PRICE_SPREAD = 0.5
+
+# material_predictor confidence labels -> 0-1
+MATERIAL_CONFIDENCE = {"HIGH": 0.85, "MEDIUM": 0.6, "LOW": 0.4}
+
+FACTOR_LABELS = {
+    "roof_pitch": "Roof pitch",
+    "demolition": "Demolition",
+    "penetrations": "Penetrations",
+    "material_removal": "Material removal",
+    "roof_sections": "Additional roof sections",
+    "previous_layers": "Previous layers removal",
+}
+
+
+def _config_category(category: str) -> str:
+    """Map a request category onto the complexity config's keys ("Élastomère" -> "Elastomere")."""
+    slug = category_slug(category)
+    for key in get_tier_config()["base_time_per_category"]:
+        if category_slug(key) == slug:
+            return key
+    return category
+
+
+def _tier_for_request(request: HybridQuoteRequest) -> int:
+    """Complexity tier, derived from the legacy 0-56 aggregate when no tier is set."""
+    if request.complexity_tier is not None:
+        return request.complexity_tier
+    score = round((request.complexity_aggregate or 0) / 56 * 100)
+    for tier in get_tier_config()["tiers"]:
+        if tier["score_min"] <= score <= tier["score_max"]:
+            return tier["tier"]
+    return 1
+
+
+@traced("complexity")
+def complexity_hours(request: HybridQuoteRequest) -> Dict[str, Any]:
+    """calculate_complexity_hours for a hybrid quote request, plus manual extra hours."""
+    result = calculate_complexity_hours(
+        category=_config_category(request.category),
+        sqft=request.sqft or 0,
+        tier=_tier_for_request(request),
+        factors={
+            "roof_pitch": request.factor_roof_pitch,
+            "access_difficulty": request.factor_access_difficulty or [],
+            "demolition": request.factor_demolition,
+            "penetrations_count": request.factor_penetrations_count or 0,
+            "security": request.factor_security or [],
+            "material_removal": request.factor_material_removal,
+            "roof_sections_count": request.factor_roof_sections_count or 2,
+            "previous_layers_count": request.factor_previous_layers_count or 0,
+        },
+    )
+    manual = request.manual_extra_hours or 0
+    result["manual_extra_hours"] = manual
+    result["total_hours"] = round(result["total_hours"] + manual, 1)
+    return result
+
+
+def _cbr_price(request: HybridQuoteRequest, cbr_cases: List[Dict[str, Any]]) -> Optional[float]:
+    """Similarity-weighted price of the similar cases, scaled to this job's sqft."""
+    weighted = 0.0
+    weights = 0.0
+    for case in cbr_cases:
+        if request.sqft and case.get("per_sqft"):
+            price = case["per_sqft"] * request.sqft
+        elif case.get("total"):
+            price = case["total"]
+        else:
+            continue
+        weight = max(case.get("similarity", 0.0), 0.01)
+        weighted += weight * price
+        weights += weight
+    return weighted / weights if weights else None
+
+
+def _work_items(hours: Dict[str, Any], category: str) -> List[WorkItem]:
+    items = [WorkItem(name=f"{category} installation (base)", labor_hours=hours["base_hours"], source="MERGED")]
+    if hours["tier_hours"] > 0:
+        items.append(
+            WorkItem(name=f"Complexity: {hours['tier_name']}", labor_hours=hours["tier_hours"], source="MERGED")
+        )
+    for key, value in hours["breakdown"].items():
+        if key.startswith("access_"):
+            name = f"Access: {key[len('access_'):].replace('_', ' ')}"
+        elif key.startswith("security_"):
+            name = f"Security: {key[len('security_'):].replace('_', ' ')}"
+        else:
+            name = FACTOR_LABELS.get(key, key.replace("_", " ").capitalize())
+        items.append(WorkItem(name=name, labor_hours=round(value, 1), source="MERGED"))
+    if hours["manual_extra_hours"] > 0:
+        items.append(
+            WorkItem(name="Manual extra hours", labor_hours=hours["manual_extra_hours"], source="MERGED")
+        )
+    return items
+
+
+def _materials(ml_result: Dict[str, Any]) -> List[MaterialLineItem]:
+    return [
+        MaterialLineItem(
+            material_id=m["material_id"],
+            quantity=m["quantity"],
+            unit_price=m["unit_price"],
+            total=round(m["quantity"] * m["unit_price"], 2),
+            source="ML",
+            confidence=MATERIAL_CONFIDENCE.get(m.get("confidence"), 0.6),
+        )
+        for m in ml_result.get("materials", {}).get("materials", [])
+    ]
+
+
+def rule_merge_score(
+    request: HybridQuoteRequest,
+    ml_result: Optional[Dict[str, Any]],
+    cbr_cases: List[Dict[str, Any]],
+) -> float:
+    """How safely the rules can reconcile CBR and ML for this job (0-1).
+
+    Weighs average case similarity, number of cases and the ML vs CBR price
+    spread. With no ML price the rules have no materials or price to anchor
+    on (0.0); with no usable CBR price there is nothing to reconcile (1.0).
+
+    Args:
+        request: Hybrid quote request
+        ml_result: ML price and material predictions (None/{} if ML failed)
+        cbr_cases: Similar cases from CBR ([] if unavailable)
+
+    Returns:
+        Score compared against MERGER_LLM_THRESHOLD
+    """
+    ml_price = (ml_result or {}).get("price", {}).get("estimate")
+    if not ml_price:
+        return 0.0
+    cbr_price = _cbr_price(request, cbr_cases)
+    if not cbr_price:
+        return 1.0
+
+    similarity = sum(case.get("similarity", 0.0) for case in cbr_cases) / len(cbr_cases)
+    case_count = min(len(cbr_cases) / FULL_CASE_COUNT, 1.0)
+    spread = abs(ml_price - cbr_price) / max(ml_price, cbr_price)
+    agreement = max(1.0 - spread / MAX_PRICE_SPREAD, 0.0)
+
+    score = (
+        WEIGHT_SIMILARITY * similarity
+        + WEIGHT_CASE_COUNT * case_count
+        + WEIGHT_PRICE_AGREEMENT * agreement
+    )
+    logger.info(
+        f"Rule merge score: similarity={similarity:.2f}, cases={len(cbr_cases)}, "
+        f"price spread={spread:.0%} -> {score:.2f}"
+    )
+    return score
+
+
+def merge_by_rules(
+    request: HybridQuoteRequest,
+    ml_result: Dict[str, Any],
+    cbr_cases: List[Dict[str, Any]],
+    confidence: float,
+) -> HybridQuoteOutput:
+    """Merge CBR + ML into a final quote without an LLM call.
+
+    Args:
+        request: Hybrid quote request
+        ml_result: ML price and material predictions ({} if ML failed)
+        cbr_cases: Similar cases from CBR ([] if unavailable)
+        confidence: Overall confidence from calculate_confidence
+
+    Returns:
+        HybridQuoteOutput with work items, materials and three pricing tiers
+    """
+    ml_price = ml_result.get("price", {}).get("estimate") if ml_result else None
+    cbr_price = _cbr_price(request, cbr_cases)
+
+    if ml_price and cbr_price:
+        total_price = ML_PRICE_WEIGHT * ml_price + (1 - ML_PRICE_WEIGHT) * cbr_price
+        price_source = (
+            f"ML estimate ${ml_price:,.0f} ({ML_PRICE_WEIGHT:.0%}) blended with "
+            f"{len(cbr_cases)} similar jobs at ${cbr_price:,.0f} ({1 - ML_PRICE_WEIGHT:.0%})"
+        )
+    elif ml_price:
+        total_price = ml_price
+        price_source = f"ML estimate ${ml_price:,.0f} (no similar jobs)"
+    else:
+        total_price = cbr_price or 0.0
+        price_source = f"{len(cbr_cases)} similar jobs at ${total_price:,.0f} (ML unavailable)"
+
+    materials = _materials(ml_result or {})
+    materials_cost = round(sum(m.total for m in materials), 2)
+    labor_cost = max(total_price - materials_cost, 0.0)
+
+    hours = complexity_hours(request)
+
+    pricing_tiers = [
+        PricingTier(
+            tier=tier,
+            total_price=round(total_price * factor, 2),
+            materials_cost=round(materials_cost * factor, 2),
+            labor_cost=round(labor_cost * factor, 2),
+            description=TIER_DESCRIPTIONS[tier],
+        )
+        for tier, factor in TIER_MULTIPLIERS.items()
+    ]
+
+    return HybridQuoteOutput(
+        work_items=_work_items(hours, request.category),
+        materials=materials,
+        total_labor_hours=hours["total_hours"],
+        total_materials_cost=materials_cost,
+        total_price=round(total_price, 2),
+        overall_confidence=round(confidence, 4),
+        reasoning=(
+            f"Rule-based merge: {price_source}. "
+            f"{hours['total_hours']:.1f} labor hours from {hours['tier_name']} complexity "
+            f"and {len(hours['breakdown'])} adjustment factors."
+        ),
+        pricing_tiers=pricing_tiers,
+    )
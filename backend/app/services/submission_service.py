@@ -34,7 +34,9 @@ from app.schemas.submission import (
     SubmissionStatus,
     SubmissionUpdate,
 )
+from app.services.cbr_ingest import enqueue_submission
 from app.services.supabase_client import get_supabase
+from app.services.tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -127,7 +129,8 @@ def create_submission(data: SubmissionCreate) -> dict:
         }
 
         # Insert submission
-        result = supabase.table("submissions").insert(submission_data).execute()
+        with span("db_insert"):
+            result = supabase.table("submissions").insert(submission_data).execute()
 
         logger.info(f"Created submission {result.data[0]['id']} for category {data.category}")
         return result.data[0]
@@ -402,6 +405,9 @@ def approve_submission(submission_id: str, user: str) -> dict:
         )
 
         logger.info(f"Approved submission {submission_id} by {user}")
+
+        # Queue for the CBR case base (non-blocking, handled by a background worker)
+        enqueue_submission({**current.data, **result.data[0]})
         return result.data[0]
 
     except HTTPException:
@@ -628,7 +634,8 @@ def create_upsell_submission(parent_id: str, upsell_type: str, user: str) -> dic
         }
 
         # Insert child submission
-        child_result = supabase.table("submissions").insert(child_data).execute()
+        with span("db_insert"):
+            child_result = supabase.table("submissions").insert(child_data).execute()
 
         # Append audit entry to parent
         _append_audit_entry(
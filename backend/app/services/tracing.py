@@ -0,0 +1,165 @@
+"""Per-stage latency tracing.
+
+span("embed") / @traced("price_model") time a pipeline stage. Every
+duration is recorded into a per-stage LatencyWindow (p50/p95/p99 at
+GET /health/latency) and, during a request, onto that request's Trace,
+which ServerTimingMiddleware sends back as a Server-Timing header
+("embed;dur=12.3, vector_search;dur=41.0, total;dur=60.2").
+
+The trace lives in a contextvar, so spans in tasks, asyncio.to_thread and
+executors.run_cpu/run_io workers started by the request land on it
+(loop.run_in_executor does not copy context). Streaming responses send their
+headers first, so the header only covers the stages finished by then;
+the histograms still get every span.
+
+Stages: parse, complexity, query_build, embed, vector_search, price_model,
+material_model, llm, llm_parse, db_insert.
+"""
+
+import asyncio
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+from app.config import settings
+from app.services.resilience import LatencyWindow
+
+_histograms: Dict[str, LatencyWindow] = {}
+_histograms_lock = threading.Lock()
+
+
+class Trace:
+    """Stage durations (seconds, summed per stage) for one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, stages in the order they first finished."""
+        with self._lock:
+            stages = dict(self.stages)
+        stages["total"] = time.perf_counter() - self.started
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stages.items())
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def _histogram(stage: str) -> LatencyWindow:
+    window = _histograms.get(stage)
+    if window is None:
+        with _histograms_lock:
+            window = _histograms.setdefault(stage, LatencyWindow(size=settings.tracing_window_size))
+    return window
+
+
+def record(stage: str, seconds: float) -> None:
+    """Record a stage duration into its histogram and the current request's trace."""
+    if not settings.tracing_enabled:
+        return
+    _histogram(stage).record(seconds)
+    trace = _current.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as one run of stage (failures included)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def traced(stage: str) -> Callable:
+    """Decorator form of span() for sync or async functions."""
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def latency_stats() -> Dict[str, Dict[str, Any]]:
+    """p50/p95/p99 per stage for /health/latency."""
+    return {stage: window.stats() for stage, window in sorted(_histograms.items())}
+
+
+def _mark_parsed(endpoint: Callable) -> Callable:
+    """Wrap an endpoint to record "parse" (request start -> endpoint call)."""
+    def mark() -> None:
+        trace = _current.get()
+        if trace is not None:
+            record("parse", time.perf_counter() - trace.started)
+
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_endpoint(*args: Any, **kwargs: Any) -> Any:
+            mark()
+            return await endpoint(*args, **kwargs)
+        return async_endpoint
+
+    @functools.wraps(endpoint)
+    def sync_endpoint(*args: Any, **kwargs: Any) -> Any:
+        mark()
+        return endpoint(*args, **kwargs)
+    return sync_endpoint
+
+
+class TracedRoute(APIRoute):
+    """APIRoute that records the "parse" stage: routing, body read and validation."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs: Any):
+        super().__init__(path, _mark_parsed(endpoint), **kwargs)
+
+
+class ServerTimingMiddleware:
+    """Starts a Trace per HTTP request and adds it as a Server-Timing header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace()
+        token = _current.set(trace)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
@@ -0,0 +1,289 @@
+"""Flat-array evaluator for gradient-boosted models.
+
+Converts fitted sklearn gradient-boosting models into contiguous numpy
+arrays (feature, threshold, left, right, value) and evaluates every tree for
+every row in one vectorized loop of max_depth steps. Predictions match
+sklearn's output, without its per-call input validation and per-estimator
+Python dispatch.
+
+Several ensembles sharing the same features can be stacked into one
+multi-output ensemble (material selector, per-material quantity
+regressors), so all outputs are evaluated in a single pass.
+
+Compiled ensembles are serialized by model_bundle.py so serving only needs
+numpy.
+"""
+
+import logging
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LINKS = ("identity", "logistic")
+
+# Raw score used for labels that were constant during training
+# (sigmoid(+/-50) is 1.0 / ~2e-22)
+_CONSTANT_LOGIT = 50.0
+
+
+class CompiledEnsemble:
+    """Gradient-boosted ensemble stored as flat node arrays.
+
+    Node indices are global across all trees. Leaves point to themselves
+    (left == right == own index), so walking max_depth steps from every
+    root always lands on a leaf without per-row branching.
+
+    Trees are grouped by output: output k owns trees
+    output_offsets[k] .. output_offsets[k + 1] - 1, and its raw score is
+    base[k] plus the sum of its trees' leaf values.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        base: Any,
+        max_depth: int,
+        n_features: int,
+        output_offsets: Optional[np.ndarray] = None,
+        link: str = "identity",
+    ):
+        if link not in LINKS:
+            raise ValueError(f"Unknown link: {link}")
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.base = np.atleast_1d(np.asarray(base, dtype=np.float64))
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        if output_offsets is None:
+            output_offsets = np.zeros(1, dtype=np.int32)
+        self.output_offsets = output_offsets
+        self.link = link
+        self._output_ends = np.append(self.output_offsets[1:], len(self.roots))
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @property
+    def n_outputs(self) -> int:
+        return len(self.output_offsets)
+
+    def _check_input(self, X: Any) -> np.ndarray:
+        # sklearn trees compare float32 features against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(
+                f"Expected 2D input with {self.n_features} features, got shape {X.shape}"
+            )
+        return X.astype(np.float64)
+
+    def _leaf_values(self, X: np.ndarray, roots: np.ndarray) -> np.ndarray:
+        """Walk every tree in roots for every row; returns (n_rows, n_trees)."""
+        rows = np.arange(X.shape[0])[:, None]
+        node = np.broadcast_to(roots, (X.shape[0], len(roots)))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def raw_predict(self, X: Any, outputs: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Raw (pre-link) scores, shape (n_rows, n_selected_outputs).
+
+        Args:
+            X: 2D feature matrix
+            outputs: Output indices to evaluate (default: all). Only the
+                     trees of these outputs are walked.
+        """
+        X = self._check_input(X)
+
+        if outputs is None:
+            roots = self.roots
+            offsets = self.output_offsets
+            base = self.base
+        else:
+            outputs = np.asarray(outputs, dtype=np.intp)
+            if len(outputs) == 0:
+                return np.empty((X.shape[0], 0), dtype=np.float64)
+            starts = self.output_offsets[outputs]
+            ends = self._output_ends[outputs]
+            tree_idx = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+            roots = self.roots[tree_idx]
+            offsets = np.cumsum(ends - starts) - (ends - starts)
+            base = self.base[outputs]
+
+        leaves = self._leaf_values(X, roots)
+        return base + np.add.reduceat(leaves, offsets, axis=1)
+
+    def predict(self, X: Any, outputs: Optional[Sequence[int]] = None) -> np.ndarray:
+        """Predict with the ensemble's link applied.
+
+        Single-output ensembles return shape (n_rows,) like sklearn predict;
+        multi-output ensembles (or an explicit outputs list) return
+        (n_rows, n_outputs).
+        """
+        raw = self.raw_predict(X, outputs)
+        if self.link == "logistic":
+            raw = 1.0 / (1.0 + np.exp(-raw))
+        if outputs is None and self.n_outputs == 1:
+            return raw[:, 0]
+        return raw
+
+
+def _constant_ensemble(base: float, n_features: int, link: str) -> CompiledEnsemble:
+    """Single-leaf ensemble that always returns base (before link)."""
+    return CompiledEnsemble(
+        feature=np.zeros(1, dtype=np.int32),
+        threshold=np.zeros(1, dtype=np.float64),
+        left=np.zeros(1, dtype=np.int32),
+        right=np.zeros(1, dtype=np.int32),
+        value=np.zeros(1, dtype=np.float64),
+        roots=np.zeros(1, dtype=np.int32),
+        base=base,
+        max_depth=0,
+        n_features=n_features,
+        link=link,
+    )
+
+
+def compile_gradient_boosting(model: Any) -> CompiledEnsemble:
+    """Convert a fitted GradientBoostingRegressor/Classifier into a CompiledEnsemble.
+
+    Supports squared_error regressors and binary log_loss classifiers with
+    the default (constant) init estimator, which is what the training
+    scripts produce. Classifiers compile to the positive-class probability.
+
+    Raises:
+        ValueError: If the model uses a loss or init the evaluator can't reproduce
+    """
+    loss = getattr(model, "loss", None)
+    if loss == "squared_error":
+        link = "identity"
+    elif loss == "log_loss" and model.estimators_.shape[1] == 1:
+        link = "logistic"
+    else:
+        raise ValueError(f"Unsupported loss for compiled evaluation: {loss}")
+
+    n_features = int(model.n_features_in_)
+    init = model.init_
+    if isinstance(init, str) and init == "zero":
+        base = 0.0
+    elif type(init).__name__ in ("DummyRegressor", "DummyClassifier"):
+        # Constant init: its raw score doesn't depend on X
+        base = float(model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0, 0])
+    else:
+        raise ValueError(f"Unsupported init estimator: {type(init).__name__}")
+
+    lr = float(model.learning_rate)
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+
+    for stage in model.estimators_:
+        tree = stage[0].tree_
+        n = tree.node_count
+        idx = np.arange(n)
+        is_leaf = tree.children_left == -1
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        lefts.append(np.where(is_leaf, idx, tree.children_left) + offset)
+        rights.append(np.where(is_leaf, idx, tree.children_right) + offset)
+        # Learning rate folded into leaf values; internal nodes contribute nothing
+        values.append(np.where(is_leaf, tree.value[:, 0, 0] * lr, 0.0))
+
+        max_depth = max(max_depth, int(tree.max_depth))
+        offset += n
+
+    if not roots:
+        return _constant_ensemble(base, n_features, link)
+
+    return CompiledEnsemble(
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        value=np.concatenate(values).astype(np.float64),
+        roots=np.asarray(roots, dtype=np.int32),
+        base=base,
+        max_depth=max_depth,
+        n_features=n_features,
+        link=link,
+    )
+
+
+def stack_ensembles(ensembles: List[CompiledEnsemble]) -> CompiledEnsemble:
+    """Stack ensembles over the same features into one multi-output ensemble.
+
+    Output k of the result is ensembles[k] (outputs of multi-output inputs
+    are kept in order).
+    """
+    if not ensembles:
+        raise ValueError("Nothing to stack")
+    links = {e.link for e in ensembles}
+    n_features = {e.n_features for e in ensembles}
+    if len(links) > 1 or len(n_features) > 1:
+        raise ValueError("Stacked ensembles must share link and feature count")
+
+    node_offset = 0
+    tree_offset = 0
+    parts = {k: [] for k in ("feature", "threshold", "left", "right", "value", "roots", "offsets", "base")}
+    for e in ensembles:
+        parts["feature"].append(e.feature)
+        parts["threshold"].append(e.threshold)
+        parts["left"].append(np.asarray(e.left) + node_offset)
+        parts["right"].append(np.asarray(e.right) + node_offset)
+        parts["value"].append(e.value)
+        parts["roots"].append(np.asarray(e.roots) + node_offset)
+        parts["offsets"].append(np.asarray(e.output_offsets) + tree_offset)
+        parts["base"].append(e.base)
+        node_offset += e.n_nodes
+        tree_offset += e.n_trees
+
+    return CompiledEnsemble(
+        feature=np.concatenate(parts["feature"]).astype(np.int32),
+        threshold=np.concatenate(parts["threshold"]).astype(np.float64),
+        left=np.concatenate(parts["left"]).astype(np.int32),
+        right=np.concatenate(parts["right"]).astype(np.int32),
+        value=np.concatenate(parts["value"]).astype(np.float64),
+        roots=np.concatenate(parts["roots"]).astype(np.int32),
+        base=np.concatenate(parts["base"]),
+        max_depth=max(e.max_depth for e in ensembles),
+        n_features=n_features.pop(),
+        output_offsets=np.concatenate(parts["offsets"]).astype(np.int32),
+        link=links.pop(),
+    )
+
+
+def compile_one_vs_rest(clf: Any) -> CompiledEnsemble:
+    """Compile a multi-label OneVsRestClassifier of gradient-boosting classifiers.
+
+    predict() of the result matches clf.predict_proba(X): one positive-class
+    probability column per label. Labels that were constant during training
+    (sklearn's _ConstantPredictor) become single-leaf outputs.
+    """
+    n_features = int(clf.n_features_in_)
+    ensembles = []
+    for estimator in clf.estimators_:
+        if hasattr(estimator, "y_"):
+            positive = float(np.asarray(estimator.y_).ravel()[0])
+            base = _CONSTANT_LOGIT if positive else -_CONSTANT_LOGIT
+            ensembles.append(_constant_ensemble(base, n_features, "logistic"))
+        else:
+            ensembles.append(compile_gradient_boosting(estimator))
+    return stack_ensembles(ensembles)
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""Build the in-process CBR index used by CBR_BACKEND=local.
+
+Reads cortex-data/cbr_embeddings.npz and cbr_cases.json (the same files
+upload_embeddings.py sends to Pinecone) and writes app/models/cbr_index/.
+Re-run whenever the case base is re-embedded.
+
+Usage:
+    python -m scripts.build_cbr_index
+"""
+
+from app.services.local_cbr import DATA_DIR, INDEX_DIR, build_local_index
+
+
+def main():
+    print(f"Building local CBR index from {DATA_DIR} into {INDEX_DIR}...")
+    summary = build_local_index()
+    print(f"  {summary['cases']} cases, {summary['dimension']} dims, version {summary['version']}")
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Precompute CBR query embeddings over a grid of estimate inputs.
+
+Writes app/models/embedding_table/ for EMBEDDING_TABLE=true, using the
+configured EMBEDDING_BACKEND. Reports the cosine error of the lookup
+(snapping + sqft interpolation) on random off-grid inputs. Re-run after
+changing the embedding model or build_query_text.
+
+Usage:
+    python -m scripts.build_embedding_table
+"""
+
+import numpy as np
+
+from app.schemas.estimate import ALLOWED_CATEGORIES
+from app.services import embeddings
+from app.services.embedding_table import TABLE_DIR, EmbeddingTable, build_embedding_table
+
+
+def main():
+    print(f"Building embedding table in {TABLE_DIR} ({embeddings.EMBEDDING_MODEL_NAME})...")
+    meta = build_embedding_table(
+        embeddings._encode_batch,
+        embeddings.build_query_text,
+        ALLOWED_CATEGORIES,
+        embeddings.EMBEDDING_MODEL_NAME,
+    )
+    grid_points = len(meta["categories"]) * int(
+        np.prod([len(v) for v in meta["grid"].values()])
+    )
+    print(f"  {grid_points} grid points, {meta['dimension']} dims")
+
+    # Lookup error on inputs that fall between grid points
+    table = EmbeddingTable(TABLE_DIR)
+    rng = np.random.default_rng(42)
+    inputs = [
+        (
+            float(rng.integers(150, 15000)),
+            ALLOWED_CATEGORIES[rng.integers(len(ALLOWED_CATEGORIES))],
+            int(rng.integers(1, 101)),
+            int(rng.integers(0, 25)),
+            int(rng.integers(0, 8)),
+        )
+        for _ in range(200)
+    ]
+    expected = embeddings._encode_batch([embeddings.build_query_text(*args) for args in inputs])
+    actual = np.array([table.lookup(*args) for args in inputs])
+    cosine = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    print(f"  Off-grid lookup cosine vs model: mean {cosine.mean():.4f}, min {cosine.min():.4f}")
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
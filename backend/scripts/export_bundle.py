@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Export all pickled serving artifacts into the memory-mapped model bundle.
+
+Writes app/models/bundle/ (one .npy per array + manifest.json). Every
+uvicorn worker memory-maps the same files, so they share page-cache pages
+instead of each unpickling its own copy. sklearn is only needed here, not
+in the serving process. Re-run after retraining any model.
+
+The bundle is staged next to app/models/bundle/ and only swapped in once
+every ensemble matches its sklearn model; on a mismatch the served bundle
+is left untouched and the script exits 1.
+
+Usage:
+    python -m scripts.export_bundle
+"""
+
+import sys
+
+import joblib
+import numpy as np
+
+from app.services.model_bundle import (
+    BUNDLE_DIR,
+    MODEL_DIR,
+    discard_bundle,
+    load_bundle,
+    publish_bundle,
+    stage_bundle,
+)
+
+
+def _parity_inputs(n_features: int, n_rows: int = 500) -> np.ndarray:
+    """Random inputs covering the training feature ranges."""
+    rng = np.random.default_rng(42)
+    small = rng.integers(0, 50, (n_rows, n_features))
+    large = rng.uniform(0, 20000, (n_rows, n_features))
+    return np.where(rng.random((n_rows, n_features)) < 0.5, small, large)
+
+
+def _check_parity(bundle, manifest) -> bool:
+    """Bundle ensembles vs the sklearn models they came from."""
+    for name, entry in manifest["components"].items():
+        if "ensemble" not in entry:
+            print(f"  {name}: {len(entry.get('labels', []))} labels")
+            continue
+
+        meta = entry["ensemble"]
+        compiled = bundle.ensemble(name)
+        model = joblib.load(MODEL_DIR / entry["source"])
+        X = _parity_inputs(meta["n_features"])
+
+        if name == "material_selector":
+            expected = model.predict_proba(X)
+        elif name == "quantity_regressors":
+            expected = np.column_stack([model[k].predict(X) for k in sorted(model, key=str)])
+        else:
+            expected = model.predict(X)
+
+        max_diff = np.abs(compiled.predict(X) - expected).max()
+        status = "OK" if max_diff <= 1e-6 else "MISMATCH"
+        print(
+            f"  {name}: {meta['n_outputs']} outputs, {meta['n_trees']} trees, "
+            f"{meta['n_nodes']} nodes, max diff vs sklearn {max_diff:.2e} [{status}]"
+        )
+        if status != "OK":
+            return False
+    return True
+
+
+def main():
+    print(f"Exporting model bundle to {BUNDLE_DIR}...")
+    tmp_dir, manifest = stage_bundle(BUNDLE_DIR, MODEL_DIR)
+    print(f"Bundle version: {manifest['version']}")
+
+    if not _check_parity(load_bundle(tmp_dir, MODEL_DIR), manifest):
+        discard_bundle(tmp_dir)
+        print(f"ERROR: parity check failed, {BUNDLE_DIR} left unchanged")
+        sys.exit(1)
+
+    publish_bundle(tmp_dir, BUNDLE_DIR)
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Export the CBR embedding model to int8-quantized ONNX.
+
+Writes app/models/embedder/ (model.int8.onnx, tokenizer.json, embedder.json)
+for EMBEDDING_BACKEND=onnx. torch and sentence-transformers are only needed
+here, not in the serving process. The export is staged next to
+app/models/embedder/ and only swapped in once every CBR case text from
+cortex-data/cbr_cases.json embeds within MIN_COSINE of the torch model; on
+a mismatch (or no case corpus) the served export is left untouched and the
+script exits 1.
+
+Usage:
+    python -m scripts.export_onnx_embedder
+"""
+
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from app.services.cbr_ingest import case_text
+from app.services.embeddings import EMBEDDING_MODEL_NAME
+from app.services.local_cbr import DATA_DIR
+from app.services.onnx_embedder import (
+    ONNX_DIR,
+    OnnxEmbedder,
+    discard_onnx_embedder,
+    publish_onnx_embedder,
+    stage_onnx_embedder,
+)
+
+MIN_COSINE = 0.99
+
+
+def parity_texts(data_dir: Path = DATA_DIR) -> List[str]:
+    """Embedding texts of every case in cbr_cases.json (the CBR case corpus).
+
+    Raises:
+        FileNotFoundError: If the case corpus isn't there
+    """
+    with open(Path(data_dir) / "cbr_cases.json") as f:
+        cases = json.load(f)
+    return [case_text(case) for case in cases if case.get("features", {}).get("category")]
+
+
+def min_cosine(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Lowest row-wise cosine similarity between two embedding matrices."""
+    cosine = (expected * actual).sum(axis=1) / (
+        np.linalg.norm(expected, axis=1) * np.linalg.norm(actual, axis=1)
+    )
+    return float(cosine.min())
+
+
+def main():
+    from sentence_transformers import SentenceTransformer
+
+    try:
+        texts = parity_texts()
+    except FileNotFoundError as e:
+        print(f"ERROR: no CBR case corpus to check parity against ({e})")
+        sys.exit(1)
+
+    print(f"Exporting {EMBEDDING_MODEL_NAME} to {ONNX_DIR}...")
+    tmp_dir, meta = stage_onnx_embedder(EMBEDDING_MODEL_NAME, ONNX_DIR)
+    print(f"  {meta['dimension']} dims, max {meta['max_seq_length']} tokens, {meta['quantization']}")
+
+    expected = SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu").encode(texts)
+    actual = OnnxEmbedder(tmp_dir).encode(texts)
+    cosine = min_cosine(expected, actual)
+    status = "OK" if cosine >= MIN_COSINE else "MISMATCH"
+    print(f"  {len(texts)} case texts, min cosine vs torch {cosine:.4f} [{status}]")
+    if status != "OK":
+        discard_onnx_embedder(tmp_dir)
+        print(f"ERROR: parity check failed, {ONNX_DIR} left unchanged")
+        sys.exit(1)
+
+    publish_onnx_embedder(tmp_dir, ONNX_DIR)
+    print("Done.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,306 @@
 #!/usr/bin/env python3
-"""One-time script to upload CBR embeddings to Pinecone.
+"""Sync CBR embeddings to Pinecone.
+
+Each case is hashed (embedding bytes + metadata). Only new or changed
+vectors are upserted, in concurrent batches with retry. Vectors for cases
+that no longer exist are deleted. The hashes already on the index are kept
+in a checkpoint file that is rewritten after every batch, so an
+interrupted run resumes where it stopped and re-running with unchanged data
+uploads nothing.
+
+--partitioned puts each category in its own namespace ("cbr-bardeaux", ...)
+and lists the partition sizes in the version stamp, which the server uses
+to route queries when CBR_PARTITIONED=true (see cbr_partitions.py).
+Switching layouts moves the vectors and prunes the old namespaces.
 
 Usage:
     export PINECONE_API_KEY=your_key
     export PINECONE_INDEX_NAME=toiturelv-cortex  # Optional, defaults to toiturelv-cortex
-    python -m scripts.upload_embeddings
+    python -m scripts.upload_embeddings [--workers 4] [--batch-size 500] [--partitioned]
+                                        [--full] [--dry-run]
 """
 
+import argparse
+import hashlib
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 import numpy as np
 from pinecone import ServerlessSpec
 from pinecone.grpc import PineconeGRPC as Pinecone
+from tenacity import retry, stop_after_attempt, wait_exponential
 from tqdm import tqdm
 
+from app.services.cbr_partitions import category_slug, partition_namespace
+from app.services.pinecone_cbr import (
+    INGESTED_ID_PREFIX,
+    VERSION_NAMESPACE,
+    VERSION_RECORD_ID,
+    pinecone_metadata,
+)
+
 # Find data files relative to project root
 PROJECT_ROOT = Path(__file__).parent.parent.parent
 DATA_DIR = PROJECT_ROOT / "cortex-data"
+CHECKPOINT_PATH = DATA_DIR / ".upload_checkpoint.json"
+
+NAMESPACE = "cbr"
+DELETE_BATCH_SIZE = 1000  # Pinecone's per-request delete limit
+
+
+def record_hash(values: np.ndarray, metadata: Dict[str, Any]) -> str:
+    """Content hash of one vector record."""
+    digest = hashlib.sha256(np.asarray(values, dtype=np.float32).tobytes())
+    digest.update(json.dumps(metadata, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def _key(namespace: str, vector_id: str) -> str:
+    """Checkpoint key of a vector ("namespace/id")."""
+    return f"{namespace}/{vector_id}"
+
+
+def load_vectors(data_dir: Path = DATA_DIR, partitioned: bool = False) -> List[Dict[str, Any]]:
+    """Read cbr_embeddings.npz + cbr_cases.json into Pinecone records with hashes.
+
+    Each record also gets its target namespace (per category if partitioned).
+    """
+    data = np.load(data_dir / "cbr_embeddings.npz")
+    case_ids = data["case_ids"]
+    embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+
+    with open(data_dir / "cbr_cases.json") as f:
+        cases = {str(c["case_id"]): c for c in json.load(f)}
+
+    vectors = []
+    for case_id, embedding in zip(case_ids, embeddings):
+        metadata = pinecone_metadata({**cases.get(str(case_id), {}), "case_id": str(case_id)})
+        namespace = partition_namespace(metadata["category"], NAMESPACE) if partitioned else NAMESPACE
+        vectors.append({
+            "id": str(case_id),
+            "values": embedding,
+            "metadata": metadata,
+            "hash": record_hash(embedding, metadata),
+            "namespace": namespace,
+        })
+    return vectors
+
+
+def load_checkpoint(path: Path, index_name: str) -> Optional[Dict[str, str]]:
+    """{"namespace/id": hash} already on the index, or None if there is no usable checkpoint."""
+    if not path.exists():
+        return None
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("index_name") != index_name or "records" not in checkpoint:
+        print(f"Checkpoint {path} is for another index or format, ignoring it")
+        return None
+    return checkpoint["records"]
+
+
+def save_checkpoint(path: Path, index_name: str, hashes: Dict[str, str]) -> None:
+    """Write the checkpoint atomically so a crash never leaves it half-written."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump({
+            "index_name": index_name,
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "records": hashes,
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def list_remote_keys(index) -> Optional[set]:
+    """"namespace/id" of every CBR vector (base and partition namespaces), or None if unlistable."""
+    try:
+        stats = index.describe_index_stats()
+        namespaces = [
+            ns for ns in (stats.namespaces or {})
+            if ns == NAMESPACE or ns.startswith(f"{NAMESPACE}-")
+        ]
+        return {
+            _key(ns, vector_id)
+            for ns in namespaces
+            for page in index.list(namespace=ns)
+            for vector_id in page
+        }
+    except Exception as e:
+        print(f"WARNING: could not list existing vectors ({e}); stale vectors won't be deleted")
+        return None
+
+
+@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=1, max=30), reraise=True)
+def _upsert_batch(index, batch: List[Dict[str, Any]]) -> None:
+    index.upsert(
+        vectors=[
+            {"id": v["id"], "values": v["values"].tolist(), "metadata": v["metadata"]}
+            for v in batch
+        ],
+        namespace=batch[0]["namespace"],
+    )
+
+
+@retry(stop=stop_after_attempt(5), wait=wait_exponential(multiplier=1, min=1, max=30), reraise=True)
+def _delete_batch(index, keys: List[str]) -> None:
+    namespace = keys[0].split("/", 1)[0]
+    index.delete(ids=[key.split("/", 1)[1] for key in keys], namespace=namespace)
+
+
+def _group(items: List[Any], key) -> Dict[str, List[Any]]:
+    groups: Dict[str, List[Any]] = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return groups
+
+
+def sync_vectors(
+    index,
+    vectors: List[Dict[str, Any]],
+    index_name: str,
+    checkpoint_path: Path = CHECKPOINT_PATH,
+    workers: int = 4,
+    batch_size: int = 500,
+    full: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """Upsert new/changed vectors and delete removed ones.
+
+    Args:
+        index: Pinecone index handle
+        vectors: Records from load_vectors()
+        index_name: Recorded in the checkpoint so it isn't reused across indexes
+        checkpoint_path: Where the synced hashes are kept
+        workers: Concurrent upsert/delete requests
+        batch_size: Vectors per upsert request
+        full: Ignore the checkpoint and upload everything
+        dry_run: Report the plan without touching the index or checkpoint
+
+    Returns:
+        Counts of upserted, deleted and unchanged vectors
+    """
+    synced = None if full else load_checkpoint(checkpoint_path, index_name)
+    current = {_key(v["namespace"], v["id"]): v["hash"] for v in vectors}
+
+    if synced is None:
+        # No checkpoint: upload everything, and find stale ids on the index
+        # itself (approved submissions ingested by the server aren't stale)
+        to_upsert = list(vectors)
+        remote_keys = set() if dry_run else (list_remote_keys(index) or set())
+        to_delete = sorted(
+            key for key in remote_keys - current.keys()
+            if not key.split("/", 1)[1].startswith(INGESTED_ID_PREFIX)
+        )
+        synced = {}
+    else:
+        to_upsert = [v for v in vectors if synced.get(_key(v["namespace"], v["id"])) != v["hash"]]
+        to_delete = sorted(synced.keys() - current.keys())
+
+    summary = {
+        "upserted": len(to_upsert),
+        "deleted": len(to_delete),
+        "unchanged": len(vectors) - len(to_upsert),
+    }
+    print(
+        f"Sync plan: {summary['upserted']} to upsert, {summary['deleted']} to delete, "
+        f"{summary['unchanged']} unchanged"
+    )
+    if dry_run:
+        return summary
+
+    lock = threading.Lock()
+    save_checkpoint(checkpoint_path, index_name, synced)
+
+    def upsert(batch: List[Dict[str, Any]]) -> int:
+        _upsert_batch(index, batch)
+        with lock:
+            synced.update({_key(v["namespace"], v["id"]): v["hash"] for v in batch})
+            save_checkpoint(checkpoint_path, index_name, synced)
+        return len(batch)
+
+    def delete(keys: List[str]) -> int:
+        _delete_batch(index, keys)
+        with lock:
+            for key in keys:
+                synced.pop(key, None)
+            save_checkpoint(checkpoint_path, index_name, synced)
+        return len(keys)
+
+    # Every request targets one namespace
+    upsert_batches, delete_batches = [], []
+    for group in _group(to_upsert, lambda v: v["namespace"]).values():
+        upsert_batches += [group[i:i + batch_size] for i in range(0, len(group), batch_size)]
+    for group in _group(to_delete, lambda key: key.split("/", 1)[0]).values():
+        delete_batches += [
+            group[i:i + DELETE_BATCH_SIZE] for i in range(0, len(group), DELETE_BATCH_SIZE)
+        ]
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        futures = [executor.submit(upsert, batch) for batch in upsert_batches]
+        futures += [executor.submit(delete, ids) for ids in delete_batches]
+        try:
+            with tqdm(total=len(to_upsert) + len(to_delete), desc="Syncing") as progress:
+                for future in as_completed(futures):
+                    progress.update(future.result())
+        except BaseException:
+            # Don't start queued batches; the checkpoint already has what finished
+            for future in futures:
+                future.cancel()
+            raise
+
+    return summary
+
+
+def write_version_stamp(index, vectors: List[Dict[str, Any]], partitioned: bool = False) -> str:
+    """Stamp the index with a content hash; running servers see it change and drop cached results.
+
+    A partitioned upload also lists "slug:count" per category namespace.
+    """
+    digest = hashlib.sha256()
+    for v in sorted(vectors, key=lambda v: (v["namespace"], v["id"])):
+        digest.update(f"{v['namespace']}/{v['id']}:{v['hash']}\n".encode())
+    version = digest.hexdigest()[:12]
+    dimension = len(vectors[0]["values"]) if vectors else 384
+    metadata = {
+        "version": version,
+        "uploaded_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "vector_count": len(vectors),
+    }
+    if partitioned:
+        sizes = _group(vectors, lambda v: category_slug(v["metadata"]["category"]))
+        metadata["partitions"] = [f"{slug}:{len(group)}" for slug, group in sorted(sizes.items())]
+    index.upsert(
+        vectors=[{
+            "id": VERSION_RECORD_ID,
+            "values": [1.0] + [0.0] * (dimension - 1),
+            "metadata": metadata,
+        }],
+        namespace=VERSION_NAMESPACE,
+    )
+    return version
 
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--workers", type=int, default=4, help="concurrent requests")
+    parser.add_argument("--batch-size", type=int, default=500, help="vectors per upsert")
+    parser.add_argument(
+        "--partitioned", action="store_true", help="one namespace per category (CBR_PARTITIONED)"
+    )
+    parser.add_argument("--full", action="store_true", help="ignore the checkpoint, upload everything")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan only")
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=Path(os.environ.get("UPLOAD_CHECKPOINT_PATH", CHECKPOINT_PATH)),
+        help="checkpoint file path",
+    )
+    args = parser.parse_args()
+
     # Configuration
     api_key = os.environ.get("PINECONE_API_KEY")
     if not api_key:
@@ -57,70 +336,44 @@ def main():
     print(f"PINECONE_INDEX_HOST={index_info.host}")
     print()
 
-    # Load embeddings
-    print("Loading embeddings from cortex-data/cbr_embeddings.npz...")
-    embeddings_path = DATA_DIR / "cbr_embeddings.npz"
-    data = np.load(embeddings_path)
-    case_ids = data["case_ids"]
-    embeddings = data["embeddings"]
-    print(f"Loaded {len(case_ids)} embeddings ({embeddings.shape[1]} dimensions)")
-
-    # Load case metadata
-    print("Loading case metadata from cortex-data/cbr_cases.json...")
-    cases_path = DATA_DIR / "cbr_cases.json"
-    with open(cases_path) as f:
-        cases_list = json.load(f)
-    cases = {str(c["case_id"]): c for c in cases_list}
-    print(f"Loaded {len(cases)} cases")
-
-    # Prepare vectors
-    print("Preparing vectors with metadata...")
-    vectors = []
-    for case_id, embedding in zip(case_ids, embeddings):
-        case = cases.get(str(case_id), {})
-        features = case.get("features", {})
-        pricing = case.get("pricing", {})
-
-        # Flatten metadata for Pinecone (max 40KB per record)
-        # Remove None values (Pinecone doesn't accept null)
-        metadata = {
-            "case_id": str(case_id),
-            "year": case.get("year"),
-            "category": features.get("category", "Unknown"),
-            "sqft": features.get("sqft"),
-            "total": pricing.get("total"),
-            "per_sqft": pricing.get("per_sqft"),
-            "material_sell": pricing.get("material_sell"),
-            "labor_sell": pricing.get("labor_sell"),
-            "complexity_score": features.get("complexity_score"),
-        }
-        metadata = {k: v for k, v in metadata.items() if v is not None}
+    print(f"Loading embeddings and case metadata from {DATA_DIR}...")
+    vectors = load_vectors(partitioned=args.partitioned)
+    print(f"Loaded {len(vectors)} vectors")
 
-        vectors.append({
-            "id": str(case_id),
-            "values": embedding.tolist(),
-            "metadata": metadata
-        })
-
-    # Upsert in batches
-    batch_size = 500  # Optimal for 384-dim vectors
-    print(f"Uploading {len(vectors)} vectors in batches of {batch_size}...")
-    for i in tqdm(range(0, len(vectors), batch_size), desc="Uploading"):
-        batch = vectors[i:i + batch_size]
-        index.upsert(vectors=batch, namespace="cbr")
+    summary = sync_vectors(
+        index,
+        vectors,
+        index_name,
+        checkpoint_path=args.checkpoint,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        full=args.full,
+        dry_run=args.dry_run,
+    )
+    if args.dry_run:
+        return
 
     # Verify
     print("\nVerifying upload...")
     stats = index.describe_index_stats()
-    namespace_count = stats.namespaces.get("cbr", {}).vector_count if stats.namespaces else 0
-    print(f"Index stats: {stats}")
-    print(f"\nUpload complete! Vectors in 'cbr' namespace: {namespace_count}")
+    namespace_count = sum(
+        stats.namespaces[ns].vector_count
+        for ns in {v["namespace"] for v in vectors}
+        if stats.namespaces and ns in stats.namespaces
+    )
+    print(f"\nSync complete! Vectors in CBR namespaces: {namespace_count}")
 
     if namespace_count == len(vectors):
-        print("SUCCESS: All vectors uploaded!")
+        print("SUCCESS: All vectors in sync!")
     else:
+        # describe_index_stats is eventually consistent on serverless indexes
         print(f"WARNING: Expected {len(vectors)}, got {namespace_count}")
 
+    if summary["upserted"] or summary["deleted"]:
+        print(f"Index version stamp: {write_version_stamp(index, vectors, args.partitioned)}")
+    else:
+        print("No changes; version stamp left as is")
+
 
 if __name__ == "__main__":
     main()
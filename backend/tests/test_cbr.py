@@ -2,6 +2,7 @@
 
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 
 
@@ -110,3 +111,730 @@ def test_embedding_model_generates_correct_dimensions(client):
     except RuntimeError:
         # Model not loaded in test environment - skip
         pytest.skip("Embedding model not loaded")
+
+
+def test_query_embedding_cache_skips_model(tmp_path):
+    """Repeated query texts are served from memory, then from the disk store."""
+    from app.services import embeddings
+    from app.services.cache import SQLiteStore
+
+    calls = []
+
+    def fake_encode(text):
+        calls.append(text)
+        return np.full(384, 0.5, dtype=np.float32)
+
+    store = SQLiteStore("embeddings_test", str(tmp_path / "emb.sqlite"))
+    text = "Toiture Bardeaux, 1234 pieds carres, complexite 99"
+    with patch.object(embeddings, "_encode", side_effect=fake_encode), \
+            patch.object(embeddings, "_store", store):
+        first = embeddings.generate_query_embedding(text)
+        second = embeddings.generate_query_embedding(text)
+        assert first == second and len(first) == 384
+        assert len(calls) == 1
+
+        # Survives an in-memory cache reset via the disk store
+        embeddings._cache.clear()
+        assert embeddings.generate_query_embedding(text) == first
+        assert len(calls) == 1
+        assert store.stats()["hits"] == 1
+    store.close()
+
+
+def test_onnx_embedder_matches_torch():
+    """Quantized ONNX backend stays within cosine 0.99 of torch on the CBR case texts."""
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    from app.services.embeddings import EMBEDDING_MODEL_NAME
+    from app.services.onnx_embedder import ONNX_DIR, OnnxEmbedder, onnx_available
+    from scripts.export_onnx_embedder import MIN_COSINE, min_cosine, parity_texts
+
+    if not onnx_available(ONNX_DIR):
+        pytest.skip("ONNX embedder not exported (scripts/export_onnx_embedder.py)")
+    try:
+        texts = parity_texts()
+    except FileNotFoundError:
+        pytest.skip("CBR case corpus (cortex-data/cbr_cases.json) not available")
+    try:
+        model = sentence_transformers.SentenceTransformer(EMBEDDING_MODEL_NAME, device="cpu")
+    except OSError:
+        pytest.skip("sentence-transformers model not available offline")
+
+    expected = model.encode(texts)
+    actual = OnnxEmbedder(ONNX_DIR).encode(texts)
+    assert actual.shape == expected.shape
+    assert min_cosine(expected, actual) >= MIN_COSINE
+
+
+def test_onnx_export_script_keeps_served_export_on_mismatch(tmp_path):
+    """An export failing cosine parity is never swapped in and the script exits 1."""
+    sentence_transformers = pytest.importorskip("sentence_transformers")
+    from unittest.mock import MagicMock
+
+    from scripts import export_onnx_embedder as script
+
+    served = tmp_path / "embedder"
+    served.mkdir()
+    (served / "embedder.json").write_text("{}")
+    staged = tmp_path / "embedder.tmp"
+
+    def fake_stage(model_name, out_dir):
+        staged.mkdir()
+        return staged, {"dimension": 2, "max_seq_length": 128, "quantization": "int8-dynamic"}
+
+    torch_model = MagicMock()
+    torch_model.encode.return_value = np.array([[1.0, 0.0], [0.0, 1.0]])
+    onnx_model = MagicMock()
+    onnx_model.encode.return_value = np.array([[1.0, 0.0], [1.0, 0.0]])
+
+    with patch.object(script, "ONNX_DIR", served), \
+            patch.object(script, "parity_texts", return_value=["Toiture Bardeaux", "Toiture Membrane"]), \
+            patch.object(script, "stage_onnx_embedder", side_effect=fake_stage), \
+            patch.object(script, "OnnxEmbedder", return_value=onnx_model), \
+            patch.object(sentence_transformers, "SentenceTransformer", return_value=torch_model), \
+            pytest.raises(SystemExit) as exit_info:
+        script.main()
+
+    assert exit_info.value.code == 1
+    assert (served / "embedder.json").read_text() == "{}"
+    assert not staged.exists()
+
+
+def test_concurrent_embeddings_are_batched():
+    """Cache misses arriving together share one batched encode."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.services import embeddings
+    from app.services.batcher import MicroBatcher
+
+    batch_sizes = []
+
+    def fake_encode_batch(texts):
+        batch_sizes.append(len(texts))
+        return np.array([[float(t.split()[-1])] * 384 for t in texts], dtype=np.float32)
+
+    batcher = MicroBatcher("embeddings_test", fake_encode_batch, window_ms=200, max_size=64)
+    batcher.start()
+    texts = [f"Toiture Bardeaux, complexite {i}" for i in range(8)] * 2
+    with patch.object(embeddings, "_batcher", batcher), patch.object(embeddings, "_store", None):
+        embeddings._cache.clear()
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(embeddings.generate_query_embedding, texts))
+    batcher.stop()
+
+    assert [r[0] for r in results] == [float(t.split()[-1]) for t in texts]
+    # 16 concurrent misses over 8 distinct texts in fewer than 8 encodes
+    assert len(batch_sizes) < 8
+    assert batcher.stats()["largest_batch"] > 1
+
+
+def _write_case_base(path, n=300):
+    """Synthetic cbr_embeddings.npz + cbr_cases.json; returns (embeddings, cases)."""
+    import json
+
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(n, 384)).astype(np.float32)
+    categories = ["Bardeaux", "Elastomere", "Other"]
+    cases = [
+        {
+            "case_id": i,
+            "year": 2020 + i % 5,
+            "features": {
+                "category": categories[i % 3],
+                "sqft": None if i % 50 == 0 else float(rng.uniform(100, 8000)),
+                "complexity_score": int(rng.integers(1, 100)),
+                "material_line_count": int(rng.integers(0, 30)),
+            },
+            "pricing": {"total": 1000.0 + i, "per_sqft": 5.0},
+        }
+        for i in range(n)
+    ]
+    np.savez(path / "cbr_embeddings.npz", case_ids=np.arange(n), embeddings=embeddings)
+    (path / "cbr_cases.json").write_text(json.dumps(cases))
+    return embeddings, cases
+
+
+def test_local_index_matches_brute_force(tmp_path):
+    """Local CBR backend returns Pinecone-shaped, exactly ranked, filtered results."""
+    from app.services.local_cbr import build_local_index, load_local_index
+
+    embeddings, cases = _write_case_base(tmp_path)
+    n = len(cases)
+    rng = np.random.default_rng(1)
+
+    summary = build_local_index(tmp_path, tmp_path / "index")
+    assert summary["cases"] == n
+    index = load_local_index(tmp_path / "index")
+
+    query = rng.normal(size=384).tolist()
+    results = index.query(query, top_k=5, category_filter="Bardeaux", sqft_filter=1500)
+
+    unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    scores = unit @ (np.array(query) / np.linalg.norm(query))
+    eligible = [
+        i for i, c in enumerate(cases)
+        if c["features"]["category"] == "Bardeaux"
+        and c["features"]["sqft"] is not None
+        and 750 <= c["features"]["sqft"] <= 3000
+    ]
+    expected = sorted(eligible, key=lambda i: -scores[i])[:5]
+
+    assert [r["case_id"] for r in results] == [str(i) for i in expected]
+    assert set(results[0]) == {"case_id", "similarity", "category", "sqft", "total", "per_sqft", "year"}
+    assert results[0]["similarity"] == round(float(scores[expected[0]]), 4)
+
+    # No filters: global top-k, cases without sqft included
+    unfiltered = index.query(query, top_k=3)
+    assert [r["case_id"] for r in unfiltered] == [str(i) for i in np.argsort(-scores)[:3]]
+
+
+def test_numeric_knn_matches_brute_force(tmp_path):
+    """Numeric CBR ranks by distance on job inputs and honors the sqft filter."""
+    from app.services.local_cbr import build_local_index
+    from app.services.numeric_cbr import load_numeric_index
+
+    _write_case_base(tmp_path)
+    build_local_index(tmp_path, tmp_path / "index")
+    index = load_numeric_index(tmp_path / "index")
+
+    results = index.query(
+        sqft=1500, category="Bardeaux", complexity=40, material_lines=12, labor_lines=2,
+        top_k=5, sqft_filter=1500,
+    )
+    assert len(results) == 5
+    assert all(750 <= r["sqft"] <= 3000 for r in results)
+    similarities = [r["similarity"] for r in results]
+    assert similarities == sorted(similarities, reverse=True)
+    assert all(0 < s <= 1 for s in similarities)
+
+    # Same ranking as an exhaustive search over eligible cases
+    point = np.concatenate([
+        index._standardize(np.array([np.log1p(1500), 40, 12, 2], dtype=float)),
+        index._one_hot(np.array([index.categories.index("Bardeaux")]))[0],
+    ])
+    distances = np.linalg.norm(index.tree.data - point, axis=1)
+    with np.errstate(invalid="ignore"):
+        eligible = np.flatnonzero((index.sqft >= 750) & (index.sqft <= 3000))
+    expected = eligible[np.argsort(distances[eligible], kind="stable")[:5]]
+    assert [r["case_id"] for r in results] == [index.case_ids[i] for i in expected]
+
+
+def test_estimate_numeric_cbr_mode(client, tmp_path):
+    """cbr_mode=numeric returns similar cases without the embedding model."""
+    from app.services import pinecone_cbr
+    from app.services.local_cbr import build_local_index
+    from app.services.numeric_cbr import load_numeric_index
+
+    _write_case_base(tmp_path)
+    build_local_index(tmp_path, tmp_path / "index")
+    index = load_numeric_index(tmp_path / "index")
+
+    with patch.object(pinecone_cbr, "_numeric_index", index), \
+            patch("app.routers.estimate.embed_query") as embed:
+        response = client.post(
+            "/estimate",
+            json={"sqft": 1500, "category": "Bardeaux", "cbr_mode": "numeric"},
+        )
+    assert response.status_code == 200
+    cases = response.json()["similar_cases"]
+    assert len(cases) == 5
+    assert set(cases[0]) >= {"case_id", "similarity", "category", "sqft", "total"}
+    embed.assert_not_called()
+
+
+def test_embedding_table_lookup(tmp_path):
+    """Grid points are exact and off-grid sqft interpolates between buckets."""
+    from app.services import embeddings
+    from app.services.embedding_table import build_embedding_table, load_embedding_table
+
+    def fake_encode_batch(texts):
+        # Deterministic per-text vector
+        return np.array(
+            [np.random.default_rng(abs(hash(t)) % 2**32).normal(size=384) for t in texts]
+        )
+
+    grid = {"sqft": [0, 1000, 2000], "complexity": [10, 50], "material_lines": [0, 5], "labor_lines": [0]}
+    build_embedding_table(
+        fake_encode_batch, embeddings.build_query_text, ["Bardeaux", "Other"],
+        embeddings.EMBEDDING_MODEL_NAME, out_dir=tmp_path / "table", grid=grid,
+    )
+    table = load_embedding_table(tmp_path / "table")
+
+    on_grid = table.lookup(1000.0, "Bardeaux", 50, 5, 0)
+    expected = fake_encode_batch([embeddings.build_query_text(1000.0, "Bardeaux", 50, 5, 0)])[0]
+    np.testing.assert_allclose(on_grid, expected, atol=1e-2)
+
+    # Snaps complexity/lines, interpolates sqft on a log scale
+    low = table.lookup(1000.0, "Bardeaux", 10, 0)
+    high = table.lookup(2000.0, "Bardeaux", 10, 0)
+    mid = table.lookup(float(np.sqrt(1000 * 2000)), "Bardeaux", 12, 1)
+    np.testing.assert_allclose(mid, (low + high) / 2, atol=1e-5)
+
+    assert table.lookup(1000.0, "Gutters", 10) is None
+
+    # embed_query serves from the table without touching the model
+    with patch.object(embeddings, "_table", table), \
+            patch.object(embeddings, "generate_query_embedding") as model_path:
+        vector = embeddings.embed_query(1000.0, "Bardeaux", 50, 5, 0)
+        model_path.assert_not_called()
+    assert len(vector) == 384
+
+
+def test_pinecone_results_cached_until_version_changes():
+    """Repeat queries skip Pinecone until the upload version stamp changes."""
+    from types import SimpleNamespace
+    from unittest.mock import MagicMock
+
+    from app.services import pinecone_cbr
+
+    match = SimpleNamespace(
+        id="42", score=0.91234,
+        metadata={"category": "Bardeaux", "sqft": 1500.0, "total": 12000.0, "per_sqft": 8.0, "year": 2024},
+    )
+    index = MagicMock()
+    index.query.return_value = SimpleNamespace(matches=[match])
+    stamp = {"version": "v1"}
+    index.fetch.side_effect = lambda ids, namespace: SimpleNamespace(
+        vectors={ids[0]: SimpleNamespace(metadata=dict(stamp))}
+    )
+
+    vector = [0.1] * 384
+    with patch.object(pinecone_cbr, "_index", index), \
+            patch.object(pinecone_cbr, "_local_index", None), \
+            patch.object(pinecone_cbr, "_index_version", None), \
+            patch.object(pinecone_cbr, "_version_checked_at", 0.0), \
+            patch.object(pinecone_cbr.settings, "cbr_version_check_s", 0.0):
+        pinecone_cbr._result_cache.clear()
+        first = pinecone_cbr.query_similar_cases(vector, top_k=5, sqft_filter=1500)
+        # Float noise below the rounding step still hits
+        second = pinecone_cbr.query_similar_cases([0.10001] * 384, top_k=5, sqft_filter=1500)
+        assert first == second and first[0]["case_id"] == "42"
+        assert index.query.call_count == 1
+
+        # Different filter -> separate entry
+        pinecone_cbr.query_similar_cases(vector, top_k=5, sqft_filter=3000)
+        assert index.query.call_count == 2
+
+        # Re-upload bumps the stamp -> cache dropped
+        stamp["version"] = "v2"
+        pinecone_cbr.query_similar_cases(vector, top_k=5, sqft_filter=1500)
+        assert index.query.call_count == 3
+    pinecone_cbr._result_cache.clear()
+
+
+def test_hybrid_cbr_deadline_and_circuit_breaker():
+    """Slow Pinecone calls hit the deadline, return [] and eventually open the breaker."""
+    import asyncio
+    import time
+
+    from app.schemas.hybrid_quote import HybridQuoteRequest
+    from app.services import hybrid_quote
+    from app.services.resilience import CircuitBreaker
+
+    async def slow_query(**kwargs):
+        await asyncio.sleep(0.3)
+        return [{"case_id": "1", "similarity": 0.9}]
+
+    request = HybridQuoteRequest(sqft=1500, category="Bardeaux")
+    breaker = CircuitBreaker("cbr_test", failure_threshold=2, cooldown_s=60)
+    with patch.object(hybrid_quote, "is_cbr_available", return_value=True), \
+            patch.object(hybrid_quote, "use_numeric_cbr", return_value=False), \
+            patch.object(hybrid_quote, "embed_query", return_value=[0.1] * 384), \
+            patch.object(hybrid_quote, "aquery_similar_cases", side_effect=slow_query) as query, \
+            patch.object(hybrid_quote, "_cbr_breaker", breaker), \
+            patch.object(hybrid_quote.settings, "cbr_timeout_s", 0.05), \
+            patch.object(hybrid_quote.settings, "cbr_hedge_enabled", False):
+        async def timed_query():
+            start = time.time()
+            result = await hybrid_quote._run_cbr_query(request)
+            return result, time.time() - start
+
+        for _ in range(2):
+            result, elapsed = asyncio.run(timed_query())
+            assert result == [] and elapsed < 0.25
+        assert breaker.state == "open"
+
+        # Open breaker: Pinecone isn't called at all
+        calls = query.call_count
+        assert asyncio.run(hybrid_quote._run_cbr_query(request)) == []
+        assert query.call_count == calls
+
+
+def test_slow_embedding_does_not_count_against_cbr_deadline():
+    """The deadline and breaker cover only the vector-store query, not the embedding."""
+    import asyncio
+    import time
+
+    from app.schemas.hybrid_quote import HybridQuoteRequest
+    from app.services import hybrid_quote
+    from app.services.resilience import CircuitBreaker
+
+    def slow_embed(**kwargs):
+        time.sleep(0.2)  # CPU-starved embedding
+        return [0.1] * 384
+
+    async def fast_query(**kwargs):
+        return [{"case_id": "1", "similarity": 0.9}]
+
+    request = HybridQuoteRequest(sqft=1500, category="Bardeaux")
+    breaker = CircuitBreaker("cbr_test", failure_threshold=1, cooldown_s=60)
+    with patch.object(hybrid_quote, "is_cbr_available", return_value=True), \
+            patch.object(hybrid_quote, "use_numeric_cbr", return_value=False), \
+            patch.object(hybrid_quote, "embed_query", side_effect=slow_embed), \
+            patch.object(hybrid_quote, "aquery_similar_cases", side_effect=fast_query), \
+            patch.object(hybrid_quote, "_cbr_breaker", breaker), \
+            patch.object(hybrid_quote.settings, "cbr_timeout_s", 0.05), \
+            patch.object(hybrid_quote.settings, "cbr_hedge_enabled", False):
+        assert asyncio.run(hybrid_quote._run_cbr_query(request)) == [{"case_id": "1", "similarity": 0.9}]
+        assert breaker.state == "closed"
+
+
+def test_hedged_request_returns_faster_attempt():
+    """A hedged second attempt wins when the first one stalls."""
+    import asyncio
+
+    from app.services.resilience import hedged
+
+    delays = [1.0, 0.01]
+
+    async def attempt():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    async def run():
+        return await asyncio.wait_for(hedged(attempt, hedge_delay=0.05), timeout=0.5)
+
+    assert asyncio.run(run()) == 0.01
+
+
+def test_hedged_cancels_first_attempt_when_deadline_fires_before_hedge():
+    """A deadline during the initial wait cancels the in-flight attempt."""
+    import asyncio
+
+    from app.services.resilience import hedged
+
+    cancelled = []
+
+    async def attempt():
+        try:
+            await asyncio.sleep(1.0)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(hedged(attempt, hedge_delay=0.5), timeout=0.05)
+        await asyncio.sleep(0)  # let the cancellation land
+        return list(cancelled)  # before asyncio.run cancels leftover tasks
+
+    assert asyncio.run(run()) == [True]
+
+
+def test_async_pinecone_query_shares_cache():
+    """aquery_similar_cases awaits the asyncio client and fills the shared cache."""
+    import asyncio
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, MagicMock
+
+    from app.services import pinecone_cbr
+    from app.services.resilience import LatencyWindow
+
+    match = SimpleNamespace(id="7", score=0.8, metadata={"category": "Bardeaux", "sqft": 1400.0})
+    aindex = MagicMock()
+    aindex.query = AsyncMock(return_value=SimpleNamespace(matches=[match]))
+    aindex.fetch = AsyncMock(return_value=SimpleNamespace(vectors={}))
+    sync_index = MagicMock()
+
+    latency = LatencyWindow()
+    with patch.object(pinecone_cbr, "_aindex", aindex), \
+            patch.object(pinecone_cbr, "_index", sync_index), \
+            patch.object(pinecone_cbr, "_local_index", None), \
+            patch.object(pinecone_cbr, "_index_version", None), \
+            patch.object(pinecone_cbr, "_version_checked_at", 0.0), \
+            patch.object(pinecone_cbr, "pinecone_latency", latency):
+        pinecone_cbr._result_cache.clear()
+        results = asyncio.run(pinecone_cbr.aquery_similar_cases([0.2] * 384, sqft_filter=1500))
+        assert results[0]["case_id"] == "7"
+        assert latency.stats()["samples"] == 1
+        assert aindex.query.await_args.kwargs["filter"] == {
+            "$and": [{"sqft": {"$gte": 750.0}}, {"sqft": {"$lte": 3000.0}}]
+        }
+
+        # Sync path with the same inputs is served from the cache
+        assert pinecone_cbr.query_similar_cases([0.2] * 384, sqft_filter=1500) == results
+        sync_index.query.assert_not_called()
+        # Cache hits don't feed the hedge-delay latency window
+        assert asyncio.run(pinecone_cbr.aquery_similar_cases([0.2] * 384, sqft_filter=1500)) == results
+        assert latency.stats()["samples"] == 1
+    pinecone_cbr._result_cache.clear()
+
+
+def test_async_pinecone_pool_size_limits_connector():
+    """PINECONE_POOL_SIZE caps the asyncio client's aiohttp connector."""
+    import asyncio
+
+    pytest.importorskip("aiohttp_retry")
+    from app.config import settings
+    from app.services import pinecone_cbr
+
+    async def run():
+        with patch.object(settings, "cbr_backend", "pinecone"), \
+                patch.object(settings, "pinecone_api_key", "test-key"), \
+                patch.object(settings, "pinecone_index_host", "https://test-index.svc.pinecone.io"), \
+                patch.object(settings, "pinecone_pool_size", 7):
+            pinecone_cbr.init_pinecone()
+        try:
+            return pinecone_cbr._aindex._api_client.rest_client._session.connector.limit
+        finally:
+            await pinecone_cbr.aclose_pinecone()
+
+    assert asyncio.run(run()) == 7
+
+
+def test_async_pinecone_client_kept_when_pool_sizing_fails():
+    """Unexpected client internals only skip the pool sizing, not the asyncio client."""
+    from unittest.mock import MagicMock
+
+    from app.config import settings
+    from app.services import pinecone_cbr
+
+    aindex = MagicMock(spec=["query", "fetch", "close"])  # no _api_client
+    pc = MagicMock()
+    pc.IndexAsyncio.return_value = aindex
+    with patch.object(pinecone_cbr, "Pinecone", return_value=pc), \
+            patch.object(settings, "cbr_backend", "pinecone"), \
+            patch.object(settings, "pinecone_api_key", "test-key"), \
+            patch.object(settings, "pinecone_index_host", "https://test-index.svc.pinecone.io"):
+        pinecone_cbr.init_pinecone()
+        try:
+            assert pinecone_cbr._aindex is aindex
+        finally:
+            pinecone_cbr.close_pinecone()
+
+
+def test_upload_sync_is_incremental_and_resumable(tmp_path):
+    """upload_embeddings only sends changed vectors, deletes removed ones, and resumes."""
+    import json
+    import threading
+    from types import SimpleNamespace
+
+    from scripts.upload_embeddings import load_vectors, sync_vectors
+
+    class FakeIndex:
+        def __init__(self, fail_after=None):
+            self.vectors, self.upserted, self.fail_after = {}, 0, fail_after
+            self._lock = threading.Lock()
+
+        def upsert(self, vectors, namespace):
+            with self._lock:
+                if self.fail_after is not None and self.upserted >= self.fail_after:
+                    raise RuntimeError("connection reset")
+                self.upserted += len(vectors)
+                self.vectors.update({(namespace, v["id"]): v for v in vectors})
+
+        def delete(self, ids, namespace):
+            for vector_id in ids:
+                self.vectors.pop((namespace, vector_id), None)
+
+        def describe_index_stats(self):
+            return SimpleNamespace(namespaces={ns: None for ns, _ in self.vectors})
+
+        def list(self, namespace):
+            yield [vector_id for ns, vector_id in self.vectors if ns == namespace]
+
+    _, cases = _write_case_base(tmp_path, n=100)
+    checkpoint = tmp_path / "checkpoint.json"
+    kwargs = {"index_name": "test", "checkpoint_path": checkpoint, "batch_size": 10}
+
+    # Interrupted run: one worker, the third batch fails after retries
+    index = FakeIndex(fail_after=20)
+    with patch("scripts.upload_embeddings._upsert_batch.retry.sleep"):
+        with pytest.raises(RuntimeError):
+            sync_vectors(index, load_vectors(tmp_path), workers=1, **kwargs)
+    assert len(json.loads(checkpoint.read_text())["records"]) == 20
+
+    # Resume picks up the remaining 80
+    index.fail_after = None
+    summary = sync_vectors(index, load_vectors(tmp_path), workers=4, **kwargs)
+    assert summary == {"upserted": 80, "deleted": 0, "unchanged": 20}
+    assert len(index.vectors) == 100
+
+    # Change one case, drop another
+    cases[5]["pricing"]["total"] = 99999.0
+    (tmp_path / "cbr_cases.json").write_text(json.dumps(cases))
+    data = np.load(tmp_path / "cbr_embeddings.npz")
+    keep = data["case_ids"] != 7
+    np.savez(
+        tmp_path / "cbr_embeddings.npz",
+        case_ids=data["case_ids"][keep],
+        embeddings=data["embeddings"][keep],
+    )
+    summary = sync_vectors(index, load_vectors(tmp_path), **kwargs)
+    assert summary == {"upserted": 1, "deleted": 1, "unchanged": 98}
+    assert ("cbr", "7") not in index.vectors
+    assert index.vectors[("cbr", "5")]["metadata"]["total"] == 99999.0
+
+    # No changes: nothing sent
+    assert sync_vectors(index, load_vectors(tmp_path), **kwargs)["upserted"] == 0
+
+    # Switching to per-category namespaces moves every vector
+    summary = sync_vectors(index, load_vectors(tmp_path, partitioned=True), **kwargs)
+    assert summary == {"upserted": 99, "deleted": 99, "unchanged": 0}
+    assert {ns for ns, _ in index.vectors} == {"cbr-bardeaux", "cbr-elastomere", "cbr-other"}
+    assert index.vectors[("cbr-other", "5")]["metadata"]["category"] == "Other"
+
+
+def test_approved_submission_is_ingested_into_local_index(tmp_path):
+    """Approval queues the submission; the worker embeds and adds it off the request path."""
+    import time
+    from unittest.mock import MagicMock
+
+    from app.services import cbr_ingest, pinecone_cbr, submission_service
+    from app.services.local_cbr import build_local_index, load_local_index
+    from app.services.numeric_cbr import load_numeric_index
+
+    _write_case_base(tmp_path)
+    build_local_index(tmp_path, tmp_path / "index")
+    submission = {
+        "id": "abc",
+        "status": "pending_approval",
+        "category": "Metal",
+        "sqft": 1500.0,
+        "line_items": [
+            {"type": "material", "total": 6000.0},
+            {"type": "material", "total": 1500.0},
+            {"type": "labor", "total": 4500.0},
+        ],
+        "total_materials_cost": 7500.0,
+        "total_labor_cost": 4500.0,
+        "total_price": 12000.0,
+    }
+    approved = {**submission, "status": "approved", "approved_at": "2026-03-01T12:00:00Z"}
+    supabase = MagicMock()
+    table = supabase.table.return_value
+    table.select.return_value.eq.return_value.single.return_value.execute.return_value = \
+        MagicMock(data=dict(submission))
+    table.update.return_value.eq.return_value.execute.return_value = MagicMock(data=[approved])
+
+    embedded = []
+
+    def fake_embed_texts(texts):
+        embedded.append(texts)
+        return np.ones((len(texts), 384), dtype=np.float32)
+
+    with patch.object(pinecone_cbr, "_local_index", load_local_index(tmp_path / "index")), \
+            patch.object(pinecone_cbr, "_numeric_index", load_numeric_index(tmp_path / "index")), \
+            patch.object(pinecone_cbr, "_index", None), \
+            patch.object(submission_service, "get_supabase", return_value=supabase), \
+            patch.object(cbr_ingest, "embed_texts", side_effect=fake_embed_texts), \
+            patch.object(cbr_ingest.settings, "cbr_ingest_window_s", 0.05):
+        cbr_ingest.start_ingest()
+        try:
+            result = submission_service.approve_submission("abc", "admin")
+            assert result["status"] == "approved"
+
+            deadline = time.monotonic() + 5
+            while cbr_ingest.ingest_stats()["ingested"] < 1 and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            cbr_ingest.stop_ingest()
+
+        assert embedded == [["Toiture Metal, 1500.0 pieds carres, complexite 10, "
+                             "2 lignes materiaux, 1 lignes main-d'oeuvre"]]
+        results = pinecone_cbr.query_similar_cases([1.0] * 384, top_k=1, category_filter="Metal")
+        assert results[0]["case_id"] == "submission-abc"
+        assert results[0]["total"] == 12000.0
+        assert results[0]["per_sqft"] == 8.0
+        assert results[0]["year"] == 2026
+
+        numeric = pinecone_cbr.query_numeric_cases(1500.0, "Metal", top_k=1, category_filter="Metal")
+        assert numeric[0]["case_id"] == "submission-abc"
+
+
+def test_partitioned_cbr_routes_to_category(tmp_path):
+    """Partitioned queries search the job's category, fanning out when it's small."""
+    from types import SimpleNamespace
+    from unittest.mock import MagicMock
+
+    from app.services import pinecone_cbr
+    from app.services.cbr_partitions import select_partitions
+    from app.services.local_cbr import build_local_index, load_local_index
+
+    sizes = {"bardeaux": 500, "elastomere": 40, "other": 30, "gutters": 5}
+    assert select_partitions("Bardeaux", sizes, 200) == ["bardeaux"]
+    assert select_partitions("Élastomère", sizes, 200) == ["elastomere", "bardeaux"]
+    assert select_partitions("Gutters", sizes, 50) == ["gutters", "other", "bardeaux"]
+    assert select_partitions(None, sizes, 200) == list(sizes)
+
+    # Local shards: same results as a category-filtered full scan
+    _write_case_base(tmp_path)
+    build_local_index(tmp_path, tmp_path / "index")
+    local = load_local_index(tmp_path / "index")
+    query = np.random.default_rng(1).normal(size=384).tolist()
+    with patch.object(pinecone_cbr, "_local_index", local), \
+            patch.object(pinecone_cbr.settings, "cbr_partitioned", True), \
+            patch.object(pinecone_cbr.settings, "cbr_partition_min_cases", 50):
+        routed = pinecone_cbr.query_similar_cases(query, top_k=5, sqft_filter=2000, category="Other")
+        assert routed == local.query(query, 5, category_filter="Other", sqft_filter=2000)
+        assert routed == local.query(query, 5, sqft_filter=2000, partitions=["other"])
+
+    # Pinecone: one namespace without the category filter, fan-out when small
+    match = SimpleNamespace(id="1", score=0.9, metadata={"category": "Bardeaux", "sqft": 1500.0})
+    index = MagicMock()
+    index.query.return_value = SimpleNamespace(matches=[match])
+    index.query_namespaces.return_value = SimpleNamespace(matches=[match])
+    stamp = SimpleNamespace(vectors={pinecone_cbr.VERSION_RECORD_ID: SimpleNamespace(
+        metadata={"version": "v1", "partitions": ["bardeaux:500", "elastomere:40", "other:30"]}
+    )})
+    index.fetch.return_value = stamp
+    with patch.object(pinecone_cbr, "_index", index), \
+            patch.object(pinecone_cbr, "_local_index", None), \
+            patch.object(pinecone_cbr, "_index_version", None), \
+            patch.object(pinecone_cbr, "_version_checked_at", 0.0), \
+            patch.object(pinecone_cbr, "_partition_sizes", {}), \
+            patch.object(pinecone_cbr.settings, "cbr_partitioned", True):
+        pinecone_cbr._result_cache.clear()
+        pinecone_cbr.query_similar_cases([0.1] * 384, sqft_filter=1500, category="Bardeaux")
+        kwargs = index.query.call_args.kwargs
+        assert kwargs["namespace"] == "cbr-bardeaux"
+        assert kwargs["filter"] == {
+            "$and": [{"sqft": {"$gte": 750.0}}, {"sqft": {"$lte": 3000.0}}]
+        }
+
+        pinecone_cbr.query_similar_cases([0.1] * 384, sqft_filter=1500, category="Elastomere")
+        assert index.query_namespaces.call_args.kwargs["namespaces"] == [
+            "cbr-elastomere", "cbr-bardeaux"
+        ]
+    pinecone_cbr._result_cache.clear()
+
+
+def test_ingest_before_any_query_uses_partition_namespace():
+    """add_cases reads the partition layout itself instead of waiting for a query."""
+    from types import SimpleNamespace
+    from unittest.mock import MagicMock
+
+    from app.services import pinecone_cbr
+
+    index = MagicMock()
+    index.fetch.return_value = SimpleNamespace(vectors={pinecone_cbr.VERSION_RECORD_ID: SimpleNamespace(
+        metadata={"version": "v1", "partitions": ["bardeaux:500", "other:30"]}
+    )})
+    case = {
+        "case_id": "sub-1",
+        "year": 2025,
+        "features": {"category": "Bardeaux", "sqft": 1500.0},
+        "pricing": {"total": 15000.0, "per_sqft": 10.0},
+    }
+    with patch.object(pinecone_cbr, "_index", index), \
+            patch.object(pinecone_cbr, "_local_index", None), \
+            patch.object(pinecone_cbr, "_numeric_index", None), \
+            patch.object(pinecone_cbr, "_index_version", None), \
+            patch.object(pinecone_cbr, "_version_checked_at", 0.0), \
+            patch.object(pinecone_cbr, "_partition_sizes", {}):
+        assert pinecone_cbr.add_cases([case], np.ones((1, 384), dtype=np.float32)) == 1
+        assert index.upsert.call_args.kwargs["namespace"] == "cbr-bardeaux"
+        assert pinecone_cbr._partition_sizes["bardeaux"] == 501
+    pinecone_cbr._result_cache.clear()
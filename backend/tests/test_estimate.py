@@ -1,5 +1,7 @@
 """Tests for estimate endpoint."""
 
+from unittest.mock import patch
+
 
 def test_estimate_valid_bardeaux(client):
     """POST /estimate with Bardeaux returns 200 with estimate, range, confidence."""
@@ -122,3 +124,284 @@ def test_estimate_response_has_reasoning_field(client):
     if data["reasoning"] is not None:
         assert isinstance(data["reasoning"], str)
         assert len(data["reasoning"]) > 0
+
+
+def test_estimate_batch_matches_single(client):
+    """POST /estimate/batch returns results in input order matching /estimate."""
+    jobs = [
+        {"sqft": 1500, "category": "Bardeaux"},
+        {"sqft": 2000, "category": "Élastomère", "complexity": 30},
+        {"sqft": 3000, "category": "Other", "material_lines": 10, "has_subs": 1},
+        {"sqft": 800, "category": "Bardeaux", "labor_lines": 4},
+    ]
+    response = client.post("/estimate/batch", json={"jobs": jobs})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == len(jobs)
+
+    for job, result in zip(jobs, data["results"]):
+        single = client.post("/estimate", json=job).json()
+        assert result["estimate"] == single["estimate"]
+        assert result["confidence"] == single["confidence"]
+        assert result["model"] == single["model"]
+
+
+def test_estimate_batch_empty(client):
+    """POST /estimate/batch with no jobs returns 422."""
+    response = client.post("/estimate/batch", json={"jobs": []})
+    assert response.status_code == 422
+
+
+def test_cache_sqft_step_does_not_change_model_input():
+    """The sqft step snaps the price cache key; the model is fed the raw sqft."""
+    from unittest.mock import MagicMock
+
+    from app.config import settings
+    from app.services import predictor
+
+    predictor._ensure_models_loaded()
+    model = MagicMock()
+    model.predict.return_value = [12345.0]
+    with patch.dict(predictor._models, {"bardeaux": model}), \
+            patch.object(settings, "prediction_cache_sqft_step", 100.0):
+        predictor._cache.clear()
+        first = predictor.predict(sqft=1234, category="Bardeaux")
+        assert model.predict.call_args.args[0][0, 0] == 1234
+        # Same bucket: served from the cache
+        assert predictor.predict(sqft=1210, category="Bardeaux") == first
+        assert model.predict.call_count == 1
+
+        predictor.predict_batch([{"sqft": 1234, "category": "Bardeaux"}])
+        assert model.predict.call_args.args[0][0, 0] == 1234
+    predictor._cache.clear()
+
+
+def test_percentile_fallback_while_models_load():
+    """predict() and predict_batch() answer from percentiles while a background load is in flight."""
+    from app.services import predictor
+
+    with patch.object(predictor, "_loaded", False), patch.object(predictor, "_background_loading", True):
+        result = predictor.predict(sqft=1500, category="Bardeaux")
+        batch = predictor.predict_batch([{"sqft": 1500, "category": "Bardeaux"}, {"category": "Gutters"}])
+
+    # Batch callers don't block on the load either
+    assert batch == [result, predictor.predict_percentile(None, "Gutters")]
+
+    assert result["model"] == "percentile-fallback"
+    assert result["confidence"] == "LOW"
+    # Bardeaux / Medium row of model_b_percentiles.csv
+    assert (result["range_low"], result["estimate"], result["range_high"]) == (8055, 9493, 11946)
+
+    # Categories missing from the table fall back to "Other"
+    assert predictor.predict_percentile(500, "Gutters")["estimate"] == 11411
+
+
+def test_hybrid_stream_emits_stages_in_order(client):
+    """POST /estimate/hybrid/stream sends ML, CBR, LLM tokens, then the validated quote."""
+    import json
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, MagicMock
+
+    from app.services import hybrid_quote
+
+    async def fake_ml(request):
+        return {
+            "price": {"estimate": 12000.0, "range_low": 10000.0, "range_high": 14000.0, "confidence": "HIGH"},
+            "materials": {"materials": [{"material_id": 1, "quantity": 10.0, "total": 500.0}],
+                          "total_materials_cost": 500.0},
+        }
+
+    async def fake_cbr(request):
+        return [{"case_id": "7", "similarity": 0.9, "category": "Bardeaux", "sqft": 1400.0,
+                 "total": 11000.0, "per_sqft": 7.9, "year": 2024}]
+
+    tiers = [
+        {"tier": tier, "total_price": price, "materials_cost": 500.0, "labor_cost": price - 500.0,
+         "description": tier}
+        for tier, price in (("Basic", 10200.0), ("Standard", 12000.0), ("Premium", 14160.0))
+    ]
+    answer = json.dumps({
+        "work_items": [], "materials": [], "total_labor_hours": 40, "total_materials_cost": 500.0,
+        "total_price": 12000.0, "overall_confidence": 0.8, "reasoning": "ok", "pricing_tiers": tiers,
+    })
+    pieces = [answer[i:i + 40] for i in range(0, len(answer), 40)]
+
+    async def fake_stream():
+        for piece in pieces:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=piece))])
+
+    llm = MagicMock()
+    llm.chat.completions.create = AsyncMock(return_value=fake_stream())
+
+    with patch.object(hybrid_quote, "_run_ml_prediction", side_effect=fake_ml), \
+            patch.object(hybrid_quote, "_run_cbr_query", side_effect=fake_cbr), \
+            patch.object(hybrid_quote, "get_async_client", return_value=llm):
+        response = client.post(
+            "/estimate/hybrid/stream",
+            json={"sqft": 1500, "category": "Bardeaux", "complexity_tier": 2,
+                  "material_lines": 8, "labor_lines": 3, "merger": "llm"},
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        json.loads(line[len("data: "):])
+        for line in response.text.splitlines() if line.startswith("data: ")
+    ]
+    types = [event["type"] for event in events]
+    assert types[:2] == ["ml", "cbr"]
+    assert types[2:-1] == ["llm_token"] * len(pieces)
+    assert types[-1] == "quote"
+    assert events[0]["data"]["price"]["estimate"] == 12000.0
+    assert events[1]["data"]["similar_cases"][0]["case_id"] == "7"
+    assert "".join(e["data"] for e in events if e["type"] == "llm_token") == answer
+    assert events[-1]["data"]["total_price"] == 12000.0
+    assert events[-1]["data"]["cbr_cases_used"] == 1
+    assert llm.chat.completions.create.call_args.kwargs["stream"] is True
+
+
+def test_merger_output_is_cached_in_memory_and_on_disk(tmp_path):
+    """Identical merger prompts skip the LLM, also after the in-memory cache is lost."""
+    import asyncio
+    import json
+    from types import SimpleNamespace
+    from unittest.mock import AsyncMock, MagicMock
+
+    from app.config import settings
+    from app.schemas.hybrid_quote import HybridQuoteRequest
+    from app.services import hybrid_quote
+
+    tiers = [
+        {"tier": tier, "total_price": price, "materials_cost": 500.0, "labor_cost": price - 500.0,
+         "description": tier}
+        for tier, price in (("Basic", 8500.0), ("Standard", 10000.0), ("Premium", 11800.0))
+    ]
+    answer = json.dumps({
+        "work_items": [], "materials": [], "total_labor_hours": 30, "total_materials_cost": 500.0,
+        "total_price": 10000.0, "overall_confidence": 80, "reasoning": "ok", "pricing_tiers": tiers,
+    })
+    llm = MagicMock()
+    llm.chat.completions.create = AsyncMock(return_value=SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=answer))]
+    ))
+    request = HybridQuoteRequest(sqft=1234, category="Bardeaux", complexity_tier=3)
+    ml_result = {"price": {"estimate": 10000.0, "range_low": 9000.0, "range_high": 11000.0,
+                           "confidence": "HIGH"}}
+
+    def merge():
+        return asyncio.run(hybrid_quote._merge_with_llm(request, ml_result, []))
+
+    with patch.object(settings, "merger_cache_path", str(tmp_path / "merger.sqlite")), \
+            patch.object(hybrid_quote, "get_async_client", return_value=llm):
+        hybrid_quote.close_merger_cache()
+        hybrid_quote.init_merger_cache()
+        try:
+            first = merge()
+            assert first.overall_confidence == 0.8
+            assert merge() == first
+            assert llm.chat.completions.create.await_count == 1
+
+            hybrid_quote._merger_cache.clear()  # e.g. a restart
+            assert merge() == first
+            assert llm.chat.completions.create.await_count == 1
+
+            with patch.object(settings, "openrouter_model", "other/model"):
+                merge()
+            assert llm.chat.completions.create.await_count == 2
+        finally:
+            hybrid_quote.close_merger_cache()
+
+
+def test_rule_merger_escalates_only_when_cbr_and_ml_disagree(client):
+    """Agreeing CBR + ML are merged by rules; a wide price spread escalates to the LLM."""
+    from types import SimpleNamespace
+    from unittest.mock import MagicMock
+
+    from app.config import settings
+    from app.services import hybrid_quote
+    from app.services.pinecone_cbr import _parse_matches
+
+    async def fake_ml(request):
+        return {
+            "price": {"estimate": 10000.0, "range_low": 9000.0, "range_high": 11000.0, "confidence": "HIGH"},
+            "materials": {"materials": [{"material_id": 3, "quantity": 12.5, "unit_price": 40.0,
+                                         "total": 500.0, "confidence": "HIGH"}],
+                          "total_materials_cost": 500.0},
+        }
+
+    def pinecone_cases(per_sqft):
+        # Shaped like real Pinecone output: no case materials
+        matches = [
+            SimpleNamespace(id=str(i), score=score, metadata={
+                "category": "Bardeaux", "sqft": 1000.0, "total": per_sqft * 1000, "per_sqft": per_sqft,
+                "year": 2024,
+            })
+            for i, score in enumerate((0.82, 0.78, 0.75))
+        ]
+        return _parse_matches(SimpleNamespace(matches=matches))
+
+    cases = pinecone_cases(12.0)
+
+    async def fake_cbr(request):
+        return cases
+
+    llm = MagicMock()
+    job = {"sqft": 1000, "category": "Bardeaux", "complexity_tier": 2, "factor_roof_pitch": "steep",
+           "manual_extra_hours": 2}
+
+    with patch.object(hybrid_quote, "_run_ml_prediction", side_effect=fake_ml), \
+            patch.object(hybrid_quote, "_run_cbr_query", side_effect=fake_cbr), \
+            patch.object(hybrid_quote, "get_async_client", return_value=llm), \
+            patch.object(settings, "merger_mode", "auto"):
+        response = client.post("/estimate/hybrid", json=job)
+        assert response.status_code == 200
+        data = response.json()
+        assert not llm.chat.completions.create.called
+
+        # 60% ML ($10,000) + 40% CBR ($12/sqft * 1000)
+        assert data["total_price"] == 10800.0
+        tiers = {tier["tier"]: tier for tier in data["pricing_tiers"]}
+        assert tiers["Premium"]["total_price"] == round(10800.0 * 1.18, 2)
+        assert tiers["Standard"]["materials_cost"] == 500.0
+        assert tiers["Standard"]["labor_cost"] == 10300.0
+        assert data["materials"][0]["source"] == "ML"
+        names = [item["name"] for item in data["work_items"]]
+        assert "Roof pitch" in names and "Manual extra hours" in names
+        assert data["total_labor_hours"] == sum(item["labor_hours"] for item in data["work_items"])
+
+        # Similar jobs at $22/sqft vs the ML $10/sqft
+        cases = pinecone_cases(22.0)
+        response = client.post("/estimate/hybrid", json=job)
+        assert response.status_code == 200
+        assert llm.chat.completions.create.called  # escalated (mock answer falls back)
+
+
+def test_estimate_cbr_query_does_not_hold_a_cpu_worker(client):
+    """POST /estimate sends the vector store query through the async path, not run_cpu."""
+    from unittest.mock import AsyncMock
+
+    from app.routers import estimate as estimate_router
+
+    cpu_calls = []
+    real_run_cpu = estimate_router.run_cpu
+
+    async def recording_run_cpu(fn, *args, **kwargs):
+        cpu_calls.append(fn.__name__)
+        return await real_run_cpu(fn, *args, **kwargs)
+
+    aquery = AsyncMock(return_value=[])
+    with (
+        patch.object(estimate_router, "run_cpu", recording_run_cpu),
+        patch.object(estimate_router, "use_numeric_cbr", return_value=False),
+        patch.object(estimate_router, "is_cbr_available", return_value=True),
+        patch.object(estimate_router, "embed_query", return_value=[0.0] * 384),
+        patch.object(estimate_router, "aquery_similar_cases", aquery),
+        patch.object(estimate_router, "query_similar_cases") as sync_query,
+    ):
+        response = client.post("/estimate", json={"sqft": 1500, "category": "Bardeaux"})
+
+    assert response.status_code == 200
+    assert aquery.await_count == 1
+    assert aquery.await_args.kwargs["category"] == "Bardeaux"
+    sync_query.assert_not_called()
+    assert sorted(cpu_calls) == ["_predict_estimate", "_query_vector"]
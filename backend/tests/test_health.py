@@ -1,5 +1,7 @@
 """Tests for health endpoint."""
 
+from unittest.mock import patch
+
 
 def test_health_returns_ok(client):
     """GET /health returns 200 with status ok."""
@@ -8,3 +10,53 @@ def test_health_returns_ok(client):
     data = response.json()
     assert data["status"] == "ok"
     assert data["version"] == "1.0.0"
+
+
+def test_cache_stats_count_repeat_estimates(client):
+    """GET /health/cache reports a hit when the same estimate is requested twice."""
+    before = client.get("/health/cache").json()["caches"]["price"]
+
+    payload = {"sqft": 1234, "category": "Bardeaux", "complexity": 42}
+    first = client.post("/estimate", json=payload).json()
+    second = client.post("/estimate", json=payload).json()
+    assert first["estimate"] == second["estimate"]
+
+    after = client.get("/health/cache").json()["caches"]["price"]
+    assert after["hits"] >= before["hits"] + 1
+    assert after["size"] <= after["maxsize"]
+
+
+def test_stage_timings_in_header_and_histograms(client):
+    """Traced stages come back as Server-Timing and feed /health/latency percentiles."""
+    response = client.post("/estimate", json={"sqft": 1500, "category": "Bardeaux"})
+    assert response.status_code == 200
+
+    timings = {}
+    for metric in response.headers["server-timing"].split(", "):
+        name, dur = metric.split(";dur=")
+        timings[name] = float(dur)
+    # Price model runs on the CPU executor and still lands on the trace
+    assert {"parse", "price_model", "total"} <= set(timings)
+    assert timings["total"] >= timings["price_model"]
+
+    stages = client.get("/health/latency").json()["stages"]
+    assert stages["price_model"]["samples"] >= 1
+    assert stages["price_model"]["p50_ms"] <= stages["price_model"]["p99_ms"]
+
+
+def test_cpu_admission_rejects_with_retry_after(client):
+    """A full CPU queue turns estimates away with 429 + Retry-After, counted at /health/executors."""
+    from app.services import executors
+
+    before = client.get("/health/executors").json()["executors"]
+    assert {"cpu", "io"} <= set(before)
+
+    with patch.object(executors.settings, "admission_cpu_queue_limit", 1), \
+            patch.object(executors._cpu, "queued", 1):
+        response = client.post("/estimate", json={"sqft": 1500, "category": "Bardeaux"})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["retry-after"]) <= 60
+
+    after = client.get("/health/executors").json()["executors"]["cpu"]
+    assert after["rejected"] == before["cpu"]["rejected"] + 1
+    assert after["queued"] == 0
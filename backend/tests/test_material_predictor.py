@@ -0,0 +1,112 @@
+"""Tests for material prediction on compiled (stacked) models."""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
+from sklearn.multiclass import OneVsRestClassifier
+
+from app.services import material_predictor
+from app.services.model_bundle import _compile_regressor_dict
+from app.services.tree_engine import compile_one_vs_rest
+
+MATERIAL_IDS = [101, 102, 103, 104]
+
+
+@pytest.fixture
+def synthetic_models(monkeypatch):
+    """Small selector + quantity regressors trained on the 9 material features."""
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.uniform(200, 5000, 400),    # sqft
+        rng.integers(1, 100, 400),      # complexity
+        rng.uniform(2000, 80000, 400),  # quoted_total
+        rng.integers(0, 2, 400),        # has_chimney
+        rng.integers(0, 2, 400),        # has_skylights
+        rng.integers(0, 30, 400),       # material_lines
+        rng.integers(0, 10, 400),       # labor_lines
+        rng.integers(0, 2, 400),        # has_subs
+        rng.integers(0, 12, 400),       # cat_enc
+    ])
+    Y = np.column_stack([
+        X[:, 0] > 1000, X[:, 1] > 40, X[:, 3] == 1, X[:, 0] + 20 * X[:, 1] > 3000,
+    ]).astype(int)
+    selector = OneVsRestClassifier(GradientBoostingClassifier(n_estimators=10, max_depth=3, random_state=0)).fit(X, Y)
+    regressors = {
+        mat_id: GradientBoostingRegressor(n_estimators=10, max_depth=3, random_state=0).fit(X, X[:, 0] / (50 + i))
+        for i, mat_id in enumerate(MATERIAL_IDS[:3])  # 104 has no regressor
+    }
+    quantity, quantity_ids = _compile_regressor_dict(regressors)
+
+    models = {
+        "selector": compile_one_vs_rest(selector),
+        "material_ids": MATERIAL_IDS,
+        "quantity": quantity,
+        "quantity_index": {mat_id: i for i, mat_id in enumerate(quantity_ids)},
+        "category_index": {"Bardeaux": 0, "Other": 6},
+        "rules": [],
+        "rule_closure": {},
+        "triggers": {},
+        "prices": {"101": 10.0, "102": 20.0, "103": 5.0},
+    }
+    monkeypatch.setattr(material_predictor, "_models", models)
+    monkeypatch.setattr(material_predictor, "_loaded", True)
+    material_predictor._cache.clear()
+    yield selector, regressors
+    material_predictor._cache.clear()
+
+
+def test_batch_matches_single_and_sklearn(synthetic_models):
+    """Batched stacked evaluation equals per-job results and sklearn quantities."""
+    _, regressors = synthetic_models
+    jobs = [
+        {"sqft": 1500, "category": "Bardeaux", "complexity": 50, "has_chimney": True},
+        {"sqft": 400, "category": "Other", "complexity": 10},
+        {"sqft": 4200, "category": "Bardeaux", "complexity": 80, "quoted_total": 42000},
+    ]
+
+    batch = material_predictor.predict_materials_batch(jobs)
+    assert [material_predictor.predict_materials(**job) for job in jobs] == batch
+
+    for job, result in zip(jobs, batch):
+        row = material_predictor._feature_row(material_predictor._canonical_job(job))
+        for material in result["materials"]:
+            if material["material_id"] in regressors:
+                expected = max(1, round(regressors[material["material_id"]].predict([row])[0], 1))
+                assert material["quantity"] == pytest.approx(expected)
+                assert material["confidence"] == "HIGH"
+            else:
+                assert material["quantity"] == 1.0
+                assert material["confidence"] == "LOW"
+
+
+def test_co_occurrence_closure_follows_chains(synthetic_models, monkeypatch):
+    """Chained rules fire regardless of rule order, each material added once."""
+    rules = [
+        {"antecedent": 900, "consequent": 901, "confidence": 0.9},  # fires only via the chain
+        {"antecedent": 101, "consequent": 900, "confidence": 0.8},
+        {"antecedent": 901, "consequent": 101, "confidence": 0.7},  # cycle back, no-op
+    ]
+    closure = material_predictor._compile_rules(rules)
+    assert [mat_id for mat_id, _ in closure[101]] == [900, 901]
+
+    monkeypatch.setitem(material_predictor._models, "rule_closure", closure)
+    result = material_predictor.predict_materials(sqft=3000, category="Bardeaux", complexity=50)
+
+    ids = [m["material_id"] for m in result["materials"]]
+    assert 101 in ids and ids.count(900) == 1 and ids.count(901) == 1
+    assert result["applied_rules"] == ["101 -> 900 (conf=0.80)", "900 -> 901 (conf=0.90)"]
+
+
+def test_cache_step_snaps_key_not_model_input(synthetic_models, monkeypatch):
+    """PREDICTION_CACHE_SQFT_STEP only groups cache entries; features use the raw sqft."""
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "prediction_cache_sqft_step", 1000.0)
+    job = {"sqft": 1450, "category": "Bardeaux", "complexity": 50, "quoted_total": 21000.4}
+
+    assert material_predictor.predict_materials(**job) == material_predictor.predict_materials_batch([job])[0]
+    canonical = material_predictor._canonical_job(job)
+    assert material_predictor._feature_row(canonical)[0] == 1450.0
+    assert material_predictor._cache_key(canonical) == material_predictor._cache_key(
+        material_predictor._canonical_job({**job, "sqft": 1020})
+    )
@@ -0,0 +1,104 @@
+"""Parity tests for the compiled tree evaluator and model bundle."""
+
+from unittest.mock import patch
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
+from sklearn.multiclass import OneVsRestClassifier
+
+from app.services.model_bundle import MODEL_DIR, export_bundle, load_bundle
+from app.services.tree_engine import (
+    compile_gradient_boosting,
+    compile_one_vs_rest,
+    stack_ensembles,
+)
+
+
+def _random_features(n_features: int, n_rows: int = 1000) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    X = np.column_stack([
+        rng.uniform(50, 30000, n_rows),
+        rng.integers(0, 50, n_rows),
+        rng.integers(0, 20, n_rows),
+        rng.integers(0, 2, n_rows),
+        rng.integers(1, 100, n_rows),
+        rng.integers(0, 10, n_rows),
+    ])
+    return X[:, :n_features]
+
+
+@pytest.mark.parametrize("name", ["cortex_model_global", "cortex_model_Bardeaux"])
+def test_compiled_matches_sklearn(name):
+    """Compiled ensemble reproduces sklearn predictions."""
+    model = joblib.load(MODEL_DIR / f"{name}.pkl")
+    compiled = compile_gradient_boosting(model)
+
+    X = _random_features(model.n_features_in_)
+    np.testing.assert_allclose(compiled.predict(X), model.predict(X), rtol=1e-9)
+
+    # Single-row path used by predict()
+    np.testing.assert_allclose(compiled.predict(X[:1]), model.predict(X[:1]), rtol=1e-9)
+
+
+def test_stacked_regressors_and_selector_match_sklearn():
+    """Stacked regressors and one-vs-rest selector match sklearn per output."""
+    rng = np.random.default_rng(1)
+    X = rng.uniform(0, 100, (300, 4))
+    regressors = [
+        GradientBoostingRegressor(n_estimators=20, max_depth=d, random_state=0).fit(X, X[:, i] * 3 + d)
+        for i, d in enumerate([2, 3, 4])
+    ]
+    stacked = stack_ensembles([compile_gradient_boosting(r) for r in regressors])
+    expected = np.column_stack([r.predict(X) for r in regressors])
+    np.testing.assert_allclose(stacked.predict(X), expected, rtol=1e-9)
+    # Output subset only walks the selected trees
+    np.testing.assert_allclose(stacked.predict(X, outputs=[2, 0]), expected[:, [2, 0]], rtol=1e-9)
+
+    Y = np.column_stack([X[:, 0] > 50, X[:, 1] + X[:, 2] > 90, np.ones(len(X))]).astype(int)
+    clf = OneVsRestClassifier(GradientBoostingClassifier(n_estimators=15, max_depth=3, random_state=0)).fit(X, Y)
+    selector = compile_one_vs_rest(clf)
+    np.testing.assert_allclose(selector.predict(X), clf.predict_proba(X), atol=1e-9)
+
+
+def test_bundle_roundtrip(tmp_path):
+    """Exported bundle memory-maps arrays and skips stale components."""
+    model = joblib.load(MODEL_DIR / "cortex_model_Bardeaux.pkl")
+    model_dir = tmp_path / "models"
+    model_dir.mkdir()
+    joblib.dump(model, model_dir / "cortex_model_Bardeaux.pkl")
+
+    manifest = export_bundle(tmp_path / "bundle", model_dir=model_dir)
+    assert list(manifest["components"]) == ["cortex_model_Bardeaux"]
+
+    bundle = load_bundle(tmp_path / "bundle", model_dir=model_dir)
+    compiled = bundle.ensemble("cortex_model_Bardeaux")
+    assert isinstance(compiled.value, np.memmap)
+    X = _random_features(model.n_features_in_, 50)
+    np.testing.assert_allclose(compiled.predict(X), model.predict(X), rtol=1e-9)
+
+    # Source pickle changed after export -> component ignored
+    joblib.dump(GradientBoostingRegressor(n_estimators=1).fit(X, X[:, 0]), model_dir / "cortex_model_Bardeaux.pkl")
+    stale = load_bundle(tmp_path / "bundle", model_dir=model_dir)
+    assert stale.ensemble("cortex_model_Bardeaux") is None
+
+
+def test_export_script_keeps_served_bundle_on_parity_mismatch(tmp_path):
+    """A bundle that fails parity is never swapped in and the script exits 1."""
+    from scripts import export_bundle as script
+
+    model_dir = tmp_path / "models"
+    model_dir.mkdir()
+    joblib.dump(joblib.load(MODEL_DIR / "cortex_model_Bardeaux.pkl"), model_dir / "cortex_model_Bardeaux.pkl")
+    served = export_bundle(tmp_path / "bundle", model_dir=model_dir)
+
+    with patch.object(script, "BUNDLE_DIR", tmp_path / "bundle"), \
+            patch.object(script, "MODEL_DIR", model_dir), \
+            patch.object(script, "_check_parity", return_value=False), \
+            pytest.raises(SystemExit) as exit_info:
+        script.main()
+
+    assert exit_info.value.code == 1
+    assert load_bundle(tmp_path / "bundle", model_dir=model_dir).manifest == served
+    assert not (tmp_path / "bundle.tmp").exists()